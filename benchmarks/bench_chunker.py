@@ -0,0 +1,65 @@
+# benchmarks/bench_chunker.py
+#
+# Compares the token chunker with RecursiveCharacterTextSplitter on synthetic documents:
+# throughput in MB/s and the spread of chunk sizes in tokens.
+# Run from the repository root:
+#     python -m benchmarks.bench_chunker --megabytes 4
+
+import argparse
+import random
+import time
+import numpy as np
+from langchain.schema import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from src.agent.chunking import TokenChunker, count_tokens
+
+WORDS = ("the solution was heated to 80 degrees and stirred for two hours before the precipitate "
+         "formed sodium chloride 7647-14-5 reacts with silver nitrate measurements were repeated "
+         "three times results in table 2 show a significant increase of yield").split()
+
+
+def make_document(megabytes, seed=0):
+    """Builds Markdown-like text with headings, paragraphs and sentences of varying length."""
+    rng = random.Random(seed)
+    parts, size, section = [], 0, 0
+    while size < megabytes * 1024 * 1024:
+        if rng.random() < 0.1:
+            section += 1
+            part = f"## {section} Section heading\n\n"
+        else:
+            sentences = [" ".join(rng.choices(WORDS, k=rng.randint(5, 40))).capitalize() + "."
+                         for _ in range(rng.randint(1, 8))]
+            part = " ".join(sentences) + "\n\n"
+        parts.append(part)
+        size += len(part)
+    return "".join(parts)
+
+
+def run(name, split, text):
+    start = time.perf_counter()
+    chunks = [doc.page_content for doc in split([Document(page_content=text)])]
+    seconds = time.perf_counter() - start
+    tokens = np.array([count_tokens(chunk) for chunk in chunks])
+    print(f"{name:<22} {len(text) / seconds / 1e6:>8.2f} {len(chunks):>8} {tokens.mean():>8.1f} "
+          f"{tokens.std():>8.1f} {tokens.min():>6} {tokens.max():>6} {int(tokens.sum()):>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the token chunker against the character splitter.")
+    parser.add_argument("--megabytes", type=float, default=2.0)
+    parser.add_argument("--chunk-size", type=int, default=1000, help="character splitter chunk size")
+    parser.add_argument("--chunk-overlap", type=int, default=200, help="character splitter overlap")
+    parser.add_argument("--chunk-tokens", type=int, default=256)
+    parser.add_argument("--overlap-tokens", type=int, default=48)
+    args = parser.parse_args()
+
+    text = make_document(args.megabytes)
+    print(f"{'splitter':<22} {'MB/s':>8} {'chunks':>8} {'mean':>8} {'std':>8} {'min':>6} {'max':>6} {'tokens':>10}")
+    splitter = RecursiveCharacterTextSplitter(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+    run(f"character {args.chunk_size}/{args.chunk_overlap}", splitter.split_documents, text)
+    chunker = TokenChunker(chunk_tokens=args.chunk_tokens, overlap_tokens=args.overlap_tokens)
+    run(f"token {args.chunk_tokens}/{args.overlap_tokens}", chunker.split_documents, text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+# benchmarks/bench_embedding.py
+#
+# Measures the throughput of the batched embedding stage offline.
+# Run from the repository root:
+#     python -m benchmarks.bench_embedding --texts 2000 --latency 0.05
+
+import argparse
+import random
+import time
+from src.agent.embedding import BatchedEmbeddings, LocalHashEmbeddings
+
+WORDS = ("benzene", "reaction", "catalyst", "timeline", "battle", "treaty", "oxidation",
+         "synthesis", "napoleon", "empire", "carbon", "monoxide", "step", "heat", "yield")
+
+
+def make_texts(count, words_per_text=150, seed=0):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(words_per_text)) for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the batched embedding stage.")
+    parser.add_argument("--texts", type=int, default=2000, help="Number of chunks to embed")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated seconds per embedding call")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    texts = make_texts(args.texts)
+    baseline = None
+    print(f"{'batch':>6} {'workers':>8} {'batches':>8} {'seconds':>9} {'texts/s':>9} {'speedup':>8}")
+    for batch_size in args.batch_sizes:
+        for workers in args.workers:
+            stage = BatchedEmbeddings(LocalHashEmbeddings(latency=args.latency),
+                                      batch_size=batch_size, max_workers=workers)
+            start = time.perf_counter()
+            stage.embed_documents(texts)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            report = stage.last_report
+            print(f"{batch_size:>6} {workers:>8} {report['batches']:>8} {elapsed:>9.3f} "
+                  f"{report['texts_per_second']:>9.1f} {baseline / elapsed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+# benchmarks/bench_pipeline.py
+#
+# End-to-end benchmark of the RAG pipeline without NVIDIA or Tavily keys. The chat models,
+# the embedder and the Tavily, Wikipedia and ArXiv tools are replaced by deterministic local
+# stand-ins with configurable latency; everything else (prompts, JSON parsing, retrieval from
+# a NumPy vector store, grading, web search fan-out, checkpointing, the Flask route) is real.
+# A corpus of questions is replayed through the compiled graph and through Flask /ask, and
+# the report gives latency percentiles, throughput and LLM calls per question.
+# Run from the repository root:
+#     python -m benchmarks.bench_pipeline --questions 200 --concurrency 1 8 --llm-latency 0.2
+#
+# Add --output report.json to keep the numbers for comparison between commits.
+
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+_workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+os.environ.setdefault("EMBEDDING_BACKEND", "local")
+os.environ.setdefault("EMBEDDING_CACHE_ENABLED", "false")
+os.environ.setdefault("LLM_CACHE_ENABLED", "false")
+os.environ.setdefault("ANSWER_CACHE_ENABLED", "false")
+os.environ.setdefault("SESSION_CHECKPOINT_PATH", os.path.join(_workdir, "checkpoints.sqlite"))
+os.environ.setdefault("TAVILY_API_KEY", "offline")
+
+import logging
+from typing import Any, List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.output_parsers import JsonOutputParser
+from src.agent import graph as graph_module
+from src.agent import ingest
+from src.agent.app import app as flask_app
+from src.agent.embedding import BatchedEmbeddings, LocalHashEmbeddings
+from src.agent.numpy_index import NumpyVectorStore
+
+TOPICS = ("benzene", "napoleon", "photosynthesis", "volcano", "transistor", "penicillin", "aqueduct",
+          "glacier", "enzyme", "telescope", "comet", "monsoon", "alloy", "sonnet", "pyramid", "vaccine")
+FILLER = ("the", "measured", "process", "was", "described", "in", "early", "records", "with", "careful",
+          "attention", "to", "structure", "history", "and", "later", "experiments", "confirmed", "it")
+
+# Calls made to the stand-ins, by kind
+calls = Counter()
+_calls_lock = threading.Lock()
+
+
+def _count(kind):
+    with _calls_lock:
+        calls[kind] += 1
+
+
+def _question_topic(text):
+    # The grader prompts show examples first, so the real question is the last one
+    found = re.findall(r"Question:\s*(.*?)\n", text) or re.findall(r"Here is the question: (.*)", text)
+    question = found[-1].lower() if found else ""
+    return next((topic for topic in TOPICS if topic in question), None), "tricky" in question
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model stand-in that answers each prompt of graph.py the way a cooperative LLM would.
+
+    Document graders call a fact relevant when it mentions the question's topic; the answer
+    grader rejects answers to questions marked 'tricky', so those run the retry loop.
+    """
+
+    latency: float = 0.2
+    role: str = "generator"
+
+    @property
+    def _llm_type(self):
+        return "fake-chat"
+
+    def _respond(self, messages):
+        text = messages[-1].content
+        if self.role == "generator":
+            return "Step 1: Overview\nA grounded answer built from the retrieved context.\n" \
+                   "Step 2: Details\nFurther explanation of the steps involved."
+        topic, tricky = _question_topic(text)
+        if "single key 'scores'" in text:
+            facts = re.split(r"\nFact \d+:\n", text.split("Facts:", 1)[1])[1:]
+            return json.dumps({"scores": [int(bool(topic) and topic in fact.lower()) for fact in facts]})
+        if "Fact:" in text:
+            fact = text.rsplit("Fact:", 1)[1]
+            return json.dumps({"score": int(bool(topic) and topic in fact.lower())})
+        return json.dumps({"score": "no" if tricky else "yes"})
+
+    def _generate(self, messages, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs):
+        _count(f"llm_{self.role}")
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._respond(messages)))])
+
+
+class FakeTavily:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def invoke(self, arguments):
+        _count("search_tavily")
+        time.sleep(self.latency)
+        query = arguments["query"]
+        return [{"url": f"https://example.com/{i}", "title": f"Result {i}",
+                 "content": f"Web result {i} on {query}. " + " ".join(FILLER)} for i in range(5)]
+
+
+class FakeArxiv:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def search(self, query):
+        _count("search_arxiv")
+        time.sleep(self.latency)
+        return [{"title": f"Paper {i} on {query}", "summary": " ".join(FILLER), "url": f"https://arxiv.org/abs/{i}",
+                 "pdf_url": f"https://arxiv.org/pdf/{i}", "published": "2024-01-01"} for i in range(3)]
+
+
+class FakeWikipedia:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def invoke(self, arguments):
+        _count("search_wikipedia")
+        time.sleep(self.latency)
+        return "\n\n".join(f"Page: {arguments['query']} {i}\nSummary: " + " ".join(FILLER) for i in range(3))
+
+
+def make_corpus(passages_per_topic, seed=0):
+    rng = random.Random(seed)
+    return [f"{topic.capitalize()} fact {i}: " + " ".join(rng.choices(FILLER, k=40)) + f" {topic}."
+            for topic in TOPICS for i in range(passages_per_topic)]
+
+
+def make_questions(count, off_corpus, tricky, seed=0):
+    """Questions on the corpus topics; some about unknown topics (web search) or marked tricky (retries)."""
+    rng = random.Random(seed)
+    questions = []
+    for i in range(count):
+        if rng.random() < off_corpus:
+            questions.append(f"What happened to the lost city number {i}?")
+        else:
+            marker = " (tricky)" if rng.random() < tricky else ""
+            questions.append(f"Explain the steps of {rng.choice(TOPICS)} number {i}{marker}?")
+    return questions
+
+
+def install_fakes(args):
+    """Swaps the remote models and tools of graph.py and ingest.py for the local stand-ins."""
+    embeddings = BatchedEmbeddings(LocalHashEmbeddings(latency=args.embedding_latency))
+    ingest._embeddings = embeddings  # Used by the answer cache and the embedding reranker too
+
+    store = NumpyVectorStore(embeddings, "bench", os.path.join(_workdir, "store"))
+    store.add_texts(make_corpus(args.passages))
+    graph_module.get_retriever = lambda vector_db_choice, mode=None, namespace=None, k=4: \
+        store.as_retriever(search_kwargs={"k": k})
+
+    grader = FakeChatModel(role="grader", latency=args.llm_latency)
+    graph_module.llm = FakeChatModel(role="generator", latency=args.llm_latency)
+    graph_module.answer_grader = graph_module.prompt | grader | JsonOutputParser()
+    graph_module.retrieval_grader = graph_module.grader_prompt | grader | JsonOutputParser()
+    graph_module.multi_retrieval_grader = graph_module.multi_grader_prompt | grader | JsonOutputParser()
+
+    graph_module.web_search_tool = FakeTavily(args.search_latency)
+    graph_module.arxiv_tool = FakeArxiv(args.search_latency)
+    graph_module.wikipedia = FakeWikipedia(args.search_latency)
+    graph_module.WEB_SEARCH_MODE = "auto"  # No user to pick a search tool
+
+
+def ask_graph(question):
+    state = {"question": question, "vector_db_choice": "Wiki", **graph_module.new_budget()}
+    result = graph_module.graph.invoke(state, {"configurable": {"thread_id": str(uuid.uuid4())}}, durability="exit")
+    return "generation" in result
+
+
+def ask_flask(question):
+    with flask_app.test_client() as client:
+        response = client.post("/ask", json={"question": question, "vector_db_choice": "Wiki"})
+    return response.status_code == 200 and "answer" in response.get_json()
+
+
+def replay(ask, questions, concurrency):
+    """
+    Returns:
+        dict: Latency percentiles in ms, questions per second, errors and stand-in calls per question.
+    """
+    calls.clear()
+    latencies, errors = [], 0
+
+    def timed(question):
+        started = time.perf_counter()
+        try:
+            ok = ask(question)
+        except Exception as e:
+            logging.error(f"Question failed: {str(e)}")
+            ok = False
+        return time.perf_counter() - started, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for latency, ok in executor.map(timed, questions):
+            latencies.append(latency)
+            errors += not ok
+    seconds = time.perf_counter() - started
+    per_question = {kind: round(count / len(questions), 2) for kind, count in sorted(calls.items())}
+    return {
+        "p50_ms": round(1000 * float(np.percentile(latencies, 50)), 1),
+        "p95_ms": round(1000 * float(np.percentile(latencies, 95)), 1),
+        "p99_ms": round(1000 * float(np.percentile(latencies, 99)), 1),
+        "questions_per_second": round(len(questions) / seconds, 2),
+        "errors": errors,
+        "llm_calls_per_question": round(sum(v for k, v in per_question.items() if k.startswith("llm_")), 2),
+        "calls_per_question": per_question,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of the RAG pipeline.")
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--targets", nargs="+", default=["graph", "flask"], choices=["graph", "flask"])
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="seconds per fake LLM call")
+    parser.add_argument("--embedding-latency", type=float, default=0.02, help="seconds per fake embedding call")
+    parser.add_argument("--search-latency", type=float, default=0.3, help="seconds per fake search call")
+    parser.add_argument("--passages", type=int, default=50, help="corpus passages per topic")
+    parser.add_argument("--off-corpus", type=float, default=0.1, help="fraction of questions needing web search")
+    parser.add_argument("--tricky", type=float, default=0.1, help="fraction of answers graded not useful")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)  # Per-node logging would dominate the measurement
+    install_fakes(args)
+    questions = make_questions(args.questions, args.off_corpus, args.tricky)
+    targets = {"graph": ask_graph, "flask": ask_flask}
+
+    results = []
+    print(f"{'target':<7} {'conc':>5} {'q/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'llm/q':>6} {'errors':>6}  calls per question")
+    try:
+        for target in args.targets:
+            for concurrency in args.concurrency:
+                result = {"target": target, "concurrency": concurrency,
+                          **replay(targets[target], questions, concurrency)}
+                results.append(result)
+                print(f"{target:<7} {concurrency:>5} {result['questions_per_second']:>7.2f} {result['p50_ms']:>8.1f} "
+                      f"{result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} {result['llm_calls_per_question']:>6.2f} "
+                      f"{result['errors']:>6}  {result['calls_per_question']}")
+    finally:
+        shutil.rmtree(_workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"arguments": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
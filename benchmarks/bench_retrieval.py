@@ -0,0 +1,220 @@
+# benchmarks/bench_retrieval.py
+#
+# Retrieval quality against cost. A collection is built from a corpus whose questions are
+# labeled with the passage that answers them, and every combination of chunk size, index
+# backend, search type (similarity, MMR, hybrid BM25) and k is scored on recall@k, MRR,
+# query latency and index size. The stores are opened through VectorStoreRegistry and the
+# text is split by TokenChunker, as in ingest.py.
+# Run from the repository root:
+#     python -m benchmarks.bench_retrieval --chunk-tokens 128 256 512 --k 1 4 8
+#
+# The default corpus is synthetic: documents about made-up entities, each stating a set of
+# facts, and one question per sampled fact. Pass --corpus with a JSON file of the form
+#     {"documents": ["text", ...], "questions": [{"question": "...", "evidence": "..."}]}
+# to evaluate on your own data; a chunk counts as relevant when it contains the evidence text.
+# The local hashing embedder is used unless EMBEDDING_BACKEND=nvidia is set.
+
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+import logging
+import warnings
+import numpy as np
+
+os.environ.setdefault("EMBEDDING_BACKEND", "local")
+os.environ.setdefault("EMBEDDING_CACHE_ENABLED", "false")
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+
+from langchain.schema import Document
+from src.agent.chunking import TokenChunker
+from src.agent.ingest import VectorStoreRegistry
+from src.agent.lexical_index import HybridRetriever
+
+# (statement, question) templates of the synthetic facts; {e} is the entity, {v} the value
+RELATIONS = [
+    ("{e} was founded in the year {v}.", "In which year was {e} established?"),
+    ("The capital of {e} is the city of {v}.", "What is the main city of {e}?"),
+    ("{e} mainly exports {v} to its neighbours.", "Which goods does {e} sell abroad?"),
+    ("The river {v} flows through the north of {e}.", "Which river runs across northern {e}?"),
+    ("{e} is governed by a council led by {v}.", "Who leads the council governing {e}?"),
+    ("The traditional dish of {e} is called {v}.", "What food is typical of {e}?"),
+    ("Most people in {e} speak the {v} language.", "What language is spoken in {e}?"),
+    ("The highest mountain of {e} is Mount {v}.", "Which peak is the tallest in {e}?"),
+    ("{e} uses the {v} as its currency.", "What money is used in {e}?"),
+    ("The national animal of {e} is the {v}.", "Which creature is the emblem of {e}?"),
+    ("{e} won its independence after the battle of {v}.", "Which battle made {e} independent?"),
+    ("The oldest university in {e} is located in {v}.", "Where is the first university of {e}?"),
+    ("Farmers in {e} grow mostly {v}.", "What crop do the farms of {e} produce?"),
+    ("The main port of {e} is {v}.", "Which harbour handles the shipping of {e}?"),
+    ("{e} celebrates its national day in {v}.", "When is the national holiday of {e}?"),
+    ("The famous painter {v} was born in {e}.", "Which artist comes from {e}?"),
+]
+FILLER = ("the", "region", "history", "records", "people", "several", "early", "travellers", "described", "trade",
+          "routes", "local", "markets", "season", "weather", "roads", "villages", "ancient", "were", "and", "many",
+          "visitors", "noted", "its", "long", "coast", "hills", "with", "quiet", "towns")
+SYLLABLES = ("ka", "lo", "mi", "ra", "ne", "tu", "vo", "zi", "pe", "sa", "do", "ri", "fa", "gu", "he", "ju")
+
+
+def _word(rng, syllables=3):
+    return "".join(rng.choice(SYLLABLES) for _ in range(syllables)).capitalize()
+
+
+def make_corpus(documents, questions, seed=0):
+    """
+    Builds the synthetic corpus: each document states facts about one entity between filler sentences.
+
+    Returns:
+        Tuple[List[str], List[dict]]: Document texts, and questions with the 'evidence' sentence answering them.
+    """
+    rng = random.Random(seed)
+    entities = list(dict.fromkeys(_word(rng, 4) for _ in range(documents * 2)))[:documents]
+    texts, facts = [], []
+    for entity in entities:
+        sentences = []
+        for statement, question in rng.sample(RELATIONS, k=len(RELATIONS) // 2 + rng.randrange(len(RELATIONS) // 2)):
+            fact = statement.format(e=entity, v=_word(rng))
+            sentences.append(fact)
+            facts.append({"question": question.format(e=entity), "evidence": fact})
+            for _ in range(2):
+                sentences.append(" ".join(rng.choices(FILLER, k=rng.randint(8, 16))).capitalize() + ".")
+        # Paragraphs of a few sentences, as in scraped articles
+        paragraphs = [" ".join(sentences[i:i + 6]) for i in range(0, len(sentences), 6)]
+        texts.append(f"{entity}\n\n" + "\n\n".join(paragraphs))
+    return texts, rng.sample(facts, min(questions, len(facts)))
+
+
+def load_corpus(path):
+    with open(path, encoding="utf-8") as f:
+        corpus = json.load(f)
+    return corpus["documents"], corpus["questions"]
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def build_store(backend, texts, chunk_tokens, overlap_tokens, workdir):
+    """
+    Splits the documents and indexes the chunks in a new collection of the given backend,
+    with a BM25 index next to it for hybrid search.
+
+    Returns:
+        Tuple: The vector store, its lexical index, the number of chunks, index bytes on disk and build seconds.
+    """
+    name = f"eval-{backend}-{chunk_tokens}"
+    registry = VectorStoreRegistry({name: {"collection_name": name, "persist_directory": os.path.join(workdir, name)}},
+                                   backend=backend)
+    chunker = TokenChunker(chunk_tokens=chunk_tokens, overlap_tokens=overlap_tokens)
+    chunks = chunker.split_documents([Document(page_content=text, metadata={"document": i}) for i, text in enumerate(texts)])
+    ids = [f"{name}-{i}" for i in range(len(chunks))]
+    for chunk, chunk_id in zip(chunks, ids):
+        chunk.metadata["chunk_hash"] = chunk_id
+
+    started = time.perf_counter()
+    store = registry.get(name)
+    for i in range(0, len(chunks), 1000):  # Chroma limits the size of one insert
+        batch = chunks[i:i + 1000]
+        store.add_texts([chunk.page_content for chunk in batch], metadatas=[chunk.metadata for chunk in batch],
+                        ids=ids[i:i + 1000])
+    lexical_index = registry.get_lexical_index(name)
+    lexical_index.add(ids, [chunk.page_content for chunk in chunks])
+    lexical_index.save()
+    if backend == "numpy":  # Chroma writes through on every insert
+        store.persist()
+    seconds = time.perf_counter() - started
+    return store, lexical_index, len(chunks), directory_size(registry.persist_directory(name)), seconds
+
+
+def make_retriever(store, lexical_index, search_type, k):
+    if search_type == "similarity":
+        return store.as_retriever(search_kwargs={"k": k})
+    if search_type == "mmr":
+        return store.as_retriever(search_type="mmr", search_kwargs={"k": k, "fetch_k": max(20, 4 * k)})
+    if search_type == "hybrid":
+        return HybridRetriever(vectorstore=store, lexical_index=lexical_index, k=k, fetch_k=max(20, k))
+    raise ValueError(f"Invalid search type: {search_type}")
+
+
+def evaluate(retriever, questions):
+    """
+    Returns:
+        dict: recall@k (share of questions with a relevant chunk in the results), MRR and
+        query latency percentiles in ms, embedding of the question included.
+    """
+    latencies, hits, reciprocal_ranks = [], 0, 0.0
+    for item in questions:
+        started = time.perf_counter()
+        documents = retriever.invoke(item["question"])
+        latencies.append(time.perf_counter() - started)
+        rank = next((i for i, doc in enumerate(documents, 1) if item["evidence"] in doc.page_content), None)
+        if rank is not None:
+            hits += 1
+            reciprocal_ranks += 1 / rank
+    return {
+        "recall": round(hits / len(questions), 4),
+        "mrr": round(reciprocal_ranks / len(questions), 4),
+        "p50_ms": round(1000 * float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(1000 * float(np.percentile(latencies, 95)), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate retrieval quality against latency and index size.")
+    parser.add_argument("--corpus", help="JSON file with 'documents' and labeled 'questions'")
+    parser.add_argument("--documents", type=int, default=300, help="synthetic documents")
+    parser.add_argument("--questions", type=int, default=300)
+    parser.add_argument("--chunk-tokens", type=int, nargs="+", default=[128, 256, 512])
+    parser.add_argument("--overlap-tokens", type=int, default=48, help="capped at a quarter of the chunk size")
+    parser.add_argument("--backends", nargs="+", default=["numpy", "chroma"], choices=["numpy", "chroma"])
+    parser.add_argument("--search-types", nargs="+", default=["similarity", "mmr", "hybrid"],
+                        choices=["similarity", "mmr", "hybrid"])
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("chromadb.telemetry").setLevel(logging.CRITICAL)
+    # Chroma's L2 distances map to negative relevance scores; HybridRetriever normalizes them,
+    # but LangChain warns about them on every query
+    warnings.filterwarnings("ignore", message="Relevance scores must be between 0 and 1")
+    if args.corpus:
+        texts, questions = load_corpus(args.corpus)
+    else:
+        texts, questions = make_corpus(args.documents, args.questions)
+    print(f"{len(texts)} documents, {len(questions)} questions, embeddings: {os.environ['EMBEDDING_BACKEND']}\n")
+
+    results = []
+    print(f"{'chunk':>5} {'backend':<7} {'search':<10} {'k':>2} {'chunks':>6} {'index MB':>8} {'build s':>7} "
+          f"{'p50 ms':>7} {'p95 ms':>7} {'recall':>6} {'MRR':>6}")
+    workdir = tempfile.mkdtemp(prefix="bench_retrieval_")
+    try:
+        for chunk_tokens in args.chunk_tokens:
+            overlap_tokens = min(args.overlap_tokens, chunk_tokens // 4)
+            for backend in args.backends:
+                store, lexical_index, chunks, size, build_seconds = build_store(
+                    backend, texts, chunk_tokens, overlap_tokens, workdir)
+                for search_type in args.search_types:
+                    for k in args.k:
+                        result = {
+                            "chunk_tokens": chunk_tokens, "backend": backend, "search_type": search_type, "k": k,
+                            "chunks": chunks, "index_bytes": size, "build_seconds": round(build_seconds, 2),
+                            **evaluate(make_retriever(store, lexical_index, search_type, k), questions),
+                        }
+                        results.append(result)
+                        print(f"{chunk_tokens:>5} {backend:<7} {search_type:<10} {k:>2} {chunks:>6} "
+                              f"{size / 2 ** 20:>8.2f} {build_seconds:>7.2f} {result['p50_ms']:>7.2f} "
+                              f"{result['p95_ms']:>7.2f} {result['recall']:>6.3f} {result['mrr']:>6.3f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"arguments": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+# benchmarks/bench_serving.py
+#
+# Load test of /ask on the Flask server (one thread per request) and the ASGI app
+# (graph.astream on one event loop). The LLMs, graders and retriever are replaced by
+# stand-ins that sleep for a fixed latency, so the run measures serving overhead only.
+# Run from the repository root:
+#     python -m benchmarks.bench_serving --requests 400 --concurrency 50 200
+#
+# Each server runs in a subprocess whose peak resident memory and thread count are read
+# from /proc, so the script needs Linux. No API key is needed: web search is never called.
+
+import argparse
+import asyncio
+import logging
+import os
+import subprocess
+import sys
+import time
+import numpy as np
+
+os.environ.setdefault("EMBEDDING_BACKEND", "local")
+os.environ.setdefault("LLM_CACHE_ENABLED", "false")
+os.environ.setdefault("ANSWER_CACHE_ENABLED", "false")
+os.environ.setdefault("TAVILY_API_KEY", "offline")
+
+import aiohttp
+import requests
+import uvicorn
+from werkzeug.serving import make_server
+from langchain.schema import Document
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+from src.agent import graph as graph_module
+from src.agent.app import app as flask_app
+from src.agent.asgi import app as asgi_app
+
+
+def install_fakes(latency):
+    """Replaces the remote calls of the graph with stand-ins that take `latency` seconds."""
+    def fake(result):
+        def func(_):
+            time.sleep(latency)
+            return result
+
+        async def afunc(_):
+            await asyncio.sleep(latency)
+            return result
+        return RunnableLambda(func, afunc=afunc)
+
+    documents = [Document(page_content=f"Step {i}: a relevant fact.") for i in range(4)]
+    graph_module.llm = fake(AIMessage(content="Step 1: Heading\nExplanation"))
+    graph_module.retrieval_grader = fake({"score": 1})
+    graph_module.answer_grader = fake({"score": "yes"})
+    graph_module.get_retriever = lambda *args, **kwargs: fake(documents)
+
+
+def serve(name, port, latency):
+    """Runs one server with the stand-ins installed until the process is killed."""
+    install_fakes(latency)
+    logging.getLogger().setLevel(logging.WARNING)  # Per-node logging would dominate the measurement
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    if name == "flask":
+        make_server("127.0.0.1", port, flask_app, threaded=True).serve_forever()
+    else:
+        uvicorn.run(asgi_app, host="127.0.0.1", port=port, log_level="warning", backlog=4096)
+
+
+def process_usage(pid):
+    """Returns the resident memory in MB and the thread count of a process (Linux only)."""
+    usage = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "Threads"):
+                usage[key] = value.split()[0]
+    return int(usage["VmRSS"]) / 1024, int(usage["Threads"])
+
+
+async def load(url, total, concurrency, pid):
+    """
+    Sends `total` questions with at most `concurrency` in flight.
+
+    Returns:
+        Tuple: Per-request latencies, error count, wall time, and the server's peak RSS (MB) and threads.
+    """
+    latencies, errors = [], 0
+    peak_rss, peak_threads = process_usage(pid)
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(i)
+
+    # aiohttp rather than httpx: on a small machine the httpx client, not the server, becomes the bottleneck
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=300)) as client:
+        async def worker():
+            nonlocal errors
+            while not queue.empty():
+                i = queue.get_nowait()
+                start = time.perf_counter()
+                try:
+                    payload = {"question": f"question {i}", "vector_db_choice": "Wiki", "bypass_cache": True}
+                    async with client.post(url, json=payload) as response:
+                        await response.read()
+                        if response.status != 200:
+                            errors += 1
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        async def sample():
+            nonlocal peak_rss, peak_threads
+            while True:
+                rss, threads = process_usage(pid)
+                peak_rss, peak_threads = max(peak_rss, rss), max(peak_threads, threads)
+                await asyncio.sleep(0.1)
+
+        sampler = asyncio.create_task(sample())
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        seconds = time.perf_counter() - started
+        sampler.cancel()
+    return latencies, errors, seconds, peak_rss, peak_threads
+
+
+def wait_until_up(port, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/ready").status_code == 200:
+                return
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Flask and ASGI /ask endpoints.")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per fake LLM call")
+    parser.add_argument("--servers", nargs="+", default=["flask", "asgi"], choices=["flask", "asgi"])
+    parser.add_argument("--serve", choices=["flask", "asgi"], help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=5061)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.latency)
+        return
+
+    print(f"{'server':<8} {'conc':>6} {'req/s':>8} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7} {'rss MB':>8} {'threads':>8}")
+    for name in args.servers:
+        # Each server runs in its own process so the load generator doesn't compete with it for the GIL
+        server = subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.bench_serving", "--serve", name, "--port", str(args.port),
+             "--latency", str(args.latency)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_until_up(args.port)
+            for concurrency in args.concurrency:
+                latencies, errors, seconds, rss, threads = asyncio.run(
+                    load(f"http://127.0.0.1:{args.port}/ask", args.requests, concurrency, server.pid)
+                )
+                print(f"{name:<8} {concurrency:>6} {len(latencies) / seconds:>8.1f} "
+                      f"{1000 * np.percentile(latencies, 50):>9.1f} {1000 * np.percentile(latencies, 99):>9.1f} "
+                      f"{errors:>7} {rss:>8.0f} {threads:>8}")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
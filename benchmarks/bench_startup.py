@@ -0,0 +1,95 @@
+# benchmarks/bench_startup.py
+#
+# Cold start of the Flask server: seconds from process start until /health answers (the
+# worker accepts traffic) and until /ready reports every component loaded, with the load
+# time of each component. Then an import-time profile of the backend: the packages with
+# the largest cumulative import time, from `python -X importtime`.
+# Run from the repository root:
+#     python -m benchmarks.bench_startup --runs 3
+#
+# TAVILY_API_KEY must be set (any value) so that graph.py can be imported.
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+import requests
+
+SERVER = "from src.agent.app import app; app.run(host='127.0.0.1', port={port}, threaded=True)"
+
+
+def cold_start(port, timeout=120):
+    """
+    Starts a server process and polls it until it is ready.
+
+    Returns:
+        Tuple[float, float, dict]: Seconds until /health answered, until /ready returned 200,
+        and the component report.
+    """
+    env = {"EMBEDDING_BACKEND": "local", **os.environ}
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-c", SERVER.format(port=port)], env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    live = None
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                if live is None:
+                    requests.get(f"http://127.0.0.1:{port}/health", timeout=1)
+                    live = time.perf_counter() - started
+                response = requests.get(f"http://127.0.0.1:{port}/ready", timeout=5)
+                if response.status_code == 200:
+                    return live, time.perf_counter() - started, response.json()["components"]
+            except requests.exceptions.RequestException:
+                pass
+            time.sleep(0.01)
+        raise RuntimeError(f"Server on port {port} did not become ready")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def import_profile(module, top):
+    """
+    Imports `module` in a fresh interpreter with -X importtime.
+
+    Returns:
+        List[Tuple[str, float]]: The `top` top-level packages by cumulative import seconds.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            env={"EMBEDDING_BACKEND": "local", **os.environ}, capture_output=True, text=True)
+    packages = defaultdict(float)
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        # A package's cumulative time includes its submodules; keep the outermost entry
+        package = name.strip().split(".")[0]
+        packages[package] = max(packages[package], int(cumulative) / 1e6)
+    return sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the cold start and import profile of the server.")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--port", type=int, default=5090)
+    parser.add_argument("--top", type=int, default=15, help="packages shown in the import profile")
+    args = parser.parse_args()
+
+    print(f"{'run':>3} {'live s':>7} {'ready s':>8}  slowest components")
+    for run in range(args.runs):
+        live, ready, report = cold_start(args.port)
+        slowest = sorted(report.items(), key=lambda item: item[1]["seconds"] or 0, reverse=True)[:3]
+        print(f"{run + 1:>3} {live:>7.2f} {ready:>8.2f}  "
+              + ", ".join(f"{name} {component['seconds']:.2f}s" for name, component in slowest))
+
+    for module in ("src.agent.app", "src.agent.graph"):
+        print(f"\nImport profile of {module} (cumulative seconds per top-level package):")
+        for package, seconds in import_profile(module, args.top):
+            print(f"  {package:<40} {seconds:>6.3f}")
+
+
+if __name__ == "__main__":
+    main()
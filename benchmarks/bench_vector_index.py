@@ -0,0 +1,102 @@
+# benchmarks/bench_vector_index.py
+#
+# Compares query latency and recall@k of the NumPy index (exact and IVF) with Chroma
+# on synthetic clustered vectors. Recall is measured against exact NumPy search.
+# Run from the repository root:
+#     python -m benchmarks.bench_vector_index --vectors 100000 --dimensions 1024
+
+import argparse
+import shutil
+import tempfile
+import time
+import numpy as np
+from src.agent.numpy_index import NumpyVectorIndex
+
+
+def make_vectors(count, dimensions, clusters, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimensions))
+    vectors = centers[rng.integers(0, clusters, count)] + 0.5 * rng.normal(size=(count, dimensions))
+    return vectors.astype(np.float32)
+
+
+def percentile_ms(latencies, q):
+    return 1000 * float(np.percentile(latencies, q))
+
+
+def run_queries(search, queries, k):
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(search(query, k))
+        latencies.append(time.perf_counter() - start)
+    return latencies, results
+
+
+def recall(results, truth):
+    return float(np.mean([len(set(r) & set(t)) / len(t) for r, t in zip(results, truth)]))
+
+
+def report(name, latencies, results, truth, build_seconds):
+    print(f"{name:<18} {build_seconds:>9.2f} {percentile_ms(latencies, 50):>9.2f} "
+          f"{percentile_ms(latencies, 95):>9.2f} {recall(results, truth):>9.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark NumPy vector index against Chroma.")
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--dimensions", type=int, default=1024, help="nv-embedqa-e5-v5 produces 1024")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--lists", type=int, default=256, help="IVF partitions")
+    parser.add_argument("--probes", type=int, nargs="+", default=[4, 16])
+    parser.add_argument("--skip-chroma", action="store_true")
+    args = parser.parse_args()
+
+    vectors = make_vectors(args.vectors, args.dimensions, clusters=max(1, args.vectors // 200))
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.integers(0, len(vectors), args.queries)] + 0.2 * rng.normal(size=(args.queries, args.dimensions))
+    workdir = tempfile.mkdtemp(prefix="bench_vector_index_")
+
+    try:
+        print(f"{'backend':<18} {'build s':>9} {'p50 ms':>9} {'p95 ms':>9} {'recall':>9}")
+
+        start = time.perf_counter()
+        index = NumpyVectorIndex(f"{workdir}/numpy", n_lists=0)
+        for i in range(0, len(vectors), 10000):
+            index.add(vectors[i:i + 10000])
+        index.flush()
+        build_seconds = time.perf_counter() - start
+        latencies, truth = run_queries(lambda q, k: index.search(q, k)[0].tolist(), queries, args.k)
+        report("numpy exact", latencies, truth, truth, build_seconds)
+
+        start = time.perf_counter()
+        index.build_ivf(n_lists=args.lists)
+        build_seconds = time.perf_counter() - start
+        for probes in args.probes:
+            index.n_probe = probes
+            latencies, results = run_queries(lambda q, k: index.search(q, k)[0].tolist(), queries, args.k)
+            report(f"numpy ivf/{probes}", latencies, results, truth, build_seconds)
+
+        if not args.skip_chroma:
+            import chromadb
+            client = chromadb.PersistentClient(path=f"{workdir}/chroma")
+            collection = client.create_collection("bench", metadata={"hnsw:space": "cosine"})
+            start = time.perf_counter()
+            for i in range(0, len(vectors), 5000):
+                block = vectors[i:i + 5000]
+                collection.add(ids=[str(j) for j in range(i, i + len(block))], embeddings=block.tolist())
+            build_seconds = time.perf_counter() - start
+
+            def chroma_search(query, k):
+                result = collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])
+                return [int(doc_id) for doc_id in result["ids"][0]]
+
+            latencies, results = run_queries(chroma_search, queries, args.k)
+            report("chroma hnsw", latencies, results, truth, build_seconds)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
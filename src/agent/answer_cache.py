@@ -0,0 +1,131 @@
+# src/agent/answer_cache.py
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+import numpy as np
+from src.agent.ingest import get_embeddings, registry
+from src.agent.structured_logging import truncate
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# An answer is reused for a new question whose embedding has at least this cosine
+# similarity with the cached question, on the same collection at the same version
+ANSWER_CACHE_ENABLED = os.environ.get("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_THRESHOLD = float(os.environ.get("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.environ.get("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+ANSWER_CACHE_TTL = int(os.environ.get("ANSWER_CACHE_TTL", "86400"))
+
+
+class SemanticAnswerCache:
+    """
+    In-memory cache of generated answers, looked up by question similarity.
+
+    Entries are grouped per collection fingerprint: the vector store name and the number
+    of times its contents changed (see VectorStoreRegistry.mark_changed). An upload bumps
+    the version, in any worker process, so earlier answers for that collection stop matching
+    and are dropped on the next store. Entries are evicted least recently used first and after `ttl` seconds.
+    """
+
+    def __init__(self, threshold=ANSWER_CACHE_THRESHOLD, max_entries=ANSWER_CACHE_MAX_ENTRIES, ttl=ANSWER_CACHE_TTL):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # entry id -> (fingerprint, vector, question, answer, created)
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def fingerprint(self, vector_db_choice, namespace=None):
+        """
+        Returns the fingerprint of the collection a question is answered from.
+
+        Args:
+            vector_db_choice (str): Choice of vector store ('Wiki', 'ArXiv', 'Custom').
+            namespace (str, optional): Namespace of the custom collection.
+
+        Returns:
+            Tuple[str, int]: Vector store name and its current version.
+        """
+        name = registry.store_name(vector_db_choice, namespace)
+        return name, registry.version(name)
+
+    def _embed(self, question):
+        vector = np.asarray(get_embeddings().embed_query(question), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def lookup(self, question, vector_db_choice, namespace=None):
+        """
+        Returns a cached answer to a similar question on the same collection version.
+
+        Args:
+            question (str): The user's question.
+            vector_db_choice (str): Choice of vector store.
+            namespace (str, optional): Namespace of the custom collection.
+
+        Returns:
+            Tuple[str, tuple]: The cached answer or None, and the key to `store` the new answer
+            under: the collection fingerprint taken before the answer is generated, so an upload
+            during generation leaves the answer under the old version, and the question embedding.
+        """
+        fingerprint = self.fingerprint(vector_db_choice, namespace)
+        vector = self._embed(question)
+        now = time.time()
+        best_id, best_score = None, self.threshold
+        with self._lock:
+            for entry_id, (entry_fingerprint, entry_vector, _, _, created) in list(self._entries.items()):
+                if now - created > self.ttl:
+                    del self._entries[entry_id]
+                    continue
+                if entry_fingerprint != fingerprint:
+                    continue
+                score = float(entry_vector @ vector)
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+            if best_id is None:
+                self.misses += 1
+                return None, (fingerprint, vector)
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            _, _, cached_question, answer, _ = self._entries[best_id]
+        logging.info(f"Answer cache hit ({best_score:.3f}) for '{truncate(question, 200)}' "
+                     f"with cached question '{truncate(cached_question, 200)}'.")
+        return answer, (fingerprint, vector)
+
+    def store(self, question, answer, fingerprint, vector=None):
+        """
+        Caches an answer and drops entries of earlier versions of the same collection.
+
+        Args:
+            question (str): The question that was answered.
+            answer (str): The generated answer.
+            fingerprint (Tuple[str, int]): Collection fingerprint taken before the answer was
+                generated, from `lookup` or `fingerprint`.
+            vector (np.ndarray, optional): Question embedding returned by `lookup`.
+        """
+        if registry.version(fingerprint[0]) != fingerprint[1]:
+            # The collection changed while the answer was generated; it would never be looked up
+            logging.info(f"Not caching the answer to '{truncate(question, 200)}': {fingerprint[0]} changed meanwhile.")
+            return
+        if vector is None:
+            vector = self._embed(question)
+        with self._lock:
+            stale = [entry_id for entry_id, entry in self._entries.items()
+                     if entry[0][0] == fingerprint[0] and entry[0][1] != fingerprint[1]]
+            for entry_id in stale:
+                del self._entries[entry_id]
+            self._entries[self._next_id] = (fingerprint, vector, question, answer, time.time())
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+answer_cache = SemanticAnswerCache()
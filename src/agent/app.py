@@ -1,13 +1,22 @@
 # src/agent/app.py
 
-from flask import Flask, request, jsonify
+import time
+
+_import_started = time.perf_counter()
+
+from flask import Flask, Response, request, jsonify, stream_with_context
 import os
+import json
 import logging
+import importlib
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
-from src.agent.ingest import create_custom_vectorstore_from_file
-from src.agent.graph import workflow, graph
+from src.agent import metrics
+from src.agent.parsing import allowed_file
+from src.agent.startup import components, record_startup_timing, startup_timings
+from src.agent.structured_logging import TRACE_HEADER, current_trace_id, log_payload, start_trace, truncate
 import uuid
+from contextlib import nullcontext
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -19,32 +28,127 @@ CORS(app)  # Enable CORS for all routes
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 UPLOAD_FOLDER = 'uploads'
-ALLOWED_EXTENSIONS = {'txt', 'csv', 'pdf', 'docx'}
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16 MB max file size
 
 # Ensure upload folder exists
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-# In-memory storage for graph states
-graph_states = {}
-
-def allowed_file(filename):
-    """Check if the uploaded file is in allowed extensions."""
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+def _load_module(name, start=None):
+    """Returns a loader that imports src.agent.<name> and calls `start` on it, for a component."""
+    def load():
+        module = importlib.import_module(f"src.agent.{name}")
+        if start is not None:
+            start(module)
+        return module
+    return load
+
+# The heavy parts of the backend are components, loaded in this order by the warm-up thread
+# started below or by the first request that needs them, so the server accepts connections
+# right away. Each name stands in for its module; /ready reports their progress.
+# The graph module builds the LLM clients, the search tools and the compiled graph.
+graph_module = components.register("graph", _load_module("graph"))
+llm_cache = components.register("llm_cache", _load_module("llm_cache"))
+answer_cache = components.register("answer_cache", _load_module("answer_cache"))
+# Delete the checkpoints of sessions abandoned while waiting for a search tool choice
+checkpoints = components.register("checkpoints", _load_module("checkpoints", lambda m: m.checkpointer.start_sweeper()))
+# Close and archive idle namespaces in the background
+namespaces = components.register("namespaces", _load_module("namespaces", lambda m: m.namespaces.start_sweeper()))
+jobs = components.register("jobs", _load_module("jobs"))
+ingest = components.register("embeddings", _load_module("ingest", lambda m: m.get_embeddings()))
+# Open the vector stores ahead of the first query
+for _name in ("Wiki", "ArXiv", "Custom"):
+    components.register(f"vectorstore.{_name}", lambda name=_name: ingest.registry.get(name))
+components.warm_up(background=True)
+
+@app.before_request
+def _start_trace():
+    # Everything logged for the request, down to the graph nodes and search calls, carries this id
+    start_trace(request.headers.get(TRACE_HEADER))
+
+@app.after_request
+def _return_trace_id(response):
+    response.headers[TRACE_HEADER] = current_trace_id()
+    return response
+
+def _cache_stats():
+    """Returns the stats of each enabled cache, keyed by cache name. Caches not loaded yet are left out."""
+    caches = {}
+    if components.is_ready('answer_cache') and answer_cache.ANSWER_CACHE_ENABLED:
+        caches['answer'] = answer_cache.answer_cache.stats()
+    if components.is_ready('llm_cache') and llm_cache.llm_cache is not None:
+        caches['llm'] = llm_cache.llm_cache.stats()
+    if components.is_ready('embeddings'):
+        embeddings = ingest.get_embeddings()
+        if hasattr(embeddings, 'stats'):
+            caches['embedding'] = embeddings.stats()
+    return caches
+
+def _cache_metric(field):
+    return lambda: {(name,): stats.get(field) for name, stats in _cache_stats().items()}
+
+# The caches, sessions and reranker keep their own counters; they are read when /metrics is scraped
+metrics.registry.callback("rag_cache_hits_total", "Cache hits.", ["cache"], _cache_metric('hits'), type="counter")
+metrics.registry.callback("rag_cache_misses_total", "Cache misses.", ["cache"], _cache_metric('misses'), type="counter")
+metrics.registry.callback("rag_cache_entries", "Entries held by each cache.", ["cache"], _cache_metric('entries'))
+metrics.registry.callback("rag_sessions_waiting", "Sessions checkpointed while waiting for a search tool choice.", [],
+                          lambda: {(): checkpoints.checkpointer.sessions()} if components.is_ready('checkpoints') else {})
+metrics.registry.callback("rag_rerank_grader_calls_saved_total", "LLM grader calls the reranker saved, against grading the documents retrieved without it.", [],
+                          lambda: {(): graph_module.reranker.stats()['grader_calls_saved']
+                                   if graph_module.reranker is not None else 0} if components.is_ready('graph') else {},
+                          type="counter")
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint."""
+    """Liveness endpoint: the process serves requests, whether or not it has warmed up."""
     return jsonify({'status': 'healthy'}), 200
 
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness endpoint: 200 once every component is loaded, 503 with the status of each before."""
+    report = components.report()
+    return jsonify(report), 200 if report['ready'] else 503
+
+@app.route('/startup', methods=['GET'])
+def startup_profile():
+    """Reports how long each startup step and component load took, and which vector stores are open."""
+    if components.is_ready('graph'):
+        report = graph_module.startup_report()
+    else:
+        report = {'timings': dict(startup_timings), 'open_vectorstores': []}
+    return jsonify({**report, 'components': components.report()['components']}), 200
+
+@app.route('/cache', methods=['GET'])
+def cache_stats():
+    """Reports the size and hit counts of the answer and LLM caches."""
+    llm_stats = llm_cache.llm_cache.stats() if llm_cache.llm_cache is not None else None
+    return jsonify({'answers': answer_cache.answer_cache.stats(), 'llm': llm_stats}), 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Serves node, LLM, embedding, search and cache metrics in the Prometheus text format."""
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/upload', methods=['POST'])
 def upload_file():
     """
-    Upload documents and use them to create a custom vector database.
+    Upload documents and queue a background job that adds them to the custom vector database.
+    Returns the job id right away; progress is reported by /upload/<job_id>.
+    An optional 'namespace' form field selects the session's or tenant's own collection.
     """
     logging.info("Received upload request")
 
+    namespace = request.form.get('namespace') or None
+    try:
+        namespaces.namespaces.touch(namespace)
+        namespaces.namespaces.check_limits(namespace)
+    except namespaces.NamespaceLimitError as e:
+        logging.error(str(e))
+        return jsonify({'error': str(e)}), 413
+    except ValueError as e:
+        logging.error(str(e))
+        return jsonify({'error': str(e)}), 400
+
     if 'file' not in request.files:
         logging.error("No file part in the request")
         return jsonify({'error': 'No file part in the request'}), 400
@@ -55,112 +159,157 @@ def upload_file():
         logging.error("No selected file")
         return jsonify({'error': 'No selected file'}), 400
 
-    uploaded_docs = []
+    saved_files = []
 
     for file in files:
         if file and allowed_file(file.filename):
             filename = secure_filename(file.filename)
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+            # Unique path, so concurrent uploads of the same file name don't overwrite each other
+            file_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{uuid.uuid4().hex}_{filename}")
             file.save(file_path)
+            saved_files.append((filename, file_path))
             logging.info(f"File uploaded: {filename}")
-
-            # Read file contents
-            try:
-                if filename.lower().endswith('.pdf'):
-                    from langchain_community.document_loaders import PDFMinerLoader
-                    loader = PDFMinerLoader(file_path)
-                    pdf_pages = loader.load_and_split()
-                    for page in pdf_pages:
-                        uploaded_docs.append({
-                            "title": filename,
-                            "text": page.page_content
-                        })
-                elif filename.lower().endswith(('.txt', '.csv', '.docx')):
-                    if filename.lower().endswith('.docx'):
-                        from langchain_community.document_loaders import UnstructuredWordDocumentLoader
-                        loader = UnstructuredWordDocumentLoader(file_path)
-                        loaded_docs = loader.load()
-                        for doc in loaded_docs:
-                            uploaded_docs.append({
-                                "title": filename,
-                                "text": doc.page_content
-                            })
-                    else:
-                        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                            file_content = f.read()
-                            uploaded_docs.append({
-                                "title": filename,
-                                "text": file_content
-                            })
-                    logging.info(f"Processed file: {filename}")
-                else:
-                    logging.error(f"Unsupported file type: {filename}")
-                    return jsonify({'error': f"Unsupported file type: {filename}"}), 400
-            except Exception as e:
-                logging.error(f"Error reading file {filename}: {str(e)}")
-                return jsonify({'error': f"Error reading file {filename}: {str(e)}"}), 500
         else:
             logging.error(f"Invalid file type: {file.filename}")
             return jsonify({'error': f'Invalid file type: {file.filename}'}), 400
 
-    if not uploaded_docs:
-        logging.error("No valid documents were uploaded")
-        return jsonify({'error': 'No valid documents were uploaded'}), 400
+    job = jobs.upload_jobs.submit(saved_files, namespace=namespace)
+    return jsonify({
+        'status': 'Files uploaded, processing started',
+        'job_id': job.job_id,
+        'status_url': f"/upload/{job.job_id}",
+    }), 202
+
+@app.route('/upload/<job_id>', methods=['GET'])
+def upload_status(job_id):
+    """Report the progress of an upload job, per file and per ingestion stage."""
+    job = jobs.upload_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown upload job: {job_id}'}), 404
+    return jsonify(job.to_dict()), 200
+
+def uses_answer_cache(session_id, user_choice, bypass_cache):
+    """Only new questions are looked up; a session resuming with a search tool choice is not."""
+    return answer_cache.ANSWER_CACHE_ENABLED and not bypass_cache and not user_choice
+
+def _cached_answer(question, vector_db_choice, session_id, user_choice, namespace, bypass_cache):
+    """
+    Looks a new question up in the answer cache.
 
-    # Create custom vector database with the uploaded documents
+    Questions that are not looked up still get the fingerprint of the collection version
+    the run starts from, so their answer is stored under it.
+
+    Returns:
+        Tuple[str, tuple]: The cached answer or None, and the key to store the answer under
+        (see SemanticAnswerCache.lookup), or None if the cache is disabled.
+    """
+    if not answer_cache.ANSWER_CACHE_ENABLED:
+        return None, None
     try:
-        create_custom_vectorstore_from_file(uploaded_docs)
-        logging.info("Custom vector database created successfully.")
+        if not uses_answer_cache(session_id, user_choice, bypass_cache):
+            return None, (answer_cache.answer_cache.fingerprint(vector_db_choice, namespace), None)
+        return answer_cache.answer_cache.lookup(question, vector_db_choice, namespace)
     except Exception as e:
-        logging.error(f"Error creating vector database: {str(e)}")
-        return jsonify({'error': f"Failed to create vector database: {str(e)}"}), 500
+        logging.error(f"Error during answer cache lookup: {str(e)}")
+        return None, None
+
+def _store_answer(state, question, cache_key, generation):
+    if cache_key is None:
+        return
+    fingerprint, question_vector = cache_key
+    try:
+        # The graph may have rewritten the question, in which case it is embedded again
+        answer_cache.answer_cache.store(state['question'], generation, fingerprint,
+                                        vector=question_vector if state['question'] == question else None)
+    except Exception as e:
+        logging.error(f"Error storing answer in cache: {str(e)}")
+
+def _session_input(question, vector_db_choice, session_id, user_choice, namespace):
+    """
+    Prepares a graph run for the session, whose id is the checkpointer's thread id.
 
-    return jsonify({'status': 'Files uploaded and custom vector database created'}), 200
+    A session paused in websearch that now has a tool choice resumes from its checkpoint.
+    Anything else starts a new run on a cleared thread.
 
-def run_graph_workflow(question: str, vector_db_choice: str, session_id: str, user_choice: str = None):
+    Returns:
+        Tuple[Any, dict, dict]: The graph input (a new state or a resume Command), the run
+        config, and the state the run starts from.
+    """
+    from langgraph.types import Command  # Loaded with the graph
+
+    config = {"configurable": {"thread_id": session_id}}
+    if user_choice:
+        snapshot = graph_module.graph.get_state(config)
+        if snapshot.interrupts:
+            logging.info(f"Resuming session {session_id} with {user_choice}.")
+            # The time spent waiting for the user doesn't count against the deadline
+            resume = Command(resume=user_choice, update={'deadline': time.time() + graph_module.REQUEST_DEADLINE_SECONDS})
+            return resume, config, dict(snapshot.values)
+    checkpoints.checkpointer.delete_thread(session_id)
+    state = {'question': question, 'vector_db_choice': vector_db_choice, 'namespace': namespace, **graph_module.new_budget()}
+    # A tool choice for a session that expired still applies to the new run
+    if user_choice:
+        state['selected_tool'] = user_choice
+    return state, config, dict(state)
+
+def _interrupt_options(interrupts):
+    """Returns the search tool options of the websearch interrupt."""
+    return interrupts[0].value['options']
+
+def budget_report(state):
+    """Returns how much of the request budget a finished run used."""
+    return {'budget_exhausted': bool(state.get('budget_exhausted')), 'iterations': state.get('iterations', 0),
+            'llm_calls': state.get('llm_calls', 0)}
+
+def run_graph_workflow(question: str, vector_db_choice: str, session_id: str, user_choice: str = None,
+                       namespace: str = None, bypass_cache: bool = False):
     """
     Runs the graph workflow with the given question and returns the generated AI answer.
+    With bypass_cache, the answer and LLM caches are not consulted (fresh results are still stored).
     """
-    if graph is None:
+    if graph_module.graph is None:
         logging.error("Graph is not initialized.")
         return {'error': "Error: Graph not initialized."}
+    if bypass_cache:
+        with llm_cache.bypass():
+            return _run_graph_workflow(question, vector_db_choice, session_id, user_choice, namespace, bypass_cache)
+    return _run_graph_workflow(question, vector_db_choice, session_id, user_choice, namespace, bypass_cache)
 
-    # Retrieve or initialize the state for this session
-    state = graph_states.get(session_id, {'question': question, 'vector_db_choice': vector_db_choice})
-
-    # If user_choice is provided, include it in the state
-    if user_choice:
-        state['selected_tool'] = user_choice
-        # Also, reset 'need_user_input' in case it was set previously
-        state['need_user_input'] = False
+def _run_graph_workflow(question, vector_db_choice, session_id, user_choice, namespace, bypass_cache):
+    # Answer a new question from the cache when a similar one was answered on the same collection version
+    cached_answer, cache_key = _cached_answer(question, vector_db_choice, session_id, user_choice, namespace, bypass_cache)
+    if cached_answer is not None:
+        return {'answer': cached_answer, 'cached': True}
 
     output = {}
     try:
-        # Run the graph with the current state using stream
-        events = graph.stream(state, stream_mode="values")
+        graph_input, config, state = _session_input(question, vector_db_choice, session_id, user_choice, namespace)
+        # Run the graph with the current state using stream. With durability="exit" the checkpoint
+        # is written once, when the run pauses or ends, instead of after every node
+        events = graph_module.graph.stream(graph_input, config, stream_mode="values", durability="exit")
         for event in events:
+            if '__interrupt__' in event:
+                # The run is checkpointed under the session id until the user picks a search tool
+                logging.info("Need user input. Options provided.")
+                return {'need_user_input': True, 'options': _interrupt_options(event['__interrupt__']),
+                        'session_id': session_id}
+
             state.update(event)
             output.update(event)
-            logging.info(f"Graph event: {event}")
+            log_payload("Graph event", event)
 
             if 'error' in state:
                 logging.error(f"Error in graph execution: {state['error']}")
                 return {'error': state['error']}
 
-            if state.get('need_user_input'):
-                logging.info("Need user input. Options provided.")
-                # Save the state before returning
-                graph_states[session_id] = state
-                return {'need_user_input': True, 'options': state['options'], 'session_id': session_id}
-
-            if 'generation' in output:
-                generation = output['generation']
-                # Clean up the state after completion
-                if session_id in graph_states:
-                    del graph_states[session_id]
-                logging.info("Generation completed successfully.")
-                return {'answer': generation}
-        
+        # The run ends with a useful answer or once its budget is spent
+        if 'generation' in output:
+            generation = output['generation']
+            if state.get('grade') == 'useful':
+                _store_answer(state, question, cache_key, generation)
+            logging.info(f"Generation completed successfully: {budget_report(state)}")
+            return {'answer': generation, **budget_report(state)}
+
         if not output:
             logging.error("No output received from the graph.")
             return {'error': "Error: No output received from the AI."}
@@ -172,30 +321,156 @@ def run_graph_workflow(question: str, vector_db_choice: str, session_id: str, us
     logging.error("No 'generation' found in the graph output.")
     return {'error': "Error: No generation found in the AI response."}
 
+class AnswerStream:
+    """
+    Turns the chunks of graph.stream / graph.astream with stream_mode=["updates", "messages"]
+    into the events of /ask/stream, saving the session state and caching the answer on the way.
+    """
+
+    def __init__(self, question, session_id, state, cache_key=None):
+        self.question = question
+        self.session_id = session_id
+        self.state = state
+        self.cache_key = cache_key
+        self.started = time.perf_counter()
+        self.first_token = True
+        self.done = False
+
+    def events(self, mode, chunk):
+        """
+        Args:
+            mode (str): 'updates' or 'messages'.
+            chunk: The graph stream chunk for that mode.
+
+        Returns:
+            List[dict]: Events with a 'type' key. `done` is set once the stream is complete.
+        """
+        if mode == "messages":
+            # 'messages' carries the LLM tokens of every node; only those of generate are part of the answer
+            message, metadata = chunk
+            if metadata.get("langgraph_node") != "generate" or not message.content:
+                return []
+            if self.first_token:
+                logging.info(f"Time to first token: {time.perf_counter() - self.started:.2f}s")
+                self.first_token = False
+            return [{'type': 'token', 'content': message.content}]
+
+        events = []
+        state = self.state
+        for node, update in chunk.items():
+            if node == '__interrupt__':
+                # The run is checkpointed under the session id until the user picks a search tool
+                logging.info("Need user input. Options provided.")
+                events.append({'type': 'need_user_input', 'options': _interrupt_options(update),
+                               'session_id': self.session_id})
+                self.done = True
+                break
+
+            state.update(update or {})
+            events.append({'type': 'node', 'node': node})
+
+            if 'error' in state:
+                logging.error(f"Error in graph execution: {state['error']}")
+                events.append({'type': 'error', 'error': state['error']})
+                self.done = True
+            elif node == 'generate':
+                events.append({'type': 'answer', 'answer': state['generation'], 'cached': False})
+            elif node == 'grade_generation':
+                events.append({'type': 'grade', 'grade': state['grade'], **budget_report(state)})
+                # An answer that is not useful is followed by another attempt while the budget lasts
+                if state['grade'] == 'useful':
+                    _store_answer(state, self.question, self.cache_key, state['generation'])
+                self.done = state['grade'] == 'useful' or bool(state.get('budget_exhausted'))
+                if self.done:
+                    logging.info(f"Generation completed successfully: {budget_report(state)}")
+            if self.done:
+                break
+        return events
+
+def stream_graph_workflow(question: str, vector_db_choice: str, session_id: str, user_choice: str = None,
+                          namespace: str = None, bypass_cache: bool = False):
+    """
+    Runs the graph workflow and yields events as they happen: a 'node' event when each node
+    finishes, 'token' events with the answer text as the generator produces it, then the
+    'answer', and the 'grade' of the answer with the budget used so far. An answer that is
+    not useful is followed by another attempt until the request budget is spent.
+    'need_user_input' and 'error' events end the stream early, and a cached answer is sent
+    as a single 'answer' event.
+
+    Yields:
+        dict: Events with a 'type' key.
+    """
+    if graph_module.graph is None:
+        logging.error("Graph is not initialized.")
+        yield {'type': 'error', 'error': "Error: Graph not initialized."}
+        return
+    with llm_cache.bypass() if bypass_cache else nullcontext():
+        cached_answer, cache_key = _cached_answer(question, vector_db_choice, session_id, user_choice,
+                                                        namespace, bypass_cache)
+        if cached_answer is not None:
+            yield {'type': 'answer', 'answer': cached_answer, 'cached': True}
+            return
+
+        try:
+            graph_input, config, state = _session_input(question, vector_db_choice, session_id, user_choice, namespace)
+            stream = AnswerStream(question, session_id, state, cache_key)
+            for mode, chunk in graph_module.graph.stream(graph_input, config, stream_mode=["updates", "messages"], durability="exit"):
+                yield from stream.events(mode, chunk)
+                if stream.done:
+                    return
+        except Exception as e:
+            logging.error(f"Error during graph processing: {str(e)}")
+            yield {'type': 'error', 'error': f"Error during AI processing: {str(e)}"}
+            return
+
+    yield {'type': 'error', 'error': "Error: No generation found in the AI response."}
+
+def ask_arguments(data):
+    """
+    Reads the arguments of /ask and /ask/stream from the JSON body.
+
+    Args:
+        data (dict): The JSON request body.
+
+    Returns:
+        dict: Keyword arguments for run_graph_workflow and stream_graph_workflow.
+
+    Raises:
+        ValueError: If the question is missing or the namespace is invalid.
+    """
+    if not data or 'question' not in data:
+        raise ValueError('No question provided')
+
+    arguments = {
+        'question': data['question'],
+        'vector_db_choice': data.get('vector_db_choice', 'Custom'),  # Set 'Custom' as default
+        'session_id': data.get('session_id', str(uuid.uuid4())),
+        'user_choice': data.get('user_choice', None),
+        'namespace': data.get('namespace') or None,
+        'bypass_cache': bool(data.get('bypass_cache', False)),
+    }
+    namespaces.namespaces.touch(arguments['namespace'])
+
+    logging.info(f"Received question: {truncate(arguments['question'], 200)} (vector database: "
+                 f"{arguments['vector_db_choice']}, user choice: {arguments['user_choice']}, "
+                 f"session: {arguments['session_id']}, namespace: {arguments['namespace']})")
+    return arguments
+
 @app.route('/ask', methods=['POST'])
 def ask_question():
     """Handle AI queries."""
     try:
-        data = request.json
-        if not data or 'question' not in data:
-            logging.error("No question provided in the request")
-            return jsonify({'error': 'No question provided'}), 400
-
-        question = data['question']
-        vector_db_choice = data.get('vector_db_choice', 'Custom')  # Set 'Custom' as default
-        user_choice = data.get('user_choice', None)
-        session_id = data.get('session_id', str(uuid.uuid4()))
-
-        logging.info(f"Received question: {question}")
-        logging.info(f"Selected vector database: {vector_db_choice}")
-        logging.info(f"User choice: {user_choice}")
-        logging.info(f"Session ID: {session_id}")
+        try:
+            arguments = ask_arguments(request.json)
+        except ValueError as e:
+            logging.error(str(e))
+            return jsonify({'error': str(e)}), 400
 
         # Use the helper function to run the graph workflow and get the AI-generated answer
-        response_data = run_graph_workflow(question, vector_db_choice, session_id, user_choice)
+        response_data = run_graph_workflow(**arguments)
 
         if 'answer' in response_data:
-            return jsonify({'answer': response_data['answer']}), 200
+            return jsonify({'cached': False, **response_data}), 200
         elif 'need_user_input' in response_data and response_data['need_user_input']:
             return jsonify({
                 'need_user_input': True,
@@ -210,6 +485,30 @@ def ask_question():
         logging.error(f"Unexpected error during question processing: {str(e)}")
         return jsonify({'error': f'Internal server error: {str(e)}'}), 500
 
+@app.route('/ask/stream', methods=['POST'])
+def ask_question_stream():
+    """
+    Handle AI queries, streaming progress and answer tokens as JSON lines
+    (see stream_graph_workflow for the event types).
+    """
+    try:
+        arguments = ask_arguments(request.json)
+    except ValueError as e:
+        logging.error(str(e))
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logging.error(f"Unexpected error during question processing: {str(e)}")
+        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
+
+    def generate_lines():
+        for event in stream_graph_workflow(**arguments):
+            yield json.dumps(event) + "\n"
+
+    return Response(stream_with_context(generate_lines()), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+record_startup_timing("app.import", _import_started)
+
 if __name__ == '__main__':
     os.makedirs(UPLOAD_FOLDER, exist_ok=True)
     app.run(debug=True, host='0.0.0.0', port=5050)
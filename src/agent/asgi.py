@@ -0,0 +1,216 @@
+# src/agent/asgi.py
+#
+# Async serving mode: /ask and /ask/stream run the graph with astream() on one event loop,
+# so a waiting request costs a coroutine instead of a thread. All other routes are served
+# by the Flask app. Start it with:
+#     uvicorn src.agent.asgi:app --host 0.0.0.0 --port 5050
+
+import os
+import json
+import asyncio
+import logging
+from contextlib import aclosing, nullcontext
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.wsgi import WSGIMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+from src.agent import llm_cache
+from src.agent.app import (app as flask_app, AnswerStream, ask_arguments, uses_answer_cache,
+                           _cached_answer, _session_input, checkpoints, graph_module)
+from src.agent.startup import components
+from src.agent.structured_logging import TRACE_HEADER, start_trace
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# At most ASGI_MAX_CONCURRENCY questions run through the graph at once; up to
+# ASGI_MAX_WAITING more wait for a slot and further requests are rejected with 503
+ASGI_MAX_CONCURRENCY = int(os.environ.get("ASGI_MAX_CONCURRENCY", "256"))
+ASGI_MAX_WAITING = int(os.environ.get("ASGI_MAX_WAITING", "1024"))
+
+_slots = asyncio.Semaphore(ASGI_MAX_CONCURRENCY)
+_waiting = 0
+_in_flight = 0
+
+
+class ServerBusyError(Exception):
+    """Raised when too many questions are already waiting for a slot."""
+
+
+async def astream_graph_workflow(question, vector_db_choice, session_id, user_choice=None, namespace=None,
+                                 bypass_cache=False, stream_mode=("updates", "messages")):
+    """
+    Async version of stream_graph_workflow, driving the graph with astream().
+
+    Args:
+        stream_mode (tuple): Pass ("updates",) to skip the token events.
+
+    Yields:
+        dict: Events with a 'type' key.
+
+    Raises:
+        ServerBusyError: If ASGI_MAX_WAITING questions are already waiting for a slot.
+    """
+    global _waiting, _in_flight
+    if _waiting >= ASGI_MAX_WAITING:
+        raise ServerBusyError("Too many questions in progress, try again later.")
+    _waiting += 1
+    try:
+        await _slots.acquire()
+    finally:
+        _waiting -= 1
+    _in_flight += 1
+    try:
+        with llm_cache.bypass() if bypass_cache else nullcontext():
+            # The answer cache embeds the question, which may block on the embedding endpoint
+            if uses_answer_cache(session_id, user_choice, bypass_cache):
+                cached_answer, cache_key = await asyncio.to_thread(
+                    _cached_answer, question, vector_db_choice, session_id, user_choice, namespace, bypass_cache
+                )
+            else:
+                cached_answer, cache_key = _cached_answer(question, vector_db_choice, session_id, user_choice,
+                                                          namespace, bypass_cache)
+            if cached_answer is not None:
+                yield {'type': 'answer', 'answer': cached_answer, 'cached': True}
+                return
+
+            try:
+                graph_input, config, state = await asyncio.to_thread(
+                    _session_input, question, vector_db_choice, session_id, user_choice, namespace
+                )
+                stream = AnswerStream(question, session_id, state, cache_key)
+                async for mode, chunk in graph_module.graph.astream(graph_input, config, stream_mode=list(stream_mode), durability="exit"):
+                    for event in stream.events(mode, chunk):
+                        yield event
+                    if stream.done:
+                        return
+            except Exception as e:
+                logging.error(f"Error during graph processing: {str(e)}")
+                yield {'type': 'error', 'error': f"Error during AI processing: {str(e)}"}
+                return
+        yield {'type': 'error', 'error': "Error: No generation found in the AI response."}
+    finally:
+        _in_flight -= 1
+        _slots.release()
+
+
+async def _loaded(*names):
+    """Waits for components that are still loading on a worker thread, so the event loop isn't blocked."""
+    for name in names:
+        if not components.is_ready(name):
+            await asyncio.to_thread(components.get, name)
+
+
+async def _read_arguments(request):
+    """Returns the /ask arguments, or a 400 response if they are invalid."""
+    try:
+        await _loaded("graph", "llm_cache", "answer_cache", "checkpoints", "namespaces")
+    except Exception as e:
+        return None, JSONResponse({'error': f'Server not ready: {str(e)}'}, status_code=503)
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    try:
+        return ask_arguments(data), None
+    except ValueError as e:
+        logging.error(str(e))
+        return None, JSONResponse({'error': str(e)}, status_code=400)
+
+
+async def ask_question(request: Request):
+    """Handle AI queries; same request and response bodies as the Flask /ask route."""
+    arguments, error_response = await _read_arguments(request)
+    if error_response:
+        return error_response
+    try:
+        # Like the Flask route, answer once the graph settles on an answer: a useful one, or the
+        # latest when the request budget is spent. Closing the stream frees the slot.
+        answer = None
+        async with aclosing(astream_graph_workflow(**arguments, stream_mode=("updates",))) as events:
+            async for event in events:
+                if event['type'] == 'answer':
+                    answer = {'answer': event['answer'], 'cached': event['cached']}
+                    if event['cached']:
+                        return JSONResponse(answer)
+                if event['type'] == 'grade' and answer is not None:
+                    report = {key: event[key] for key in ('budget_exhausted', 'iterations', 'llm_calls')}
+                    if event['grade'] == 'useful' or event['budget_exhausted']:
+                        return JSONResponse({**answer, **report})
+                if event['type'] == 'need_user_input':
+                    return JSONResponse({'need_user_input': True, 'options': event['options'],
+                                         'session_id': event['session_id']})
+                if event['type'] == 'error':
+                    return JSONResponse({'error': event['error']}, status_code=500)
+    except ServerBusyError as e:
+        return JSONResponse({'error': str(e)}, status_code=503)
+    except Exception as e:
+        logging.error(f"Unexpected error during question processing: {str(e)}")
+        return JSONResponse({'error': f'Internal server error: {str(e)}'}, status_code=500)
+    return JSONResponse({'error': 'No answer generated by the AI.'}, status_code=500)
+
+
+async def ask_question_stream(request: Request):
+    """Handle AI queries, streaming progress and answer tokens as JSON lines."""
+    arguments, error_response = await _read_arguments(request)
+    if error_response:
+        return error_response
+    if _waiting >= ASGI_MAX_WAITING:
+        return JSONResponse({'error': "Too many questions in progress, try again later."}, status_code=503)
+
+    async def generate_lines():
+        try:
+            async for event in astream_graph_workflow(**arguments):
+                yield json.dumps(event) + "\n"
+        except ServerBusyError as e:
+            yield json.dumps({'type': 'error', 'error': str(e)}) + "\n"
+
+    return StreamingResponse(generate_lines(), media_type='application/x-ndjson',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+class TraceMiddleware:
+    """
+    Starts the trace of each HTTP request and returns its id in the X-Request-ID header.
+
+    The request runs in its own task, so the trace id stays with it through the graph and
+    the worker threads it starts. Requests passed on to Flask carry the header, so Flask logs
+    under the same id.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        header = TRACE_HEADER.lower().encode()
+        received = next((value.decode("latin-1") for name, value in scope["headers"] if name == header), None)
+        trace_id = start_trace(received)
+        if received != trace_id:
+            scope = {**scope, "headers": [(name, value) for name, value in scope["headers"] if name != header]
+                     + [(header, trace_id.encode("latin-1"))]}
+
+        async def send_with_trace_id(message):
+            if message["type"] == "http.response.start" and not any(name.lower() == header
+                                                                     for name, _ in message.get("headers", [])):
+                message = {**message, "headers": [*message.get("headers", []), (header, trace_id.encode("latin-1"))]}
+            await send(message)
+
+        await self.app(scope, receive, send_with_trace_id)
+
+
+async def health(request: Request):
+    # Liveness only; /ready (served by Flask) reports whether the components are loaded
+    sessions = checkpoints.checkpointer.sessions() if components.is_ready('checkpoints') else None
+    return JSONResponse({'status': 'ok', 'in_flight': _in_flight, 'waiting': _waiting, 'sessions': sessions})
+
+
+app = Starlette(routes=[
+    Route('/ask', ask_question, methods=['POST']),
+    Route('/ask/stream', ask_question_stream, methods=['POST']),
+    Route('/health', health, methods=['GET']),
+    Mount('/', app=WSGIMiddleware(flask_app)),
+], middleware=[Middleware(TraceMiddleware)])
@@ -0,0 +1,127 @@
+# src/agent/checkpoints.py
+
+import os
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.constants import INTERRUPT
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Graph checkpoints of sessions waiting for a search tool choice; a session untouched for
+# SESSION_TTL seconds is deleted by the sweeper
+SESSION_CHECKPOINT_PATH = os.environ.get("SESSION_CHECKPOINT_PATH", "checkpoints.sqlite")
+SESSION_TTL = int(os.environ.get("SESSION_TTL", "3600"))
+SESSION_SWEEP_INTERVAL = int(os.environ.get("SESSION_SWEEP_INTERVAL", "300"))
+
+
+class SessionCheckpointer(SqliteSaver):
+    """
+    SQLite checkpointer with one thread per session id and time-based expiry.
+
+    SqliteSaver only implements the synchronous interface; the async methods used by
+    graph.astream() run the same queries on a worker thread. The time a session was last
+    written is tracked in its own table so abandoned sessions can be expired, along with
+    whether its latest checkpoint is paused on an interrupt. With durability="exit",
+    finished runs are checkpointed too.
+    """
+
+    def __init__(self, path=SESSION_CHECKPOINT_PATH):
+        """
+        Args:
+            path (str): Location of the SQLite database file.
+        """
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        super().__init__(conn)
+        self.setup()
+        with self.cursor() as cur:
+            cur.execute("CREATE TABLE IF NOT EXISTS session_activity (thread_id TEXT PRIMARY KEY, updated REAL NOT NULL, "
+                        "waiting INTEGER NOT NULL DEFAULT 0)")
+            columns = [row[1] for row in cur.execute("PRAGMA table_info(session_activity)")]
+            if "waiting" not in columns:  # Created by an earlier version
+                cur.execute("ALTER TABLE session_activity ADD COLUMN waiting INTEGER NOT NULL DEFAULT 0")
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        saved = super().put(config, checkpoint, metadata, new_versions)
+        # A new checkpoint has no pending interrupt yet; one is recorded by put_writes right after
+        with self.cursor() as cur:
+            cur.execute("INSERT OR REPLACE INTO session_activity (thread_id, updated, waiting) VALUES (?, ?, 0)",
+                        (str(config["configurable"]["thread_id"]), time.time()))
+        return saved
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        super().put_writes(config, writes, task_id, task_path)
+        if any(channel == INTERRUPT for channel, _ in writes):
+            with self.cursor() as cur:
+                cur.execute("UPDATE session_activity SET waiting = 1 WHERE thread_id = ?",
+                            (str(config["configurable"]["thread_id"]),))
+
+    def delete_thread(self, thread_id):
+        super().delete_thread(thread_id)
+        with self.cursor() as cur:
+            cur.execute("DELETE FROM session_activity WHERE thread_id = ?", (str(thread_id),))
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        checkpoints = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for checkpoint in checkpoints:
+            yield checkpoint
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id):
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def sessions(self):
+        """Returns the number of sessions whose latest checkpoint waits on an interrupt (a search tool choice)."""
+        with self.cursor(transaction=False) as cur:
+            return cur.execute("SELECT COUNT(*) FROM session_activity WHERE waiting = 1").fetchone()[0]
+
+    def expire(self, ttl=SESSION_TTL):
+        """
+        Deletes the checkpoints of sessions not written for `ttl` seconds.
+
+        Returns:
+            int: Number of sessions deleted.
+        """
+        with self.cursor(transaction=False) as cur:
+            stale = [row[0] for row in cur.execute("SELECT thread_id FROM session_activity WHERE updated < ?",
+                                                   (time.time() - ttl,))]
+        for thread_id in stale:
+            self.delete_thread(thread_id)
+        if stale:
+            logging.info(f"Expired {len(stale)} idle sessions.")
+        return len(stale)
+
+    def start_sweeper(self, interval=SESSION_SWEEP_INTERVAL):
+        """
+        Runs `expire` every `interval` seconds on a daemon thread.
+
+        Returns:
+            threading.Thread: The sweeper thread.
+        """
+        def _sweep_forever():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.expire()
+                except Exception as e:
+                    logging.error(f"Error during session sweep: {str(e)}")
+
+        thread = threading.Thread(target=_sweep_forever, name="session-sweeper", daemon=True)
+        thread.start()
+        return thread
+
+
+checkpointer = SessionCheckpointer()
@@ -0,0 +1,172 @@
+# src/agent/chunking.py
+
+import re
+import logging
+from langchain.schema import Document
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken missing or its encoding files can't be loaded offline
+    _encoding = None
+    logging.warning("tiktoken unavailable, token counts are approximated from words and punctuation.")
+
+_APPROX_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+# One match per sentence or line. A sentence ends at ., ! or ? followed by whitespace, so
+# "7.5" and "e.g.x" do not split; blank lines and headings mark section boundaries.
+_SEGMENT_PATTERN = re.compile(r"[^\n.!?]*(?:[.!?]+(?!\s)[^\n.!?]*)*(?:[.!?]+|\n|$)")
+_HEADING_PATTERN = re.compile(r"^\s*(?:#{1,6}\s|\d+(?:\.\d+)*\s+[A-Z])")
+
+
+def count_tokens(text):
+    """
+    Counts tokens with tiktoken's cl100k_base encoding, or approximately without tiktoken.
+
+    Args:
+        text (str): Text to measure.
+
+    Returns:
+        int: Number of tokens.
+    """
+    if _encoding is not None:
+        return len(_encoding.encode_ordinary(text))
+    return len(_APPROX_TOKEN_PATTERN.findall(text))
+
+
+def _split_long(segment, chunk_tokens):
+    """Splits a single segment that is longer than a whole chunk on word boundaries."""
+    words = segment.split(" ")
+    piece, piece_tokens = [], 0
+    for word in words:
+        word_tokens = count_tokens(word + " ")
+        if piece and piece_tokens + word_tokens > chunk_tokens:
+            yield " ".join(piece), piece_tokens
+            piece, piece_tokens = [], 0
+        piece.append(word)
+        piece_tokens += word_tokens
+    if piece:
+        yield " ".join(piece), piece_tokens
+
+
+def truncate_tokens(text, max_tokens):
+    """
+    Cuts text to at most `max_tokens` tokens, at a sentence boundary where possible.
+
+    Args:
+        text (str): Text to shorten.
+        max_tokens (int): Maximum tokens to keep.
+
+    Returns:
+        Tuple[str, int]: The kept text and its token count.
+    """
+    kept, kept_tokens = [], 0
+    for match in _SEGMENT_PATTERN.finditer(text):
+        segment = match.group()
+        if not segment:
+            continue
+        tokens = count_tokens(segment)
+        if kept_tokens + tokens > max_tokens:
+            if not kept:
+                # The first sentence alone is too long; keep its leading words
+                return next(_split_long(segment, max_tokens), ("", 0))
+            break
+        kept.append(segment)
+        kept_tokens += tokens
+    return "".join(kept).strip(), kept_tokens
+
+
+class TokenChunker:
+    """
+    Single-pass chunker that packs whole sentences into chunks of at most `chunk_tokens`
+    tokens, repeating up to `overlap_tokens` tokens of trailing sentences at the start of
+    the next chunk.
+
+    A chunk is closed early at a section boundary (blank line or heading) once it holds at
+    least `min_tokens`, so sections are not glued to the start of the next one.
+    """
+
+    def __init__(self, chunk_tokens=256, overlap_tokens=48, min_tokens=None):
+        """
+        Args:
+            chunk_tokens (int): Maximum tokens per chunk.
+            overlap_tokens (int): Tokens carried over from the end of the previous chunk.
+            min_tokens (int, optional): Minimum tokens before a section boundary closes a
+                chunk; defaults to half of `chunk_tokens`.
+        """
+        if overlap_tokens >= chunk_tokens:
+            raise ValueError("overlap_tokens must be smaller than chunk_tokens")
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.min_tokens = chunk_tokens // 2 if min_tokens is None else min_tokens
+
+    def _segments(self, text):
+        """Yields (segment, tokens, starts_section) for every sentence or line."""
+        section_break = at_line_start = True
+        for match in _SEGMENT_PATTERN.finditer(text):
+            raw = match.group()
+            segment = raw.strip()
+            if not segment:
+                if at_line_start and raw:
+                    section_break = True  # Blank line
+                at_line_start = raw.endswith("\n")
+                continue
+            starts_section = section_break or (at_line_start and _HEADING_PATTERN.match(segment) is not None)
+            section_break = False
+            at_line_start = raw.endswith("\n")
+            tokens = count_tokens(segment)
+            if tokens > self.chunk_tokens:
+                for piece, piece_tokens in _split_long(segment, self.chunk_tokens):
+                    yield piece, piece_tokens, starts_section
+                    starts_section = False
+            else:
+                yield segment, tokens, starts_section
+
+    def iter_chunks(self, text):
+        """
+        Yields the chunks of a text as they are completed.
+
+        Args:
+            text (str): Text to split.
+
+        Yields:
+            Tuple[str, int]: Chunk text and its approximate token count.
+        """
+        current, current_tokens = [], 0
+        for segment, tokens, starts_section in self._segments(text):
+            closes_section = starts_section and current_tokens >= self.min_tokens
+            if current and (closes_section or current_tokens + tokens > self.chunk_tokens):
+                yield " ".join(s for s, _ in current), current_tokens
+                # Carry trailing sentences over as overlap, unless a new section starts
+                overlap, overlap_tokens = [], 0
+                if not closes_section:
+                    for previous in reversed(current):
+                        if overlap_tokens + previous[1] > self.overlap_tokens or overlap_tokens + previous[1] + tokens > self.chunk_tokens:
+                            break
+                        overlap.insert(0, previous)
+                        overlap_tokens += previous[1]
+                current, current_tokens = overlap, overlap_tokens
+            current.append((segment, tokens))
+            current_tokens += tokens
+        if current:
+            yield " ".join(s for s, _ in current), current_tokens
+
+    def iter_documents(self, documents):
+        """
+        Yields chunk Documents for each input Document, copying its metadata.
+
+        Args:
+            documents (Iterable[Document]): Documents to split.
+
+        Yields:
+            Document: One chunk, with its token count in the 'chunk_tokens' metadata key.
+        """
+        for document in documents:
+            for chunk, tokens in self.iter_chunks(document.page_content):
+                yield Document(page_content=chunk, metadata={**document.metadata, "chunk_tokens": tokens})
+
+    def split_documents(self, documents):
+        return list(self.iter_documents(documents))
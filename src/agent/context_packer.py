@@ -0,0 +1,137 @@
+# src/agent/context_packer.py
+
+import os
+import re
+import math
+import logging
+from collections import Counter
+from src.agent.chunking import count_tokens, truncate_tokens
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Maximum tokens of retrieved context put into the generation prompt
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "3000"))
+# MMR trade-off: 1.0 orders by relevance only, lower values favour passages unlike those already chosen
+CONTEXT_MMR_LAMBDA = float(os.environ.get("CONTEXT_MMR_LAMBDA", "0.7"))
+# Passages sharing at least this fraction of their word 5-grams are considered duplicates
+CONTEXT_DEDUPE_THRESHOLD = float(os.environ.get("CONTEXT_DEDUPE_THRESHOLD", "0.8"))
+# Packing stops once fewer tokens than this are left in the budget
+CONTEXT_MIN_PASSAGE_TOKENS = int(os.environ.get("CONTEXT_MIN_PASSAGE_TOKENS", "64"))
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+def _shingles(text, size=5):
+    words = text.lower().split()
+    return {" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+
+
+def dedupe_documents(documents, threshold=CONTEXT_DEDUPE_THRESHOLD, by_source=False):
+    """
+    Drops documents with mostly the same text as an earlier one.
+
+    Args:
+        documents (List[Document]): Documents in order of preference.
+        threshold (float): Jaccard similarity of word 5-grams above which two texts are duplicates.
+        by_source (bool): Also drop documents with the same source URL as an earlier one. Only
+            for web search results: the chunks of one uploaded file or wiki page share a source.
+
+    Returns:
+        List[Document]: The documents that were kept.
+    """
+    kept, kept_shingles, sources = [], [], set()
+    for doc in documents:
+        source = doc.metadata.get("source") if by_source else None
+        if source and source in sources:
+            continue
+        shingles = _shingles(doc.page_content)
+        if any(len(shingles & other) / len(shingles | other) >= threshold for other in kept_shingles):
+            continue
+        kept.append(doc)
+        kept_shingles.append(shingles)
+        if source:
+            sources.add(source)
+    return kept
+
+
+def _term_vector(text):
+    """Returns a unit-length bag-of-words vector as a dict."""
+    counts = Counter(word for word in _WORD_PATTERN.findall(text.lower()) if len(word) > 2)
+    norm = math.sqrt(sum(count * count for count in counts.values())) or 1.0
+    return {word: count / norm for word, count in counts.items()}
+
+
+def _cosine(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(weight * b.get(word, 0.0) for word, weight in a.items())
+
+
+def mmr_order(question, documents, mmr_lambda=CONTEXT_MMR_LAMBDA):
+    """
+    Orders documents by maximal marginal relevance to the question.
+
+    Relevance is the cosine similarity of bag-of-words vectors, plus a small bonus for
+    the retriever's own ranking so ties keep their retrieval order.
+
+    Args:
+        question (str): The user's question.
+        documents (List[Document]): Candidate passages in retrieval order.
+        mmr_lambda (float): Weight of relevance against similarity to passages already chosen.
+
+    Returns:
+        List[Document]: The documents, most useful first.
+    """
+    question_vector = _term_vector(question)
+    vectors = [_term_vector(doc.page_content) for doc in documents]
+    relevance = [_cosine(question_vector, vector) + 0.01 / (rank + 1) for rank, vector in enumerate(vectors)]
+    remaining = list(range(len(documents)))
+    max_similarity = [0.0] * len(documents)
+    ordered = []
+    while remaining:
+        best = max(remaining, key=lambda i: mmr_lambda * relevance[i] - (1 - mmr_lambda) * max_similarity[i])
+        remaining.remove(best)
+        ordered.append(documents[best])
+        for i in remaining:
+            max_similarity[i] = max(max_similarity[i], _cosine(vectors[i], vectors[best]))
+    return ordered
+
+
+def pack_context(question, documents, budget=CONTEXT_TOKEN_BUDGET):
+    """
+    Builds the generation context from the most useful passages that fit in `budget` tokens.
+
+    Near-duplicate passages are dropped, the rest are ordered with `mmr_order` and added
+    until the budget is spent. A passage longer than half the budget, or than what is left
+    of it, is cut at a sentence boundary, and packing stops once fewer than CONTEXT_MIN_PASSAGE_TOKENS tokens remain.
+
+    Args:
+        question (str): The user's question.
+        documents (List[Document]): Graded documents.
+        budget (int): Maximum tokens of context.
+
+    Returns:
+        str: The chosen passages separated by blank lines.
+    """
+    if not documents:
+        return ""
+    total_tokens = sum(count_tokens(doc.page_content) for doc in documents)
+    unique = dedupe_documents(documents)
+    passages, used = [], 0
+    for doc in mmr_order(question, unique):
+        remaining = budget - used
+        if remaining < CONTEXT_MIN_PASSAGE_TOKENS:
+            break
+        # No single passage (say a raw web page) may take more than half of the budget
+        limit = min(remaining, max(budget // 2, CONTEXT_MIN_PASSAGE_TOKENS))
+        text = doc.page_content.strip()
+        tokens = count_tokens(text)
+        if tokens > limit:
+            text, tokens = truncate_tokens(text, limit)
+        if text:
+            passages.append(text)
+            used += tokens
+    logging.info(f"Context packing kept {len(passages)} of {len(documents)} passages ({len(unique)} unique), "
+                 f"{used} of {total_tokens} tokens, saving {total_tokens - used} tokens.")
+    return "\n\n".join(passages)
@@ -0,0 +1,181 @@
+# src/agent/embedding.py
+
+import os
+import re
+import math
+import time
+import random
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.embeddings import Embeddings
+from langchain_nvidia_ai_endpoints import NVIDIAEmbeddings
+from src.agent import metrics
+from src.agent.embedding_cache import CachedEmbeddings, EMBEDDING_CACHE_ENABLED
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Embedding stage settings, overridable through the environment
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "nvidia")  # 'nvidia' or 'local'
+EMBEDDING_BATCH_SIZE = int(os.environ.get("EMBEDDING_BATCH_SIZE", "50"))
+EMBEDDING_MAX_WORKERS = int(os.environ.get("EMBEDDING_MAX_WORKERS", "4"))
+EMBEDDING_MAX_RETRIES = int(os.environ.get("EMBEDDING_MAX_RETRIES", "3"))
+EMBEDDING_BACKOFF = float(os.environ.get("EMBEDDING_BACKOFF", "1.0"))
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class LocalHashEmbeddings(Embeddings):
+    """
+    Deterministic, offline embedder based on feature hashing of word tokens.
+
+    The vectors carry no real semantics beyond shared vocabulary, but they are stable
+    across processes and machines, which makes them suitable for benchmarks and tests
+    without an NVIDIA API key.
+    """
+
+    def __init__(self, dimensions=384, latency=0.0):
+        """
+        Args:
+            dimensions (int): Length of the produced vectors.
+            latency (float): Seconds to sleep per call, to simulate a remote endpoint.
+        """
+        self.dimensions = dimensions
+        self.latency = latency
+
+    def _embed(self, text):
+        vector = [0.0] * self.dimensions
+        for token in TOKEN_PATTERN.findall(text.lower()):
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            sign = 1.0 if value & 1 else -1.0
+            vector[(value >> 1) % self.dimensions] += sign
+        norm = math.sqrt(sum(v * v for v in vector))
+        if norm:
+            vector = [v / norm for v in vector]
+        return vector
+
+    def embed_documents(self, texts):
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        if self.latency:
+            time.sleep(self.latency)
+        return self._embed(text)
+
+
+class BatchedEmbeddings(Embeddings):
+    """
+    Embedding stage that splits texts into batches and embeds them on a bounded worker
+    pool, retrying failed batches with exponential backoff.
+
+    The report of the most recent embed_documents call is kept in `last_report`.
+    """
+
+    def __init__(self, embeddings, batch_size=EMBEDDING_BATCH_SIZE, max_workers=EMBEDDING_MAX_WORKERS,
+                 max_retries=EMBEDDING_MAX_RETRIES, backoff=EMBEDDING_BACKOFF):
+        """
+        Args:
+            embeddings (Embeddings): Underlying embedder that does the actual work.
+            batch_size (int): Number of texts sent per call to the underlying embedder.
+            max_workers (int): Maximum number of batches embedded concurrently.
+            max_retries (int): Retries per batch before the error is raised.
+            backoff (float): Base delay in seconds, doubled after every failed attempt.
+        """
+        self.embeddings = embeddings
+        self.batch_size = max(1, batch_size)
+        self.max_workers = max(1, max_workers)
+        self.max_retries = max(0, max_retries)
+        self.backoff = backoff
+        self.last_report = {}
+
+    def _with_retries(self, func, *args):
+        """Calls func, retrying with exponential backoff. Returns (result, retries)."""
+        attempt = 0
+        operation = func.__name__
+        texts = len(args[0]) if operation == "embed_documents" else 1
+        while True:
+            try:
+                with metrics.embedding_seconds.time(operation=operation):
+                    result = func(*args)
+                metrics.embedding_texts.inc(texts, operation=operation)
+                return result, attempt
+            except Exception as e:
+                metrics.embedding_errors.inc(operation=operation)
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.backoff * (2 ** attempt) + random.uniform(0, self.backoff)
+                attempt += 1
+                logging.warning(f"Embedding call failed ({str(e)}), retry {attempt}/{self.max_retries} in {delay:.2f}s")
+                time.sleep(delay)
+
+    def embed_documents(self, texts):
+        """
+        Embeds texts batch by batch on the worker pool, preserving input order.
+
+        Args:
+            texts (List[str]): Texts to embed.
+
+        Returns:
+            List[List[float]]: One vector per input text.
+
+        Raises:
+            Exception: If a batch still fails after all retries.
+        """
+        start = time.perf_counter()
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) <= 1 or self.max_workers == 1:
+            results = [self._with_retries(self.embeddings.embed_documents, batch) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as executor:
+                futures = [executor.submit(self._with_retries, self.embeddings.embed_documents, batch) for batch in batches]
+                results = [future.result() for future in futures]
+
+        vectors = [vector for batch_vectors, _ in results for vector in batch_vectors]
+        elapsed = time.perf_counter() - start
+        self.last_report = {
+            "texts": len(texts),
+            "batches": len(batches),
+            "retries": sum(retries for _, retries in results),
+            "seconds": round(elapsed, 3),
+            "texts_per_second": round(len(texts) / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+        if texts:
+            logging.info(f"Embedding report: {self.last_report}")
+        return vectors
+
+    def embed_query(self, text):
+        return self._with_retries(self.embeddings.embed_query, text)[0]
+
+
+def create_embeddings(model, api_key=None, backend=EMBEDDING_BACKEND):
+    """
+    Builds the embedding stage used by the vector stores. Unless disabled with
+    EMBEDDING_CACHE_ENABLED=false, it sits behind the persistent embedding cache, which
+    all vector stores share.
+
+    Args:
+        model (str): Name of the NVIDIA embedding model.
+        api_key (str, optional): NVIDIA API key.
+        backend (str): 'nvidia' for the hosted model or 'local' for LocalHashEmbeddings.
+
+    Returns:
+        Embeddings: CachedEmbeddings around the batched embedder, or the batched embedder alone.
+
+    Raises:
+        ValueError: If an unknown backend is requested.
+    """
+    if backend == "nvidia":
+        base = NVIDIAEmbeddings(model=model, api_key=api_key, truncate="NONE")
+    elif backend == "local":
+        base = LocalHashEmbeddings()
+    else:
+        raise ValueError(f"Invalid embedding backend: {backend}")
+    logging.info(f"Using '{backend}' embeddings with batch size {EMBEDDING_BATCH_SIZE} and {EMBEDDING_MAX_WORKERS} workers.")
+    batched = BatchedEmbeddings(base)
+    if not EMBEDDING_CACHE_ENABLED:
+        return batched
+    return CachedEmbeddings(batched, model_name=f"{backend}:{model}")
@@ -0,0 +1,185 @@
+# src/agent/embedding_cache.py
+
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from array import array
+from langchain_core.embeddings import Embeddings
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+EMBEDDING_CACHE_ENABLED = os.environ.get("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.environ.get("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+
+# SQLite limits the number of bound parameters per statement
+_SQL_BATCH = 500
+# Last-access times of cache hits are kept in memory and written in batches of this size
+_TOUCH_BATCH = 1000
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Disk-backed embedding cache in front of another embedder.
+
+    Vectors are stored in SQLite as float32 blobs, keyed by the model name and a hash of
+    the text, so the same text is embedded once no matter which collection it goes into
+    or whether it is a document or a query. The least recently used entries are evicted
+    once the cache grows past `max_entries`.
+    """
+
+    def __init__(self, embeddings, model_name, path=EMBEDDING_CACHE_PATH, max_entries=EMBEDDING_CACHE_MAX_ENTRIES):
+        """
+        Args:
+            embeddings (Embeddings): Embedder used for cache misses.
+            model_name (str): Identifies the model; part of every cache key.
+            path (str): Location of the SQLite database file.
+            max_entries (int): Number of vectors kept before LRU eviction starts.
+        """
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.last_report = {}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)")
+        self._conn.commit()
+        # Counted once here, then kept up to date by _store, so inserts don't scan the table
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        # key -> last access time of hits not yet written to the database
+        self._touched = {}
+
+    def _key(self, text):
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _flush_touched(self):
+        """Writes the pending last-access times. Called with the lock held."""
+        if self._touched:
+            self._conn.executemany("UPDATE embeddings SET last_access = ? WHERE key = ?",
+                                   [(now, key) for key, now in self._touched.items()])
+            self._conn.commit()
+            self._touched.clear()
+
+    def _lookup(self, keys):
+        """
+        Returns {key: vector} for the keys found in the cache and marks them as used.
+
+        The last-access times are buffered and written with the next insert, or once
+        _TOUCH_BATCH of them are pending, so a hit doesn't write to the database.
+        """
+        found = {}
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(keys), _SQL_BATCH):
+                batch = keys[i:i + _SQL_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+            self._touched.update((key, now) for key in found)
+            if len(self._touched) >= _TOUCH_BATCH:
+                self._flush_touched()
+        return found
+
+    def _store(self, items):
+        """Stores (key, vector) pairs and evicts the least recently used entries if needed."""
+        now = time.time()
+        with self._lock:
+            # Write the pending access times first, so eviction sees them
+            self._flush_touched()
+            # A key already present (stored by another thread meanwhile) holds the same vector
+            cursor = self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)",
+                [(key, array("f", vector).tobytes(), now) for key, vector in items],
+            )
+            self._entries += cursor.rowcount
+            if self._entries > self.max_entries:
+                # Evict down to 90% of the limit so eviction doesn't run on every insert
+                excess = self._entries - int(self.max_entries * 0.9)
+                evicted = self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_access LIMIT ?)",
+                    (excess,),
+                ).rowcount
+                self._entries -= evicted
+                self.evictions += evicted
+                logging.info(f"Embedding cache evicted {evicted} entries.")
+            self._conn.commit()
+
+    def embed_documents(self, texts):
+        """
+        Embeds texts, only sending cache misses to the underlying embedder.
+
+        Args:
+            texts (List[str]): Texts to embed.
+
+        Returns:
+            List[List[float]]: One vector per input text.
+        """
+        keys = [self._key(text) for text in texts]
+        vectors = self._lookup(list(set(keys)))
+
+        # Embed each missing text once, even if it appears several times in the input
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+        hits = len(texts) - sum(1 for key in keys if key in missing)
+        self.last_report = {"cache_hits": hits, "cache_misses": len(missing)}
+
+        if missing:
+            # Round through float32 so fresh and cached vectors are identical
+            new_vectors = [array("f", v).tolist() for v in self.embeddings.embed_documents(list(missing.values()))]
+            new_items = list(zip(missing.keys(), new_vectors))
+            self._store(new_items)
+            vectors.update(new_items)
+            self.last_report.update(getattr(self.embeddings, "last_report", {}))
+
+        with self._lock:
+            self.hits += hits
+            self.misses += len(missing)
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text):
+        key = self._key(text)
+        cached = self._lookup([key])
+        with self._lock:
+            if key in cached:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if key in cached:
+            return cached[key]
+        vector = array("f", self.embeddings.embed_query(text)).tolist()
+        self._store([(key, vector)])
+        return vector
+
+    def stats(self):
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: 'hits', 'misses', 'hit_rate', 'evictions' and the current number of 'entries'.
+        """
+        with self._lock:
+            entries = self._entries
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "evictions": self.evictions,
+                "entries": entries,
+            }
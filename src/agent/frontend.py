@@ -3,6 +3,7 @@
 import requests
 import streamlit as st
 import os
+import json
 import uuid
 from visualisation import call_visualisation  # Ensure this module exists and is correctly implemented
 import time
@@ -23,15 +24,82 @@ def load_css(file_name):
     else:
         st.error(f"CSS file not found: {file_name}")
 
-# Progress Bar for File Uploads
-def file_upload_progress(files):
+# Progress Bar for File Uploads, polling the upload job on the backend
+def file_upload_progress(job_id, poll_interval=0.5):
     progress_bar = st.progress(0)
-    total_files = len(files)
+    status_text = st.empty()
+
+    while True:
+        response = requests.get(f'http://localhost:5050/upload/{job_id}')
+        if response.status_code != 200:
+            progress_bar.empty()
+            status_text.empty()
+            return {'status': 'failed', 'error': response.json().get('error', 'Unknown error'), 'files': {}}
+
+        job = response.json()
+        progress_bar.progress(job['progress'])
+        status_text.markdown("<br>".join(
+            f"{file['filename']}: {file['stages'][-1] if file['stages'] else file['status']}"
+            for file in job['files'].values()
+        ), unsafe_allow_html=True)
+
+        if job['status'] in ('completed', 'failed'):
+            progress_bar.empty()  # Remove progress bar after completion
+            status_text.empty()
+            return job
+        time.sleep(poll_interval)
+
+# Status shown while the answer streams in, keyed by the graph node that just finished
+NODE_LABELS = {
+    'retrieve': "Retrieving documents...",
+    'rerank': "Grading documents...",
+    'grade_documents': "Grading documents...",
+    'websearch': "Searching the web...",
+    'generate': "Checking the answer...",
+}
+
+# Streams an answer from the backend, rendering node progress and answer tokens as they arrive.
+# Returns the same fields as /ask ('answer', 'need_user_input' or 'error') plus the 'grade'.
+def stream_answer(payload):
+    status_text = st.empty()
+    answer_box = st.empty()
+    status_text.info("Processing...")
+    answer = ""
+    result = {}
+    with requests.post('http://localhost:5050/ask/stream', json=payload, stream=True) as response:
+        if response.status_code != 200:
+            status_text.empty()
+            return response.json() if response.content else {'error': f"Status code: {response.status_code}"}
+        for line in response.iter_lines(decode_unicode=True):
+            if not line:
+                continue
+            event = json.loads(line)
+            if event['type'] == 'node':
+                status_text.info(NODE_LABELS.get(event['node'], "Processing..."))
+            elif event['type'] == 'token':
+                if not answer:
+                    status_text.info("Generating the answer...")
+                answer += event['content']
+                answer_box.markdown(answer)
+            elif event['type'] == 'answer':
+                result['answer'] = event['answer']
+                answer = ""  # Tokens of a retry start a new answer
+            elif event['type'] == 'grade':
+                result['grade'] = event['grade']
+                result['budget_exhausted'] = event.get('budget_exhausted', False)
+            elif event['type'] == 'need_user_input':
+                # Same keys as the /ask response, which the callers check
+                result.update({'need_user_input': True, 'options': event['options'],
+                               'session_id': event['session_id']})
+            else:
+                result.update(event)
+    status_text.empty()
+    answer_box.empty()  # The final answer is shown in the answer box below
+    return result
 
-    for i, file in enumerate(files):
-        time.sleep(0.5)  # Simulate processing time
-        progress_bar.progress((i + 1) / total_files)
-    progress_bar.empty()  # Remove progress bar after completion
+# Namespace sent with uploads and Custom queries; None selects the shared Custom collection
+def active_namespace():
+    return None if st.session_state.get("use_shared_collection") else st.session_state.namespace
 
 # Initialize session state variables
 if "answer" not in st.session_state:
@@ -48,6 +116,11 @@ if "options" not in st.session_state:
     st.session_state.options = []
 if "session_id" not in st.session_state:
     st.session_state.session_id = str(uuid.uuid4())
+if "namespace" not in st.session_state:
+    # Kept in the page URL, so a reload or a bookmark of the page returns to the same uploads
+    if "namespace" not in st.query_params:
+        st.query_params["namespace"] = uuid.uuid4().hex
+    st.session_state.namespace = st.query_params["namespace"]
 if "user_choice_made" not in st.session_state:
     st.session_state.user_choice_made = False
 if "user_choice" not in st.session_state:
@@ -99,6 +172,8 @@ def main():
             "<h2 style='font-size:20px;'>Upload Documents</h2>",
             unsafe_allow_html=True
         )
+        st.checkbox("Use the shared Custom collection", key="use_shared_collection",
+                    help="Otherwise uploads and Custom queries use the collection of this page's URL.")
 
         # File uploader
         uploaded_files = st.file_uploader(
@@ -115,12 +190,21 @@ def main():
             if st.button("Process Files"):
                 try:
                     files = [('file', (file.name, file.getvalue(), file.type)) for file in uploaded_files]
-                    with st.spinner("Processing files..."):
-                        response = requests.post('http://localhost:5050/upload', files=files)
-
-                    if response.status_code == 200:
-                        st.success("Files uploaded and processed successfully!")
-                        file_upload_progress(uploaded_files)  # Show progress bar
+                    with st.spinner("Uploading files..."):
+                        response = requests.post('http://localhost:5050/upload', files=files,
+                                                 data={'namespace': active_namespace()})
+
+                    if response.status_code == 202:
+                        job = file_upload_progress(response.json()['job_id'])  # Show progress bar
+                        failed_files = {name: file for name, file in job['files'].items() if file['status'] == 'failed'}
+                        if job['status'] == 'completed' and not failed_files:
+                            st.success("Files uploaded and processed successfully!")
+                        elif job['status'] == 'completed':
+                            st.warning("Some files could not be processed.")
+                        else:
+                            st.error(f"Error processing files: {job.get('error') or 'Unknown error'}")
+                        for file in failed_files.values():
+                            st.error(f"{file['filename']}: {file['error']}")
                     else:
                         error_message = response.json().get('error', 'Unknown error') if response.content else 'No response from server'
                         st.error(f"Error uploading files. Status code: {response.status_code}. Message: {error_message}")
@@ -186,29 +270,24 @@ def main():
 
                 # Send initial request to backend
                 try:
-                    with st.spinner("Processing..."):
-                        response = requests.post('http://localhost:5050/ask', json={
-                            'question': query,
-                            'vector_db_choice': st.session_state.vector_db_choice,
-                            'session_id': st.session_state.session_id
-                        })
-
-                    response_data = response.json()
-                    if response.status_code == 200:
-                        if response_data.get('need_user_input'):
-                            st.session_state.options = response_data['options']
-                            st.session_state.need_user_input = True
-                            st.session_state.session_id = response_data['session_id']
-                        elif 'answer' in response_data:
-                            st.session_state.answer = response_data['answer']
-                            st.success("Answer generated!")
-                        elif 'error' in response_data:
-                            st.error(f"Error: {response_data['error']}")
-                        else:
-                            st.error("Unexpected response from server.")
+                    response_data = stream_answer({
+                        'question': query,
+                        'vector_db_choice': st.session_state.vector_db_choice,
+                        'session_id': st.session_state.session_id,
+                        'namespace': active_namespace()
+                    })
+
+                    if response_data.get('need_user_input'):
+                        st.session_state.options = response_data['options']
+                        st.session_state.need_user_input = True
+                        st.session_state.session_id = response_data['session_id']
+                    elif 'answer' in response_data:
+                        st.session_state.answer = response_data['answer']
+                        st.success("Answer generated!")
+                    elif 'error' in response_data:
+                        st.error(f"Error: {response_data['error']}")
                     else:
-                        error_message = response_data.get('error', 'Unknown error')
-                        st.error(f"Error: {error_message}")
+                        st.error("Unexpected response from server.")
                 except Exception as e:
                     st.error(f"Error connecting to the server: {str(e)}")
             else:
@@ -232,33 +311,28 @@ def main():
                     st.session_state.user_choice_made = True
 
                     try:
-                        with st.spinner("Processing your choice..."):
-                            response = requests.post('http://localhost:5050/ask', json={
-                                'question': st.session_state.query,
-                                'vector_db_choice': st.session_state.vector_db_choice,
-                                'user_choice': st.session_state.user_choice,
-                                'session_id': st.session_state.session_id
-                            })
-
-                        response_data = response.json()
-                        if response.status_code == 200:
-                            if 'answer' in response_data:
-                                st.session_state.answer = response_data['answer']
-                                st.session_state.need_user_input = False
-                                st.success("Answer generated!")
-                            elif response_data.get('need_user_input'):
-                                # If more input is needed, update options
-                                st.session_state.options = response_data['options']
-                                st.session_state.need_user_input = True
-                                st.session_state.user_choice_made = False
-                                st.warning("Please select an option.")
-                            elif 'error' in response_data:
-                                st.error(f"Error: {response_data['error']}")
-                            else:
-                                st.error("Unexpected response from server.")
+                        response_data = stream_answer({
+                            'question': st.session_state.query,
+                            'vector_db_choice': st.session_state.vector_db_choice,
+                            'user_choice': st.session_state.user_choice,
+                            'session_id': st.session_state.session_id,
+                            'namespace': active_namespace()
+                        })
+
+                        if 'answer' in response_data:
+                            st.session_state.answer = response_data['answer']
+                            st.session_state.need_user_input = False
+                            st.success("Answer generated!")
+                        elif response_data.get('need_user_input'):
+                            # If more input is needed, update options
+                            st.session_state.options = response_data['options']
+                            st.session_state.need_user_input = True
+                            st.session_state.user_choice_made = False
+                            st.warning("Please select an option.")
+                        elif 'error' in response_data:
+                            st.error(f"Error: {response_data['error']}")
                         else:
-                            error_message = response_data.get('error', 'Unknown error')
-                            st.error(f"Error: {error_message}")
+                            st.error("Unexpected response from server.")
                     except Exception as e:
                         st.error(f"Error connecting to the server: {str(e)}")
                 else:
@@ -1,12 +1,19 @@
 # src/agent/graph.py
 
+import time
+
+_import_started = time.perf_counter()
+
 import os
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 from dotenv import load_dotenv
 import json
 from langchain_core.messages import HumanMessage
 from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import RunnableLambda
 from langchain_nvidia_ai_endpoints import ChatNVIDIA
-from langchain_chroma import Chroma  # Updated import from langchain_chroma
 from langchain_community.tools import WikipediaQueryRun
 from langchain_community.utilities import WikipediaAPIWrapper
 from web_scrapers.search_tool_arxiv import ArxivSearchTool
@@ -15,7 +22,16 @@ from langchain_community.tools.tavily_search import TavilySearchResults
 from langchain_core.output_parsers import JsonOutputParser
 from langchain.schema import Document
 from langgraph.graph import END, START
-from src.agent.ingest import get_retriever
+from langgraph.errors import GraphInterrupt
+from langgraph.types import interrupt
+from src.agent.checkpoints import checkpointer
+from src.agent.context_packer import dedupe_documents, pack_context
+from src.agent.ingest import get_retriever, registry, startup_report
+from src.agent.llm_cache import llm_cache
+from src.agent import metrics
+from src.agent.rerank import RERANK_SCORER, get_reranker
+from src.agent.startup import record_startup_timing
+from src.agent.structured_logging import log_payload, node_context, truncate
 from typing_extensions import TypedDict
 from typing import List, Any
 from langgraph.graph import StateGraph
@@ -26,9 +42,11 @@ load_dotenv()
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# # Initialize LLMs
-llm = ChatNVIDIA(model='meta/llama-3.1-405b-instruct', temperature=0)
-llm_json_mode = ChatNVIDIA(model='meta/llama-3.1-405b-instruct', temperature=0, format='json')
+# Initialize LLMs. Both run at temperature 0, so identical calls are answered from the LLM cache.
+llm = ChatNVIDIA(model='meta/llama-3.1-405b-instruct', temperature=0, cache=llm_cache,
+                 callbacks=[metrics.LLMMetricsHandler("generator")])
+llm_json_mode = ChatNVIDIA(model='meta/llama-3.1-405b-instruct', temperature=0, format='json', cache=llm_cache,
+                           callbacks=[metrics.LLMMetricsHandler("grader")])
 
 # from langchain_ollama import ChatOllama -- For Debugging Only
 # llm = ChatOllama(model='llama3.1', temperature=0)
@@ -143,6 +161,49 @@ Provide the binary score as a JSON with a single key 'score' and nothing else.
 
 retrieval_grader = grader_prompt | llm_json_mode | JsonOutputParser()
 
+multi_grader_prompt = PromptTemplate(
+    template="""You are a teacher grading a quiz. You will be given a QUESTION and a numbered list of FACTS provided by the student.
+
+You are grading RELEVANCE RECALL for each fact separately:
+A score of 1 means that ANY of the statements in the FACT are relevant to the QUESTION.
+A score of 0 means that NONE of the statements in the FACT are relevant to the QUESTION.
+
+**Important Instructions:**
+- **Do not provide any explanations or reasoning in your final answer.**
+- **Do not include any preamble or additional text.**
+- **Only output a JSON with a single key 'scores' holding one binary score per fact, in the order of the facts.**
+
+**Example Output for three facts:**
+{{"scores": [1, 0, 1]}}
+
+---
+
+Now, please evaluate the following:
+
+Question:
+{question}
+
+Facts:
+{documents}
+
+Provide the scores as a JSON with a single key 'scores' and nothing else.
+""",
+    input_variables=["question", "documents"],
+)
+
+multi_retrieval_grader = multi_grader_prompt | llm_json_mode | JsonOutputParser()
+
+# Documents are graded concurrently with at most GRADER_MAX_CONCURRENCY requests in flight.
+# With GRADER_BATCH_SIZE > 1, that many documents are scored together in one prompt.
+GRADER_MAX_CONCURRENCY = int(os.environ.get("GRADER_MAX_CONCURRENCY", "4"))
+GRADER_BATCH_SIZE = int(os.environ.get("GRADER_BATCH_SIZE", "1"))
+
+# Per-request budget of the retrieve -> generate -> grade_generation loop. Once any limit is
+# reached, the latest answer is returned with budget_exhausted set instead of retrying.
+MAX_LOOP_ITERATIONS = int(os.environ.get("MAX_LOOP_ITERATIONS", "2"))
+MAX_LLM_CALLS = int(os.environ.get("MAX_LLM_CALLS", "30"))
+REQUEST_DEADLINE_SECONDS = float(os.environ.get("REQUEST_DEADLINE_SECONDS", "90"))
+
 # Initialize web search tools
 web_search_tool = TavilySearchResults(
     max_results=10,
@@ -157,60 +218,141 @@ wikipedia = WikipediaQueryRun(api_wrapper=WikipediaAPIWrapper(top_k_results=5, m
 
 arxiv_tool = ArxivSearchTool(max_results=5, save_folder="downloads")
 
-# Define callable functions for web searches
+# "ask" pauses the graph so the user can pick a search tool; "auto" queries every provider at once
+WEB_SEARCH_MODE = os.environ.get("WEB_SEARCH_MODE", "ask")
+# Seconds each provider gets in auto mode; results arriving later are dropped
+WEB_SEARCH_DEADLINES = {
+    "Tavily": float(os.environ.get("TAVILY_DEADLINE", "8")),
+    "Arxiv": float(os.environ.get("ARXIV_DEADLINE", "8")),
+    "Wikipedia": float(os.environ.get("WIKIPEDIA_DEADLINE", "5")),
+}
+# Results sharing at least this fraction of their word 5-grams are considered duplicates
+WEB_SEARCH_DEDUPE_THRESHOLD = float(os.environ.get("WEB_SEARCH_DEDUPE_THRESHOLD", "0.8"))
+
+# Shared by all requests; a provider that misses its deadline keeps its worker until it returns
+_search_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("WEB_SEARCH_MAX_WORKERS", "16")),
+                                      thread_name_prefix="web-search")
+
+# Define callable functions for web searches. Each returns one Document per result.
 def search_tavily(query):
     """
-    Perform a search using Tavily API and return the response.
+    Perform a search using Tavily API and return the results as Documents.
     """
     try:
         # Ensure the query is well-formed for Tavily
         response = web_search_tool.invoke({"query": query})
 
-        # Debug the raw response
-        logging.info(f"Raw Tavily API response: {response}")
+        log_payload("Raw Tavily API response", response)
 
         # Check if the response is a list and contains results
-        if response and isinstance(response, list) and len(response) > 0:
-            # The response is a list of results with 'url', 'content', etc.
-            combined_results = "\n".join([result.get('content', 'No content available') for result in response])
-            if combined_results:
-                return combined_results  # Return the combined content
-            else:
-                logging.info("No relevant content found in Tavily results.")
-                return None
-        else:
+        if not response or not isinstance(response, list):
             logging.info("Tavily API returned an empty list or an unexpected format.")
-            return None
+            return []
+        # The response is a list of results with 'url', 'content', etc.
+        return [
+            Document(page_content=result['content'],
+                     metadata={"provider": "Tavily", "source": result.get('url', ''), "title": result.get('title', '')})
+            for result in response if isinstance(result, dict) and result.get('content')
+        ]
 
     except Exception as e:
         logging.error(f"Error during Tavily API call: {e}")
-        return None
+        metrics.search_errors.inc(provider="Tavily", reason="error")
+        return []
 
 def search_arxiv(query):
     """
-    Perform a search using Arxiv API and return the response.
+    Perform a search using Arxiv API and return the results as Documents.
     """
     logging.info(f"Searching ArXiv for: {query}")
     try:
         response = arxiv_tool.search(query)
-        logging.info(f"Arxiv response: {response}")
-        return response
+        log_payload("Arxiv response", response)
+        return [
+            Document(page_content=f"Title: {result['title']}\nSummary: {result['summary']}",
+                     metadata={"provider": "Arxiv", "source": result['url'], "title": result['title'],
+                               "published": str(result['published'])})
+            for result in response or []
+        ]
     except Exception as e:
         logging.error(f"Error during Arxiv API call: {e}")
-        return None
+        metrics.search_errors.inc(provider="Arxiv", reason="error")
+        return []
 
 def search_wikipedia(query):
     """
-    Perform a search using Wikipedia API and return the response.
+    Perform a search using Wikipedia API and return one Document per page.
     """
     logging.info(f"Searching Wikipedia for: {query}")
     try:
         response = wikipedia.invoke({"query": query})
-        logging.info(f"Wikipedia response: {response}")
-        return response
+        log_payload("Wikipedia response", response)
+        if not isinstance(response, str) or response.startswith("No good Wikipedia Search Result"):
+            return []
+        documents = []
+        # The tool joins pages as "Page: <title>\nSummary: <text>" separated by blank lines
+        for page in response.split("\n\nPage: "):
+            title, _, summary = page.removeprefix("Page: ").partition("\nSummary: ")
+            documents.append(Document(page_content=page if page.startswith("Page: ") else f"Page: {page}",
+                                      metadata={"provider": "Wikipedia", "title": title,
+                                                "source": f"https://en.wikipedia.org/wiki/{title.replace(' ', '_')}"}))
+        return documents
     except Exception as e:
         logging.error(f"Error during Wikipedia API call: {e}")
-        return None
+        metrics.search_errors.inc(provider="Wikipedia", reason="error")
+        return []
+
+def _timed_search(provider, search, query):
+    """Calls a search function, recording its latency and result count under the provider name."""
+    with metrics.search_seconds.time(provider=provider):
+        results = search(query)
+    metrics.search_results.inc(len(results), provider=provider)
+    return results
+
+SEARCH_PROVIDERS = {
+    "Tavily": search_tavily,
+    "Arxiv": search_arxiv,
+    "Wikipedia": search_wikipedia,
+}
+# Choices offered to the user when the graph stops before searching the web
+SEARCH_OPTIONS = ["Auto", *SEARCH_PROVIDERS]
+
+def search_all(query, providers=None, deadlines=None):
+    """
+    Queries several search providers in parallel and keeps what arrives before each provider's deadline.
+
+    Args:
+        query (str): The search query.
+        providers (dict, optional): Provider name to search function. Defaults to SEARCH_PROVIDERS.
+        deadlines (dict, optional): Provider name to seconds. Defaults to WEB_SEARCH_DEADLINES.
+
+    Returns:
+        List[Document]: Deduplicated results of all providers that answered in time, grouped by provider.
+    """
+    providers = providers or SEARCH_PROVIDERS
+    deadlines = deadlines or WEB_SEARCH_DEADLINES
+    started = time.perf_counter()
+    # Each provider runs in a copy of the caller's context, so its logs keep the request's trace id
+    futures = {name: _search_executor.submit(contextvars.copy_context().run, _timed_search, name, search, query)
+               for name, search in providers.items()}
+    results = {}
+    # All providers started together, so each one is waited for only until its own deadline
+    for name in sorted(futures, key=lambda name: deadlines.get(name, 10.0)):
+        remaining = deadlines.get(name, 10.0) - (time.perf_counter() - started)
+        try:
+            results[name] = futures[name].result(timeout=max(remaining, 0))
+            logging.info(f"{name} returned {len(results[name])} results in {time.perf_counter() - started:.2f}s.")
+        except FuturesTimeoutError:
+            logging.info(f"{name} missed its {deadlines.get(name, 10.0)}s deadline.")
+            metrics.search_errors.inc(provider=name, reason="deadline")
+        except Exception as e:
+            logging.error(f"Error during {name} search: {e}")
+            metrics.search_errors.inc(provider=name, reason="error")
+    # Earlier providers win when results overlap
+    documents = [doc for name in providers if name in results for doc in results[name]]
+    kept = dedupe_documents(documents, WEB_SEARCH_DEDUPE_THRESHOLD, by_source=True)
+    logging.info(f"Web search kept {len(kept)} of {len(documents)} results in {time.perf_counter() - started:.2f}s.")
+    return kept
 
 class GraphState(TypedDict):
     """
@@ -220,19 +362,73 @@ class GraphState(TypedDict):
     generation: Any
     web_search: str
     documents: List[Any]
-    need_user_input: bool
-    options: List[str]
     selected_tool: str
     message: str
     search: str
     vector_db_choice: str
+    namespace: str
+    grade: str
     error: str
+    # Request budget (see new_budget) and what has been spent of it
+    max_iterations: int
+    max_llm_calls: int
+    deadline: float
+    iterations: int
+    llm_calls: int
+    budget_exhausted: bool
 
 # Initialize global variables
 workflow = None
 graph = None
+reranker = None  # Set by setup_workflow when the graph has a rerank node
+# Documents retrieved for grading when there is no rerank node
+RETRIEVE_K = 4
+
+def new_budget(deadline_seconds=REQUEST_DEADLINE_SECONDS):
+    """
+    Returns the budget fields of a new request's state.
+
+    Args:
+        deadline_seconds (float): Wall-clock time the request may take from now.
+
+    Returns:
+        dict: 'max_iterations', 'max_llm_calls' and the 'deadline' as a Unix timestamp.
+    """
+    return {"max_iterations": MAX_LOOP_ITERATIONS, "max_llm_calls": MAX_LLM_CALLS,
+            "deadline": time.time() + deadline_seconds}
+
+def budget_spent(state):
+    """
+    Returns which limit of the request budget is reached, or None if there is budget left.
+
+    Args:
+        state (dict): The current graph state
+
+    Returns:
+        str: 'iterations', 'llm_calls', 'deadline' or None.
+    """
+    if state.get("iterations", 0) >= state.get("max_iterations", MAX_LOOP_ITERATIONS):
+        return "iterations"
+    if state.get("llm_calls", 0) >= state.get("max_llm_calls", MAX_LLM_CALLS):
+        return "llm_calls"
+    if time.time() >= state.get("deadline", float("inf")):
+        return "deadline"
+    return None
+
+def _spent_llm_calls(state, calls):
+    return {"llm_calls": state.get("llm_calls", 0) + calls}
+
+def _started_iteration(state):
+    """Counts a pass through retrieve, giving runs started without a budget the default one."""
+    update = {} if "deadline" in state else new_budget()
+    update["iterations"] = state.get("iterations", 0) + 1
+    return update
 
 # -----------Nodes------------
+def _retrieve_k():
+    """Number of documents to retrieve: more candidates when a reranker trims them afterwards."""
+    return reranker.fetch_k if reranker is not None else RETRIEVE_K
+
 def retrieve(state):
     """
     Retrieve documents from vectorstore
@@ -247,15 +443,77 @@ def retrieve(state):
     question = state["question"]
     vector_db_choice = state.get('vector_db_choice', 'Wiki')  # Default to 'Wiki' if not specified
     try:
-        retriever = get_retriever(vector_db_choice)
+        retriever = get_retriever(vector_db_choice, namespace=state.get('namespace'), k=_retrieve_k())
         documents = retriever.invoke(question)
         logging.info(f"Documents retrieved: {len(documents)}")
-        return {"documents": documents}
+        return {"documents": documents, **_started_iteration(state)}
     except Exception as e:
         logging.error(f"Error in retrieve node: {str(e)}")
         state['error'] = f"Error in retrieve node: {str(e)}"
         return state
 
+async def aretrieve(state):
+    """Async version of retrieve."""
+    logging.info("---RETRIEVE---")
+    vector_db_choice = state.get('vector_db_choice', 'Wiki')
+    try:
+        retriever = get_retriever(vector_db_choice, namespace=state.get('namespace'), k=_retrieve_k())
+        documents = await retriever.ainvoke(state["question"])
+        logging.info(f"Documents retrieved: {len(documents)}")
+        return {"documents": documents, **_started_iteration(state)}
+    except Exception as e:
+        logging.error(f"Error in retrieve node: {str(e)}")
+        state['error'] = f"Error in retrieve node: {str(e)}"
+        return state
+
+def rerank_documents(state):
+    """
+    Reorders the retrieved documents with the local reranker and drops the weakest, so
+    fewer documents are sent to the LLM grader.
+
+    Args:
+        state (dict): The current graph state
+
+    Returns:
+        dict: Updates documents key with the reranked documents
+    """
+    logging.info("---RERANK---")
+    try:
+        return {"documents": reranker.rerank(state["question"], state.get("documents", []))}
+    except Exception as e:
+        # Grading all candidates is slower but still correct
+        logging.error(f"Error in rerank node, keeping retrieval order: {str(e)}")
+        return {"documents": state.get("documents", [])[:reranker.top_k]}
+
+async def arerank_documents(state):
+    """Async version of rerank_documents; scoring runs in a worker thread."""
+    return await asyncio.to_thread(rerank_documents, state)
+
+def _generation_prompt(state):
+    """Builds the sequence generation prompt from the question and the graded documents."""
+    question = state["question"]
+    documents = state.get("documents", [])
+    log_payload("Documents", documents)
+    # Keeps the most relevant, distinct passages within CONTEXT_TOKEN_BUDGET tokens
+    return seq_generator_instructions.format(context=pack_context(question, documents), question=question)
+
+def _generation_text(generation):
+    """Extracts the answer text from the LLM output."""
+    # Handle different possible return types from llm.invoke()
+    if hasattr(generation, 'content'):
+        generated_text = generation.content
+    elif isinstance(generation, str):
+        generated_text = generation
+    else:
+        raise ValueError("LLM returned content in an unexpected format.")
+
+    if not generated_text:
+        raise ValueError("LLM returned empty content.")
+
+    logging.info(f"Generated {len(generated_text)} characters.")
+    log_payload("Generation", generated_text)
+    return generated_text
+
 def generate(state):
     """
     Generate answer using RAG on retrieved documents
@@ -267,40 +525,26 @@ def generate(state):
         dict: New key added to state, generation, that contains LLM generation
     """
     logging.info("---GENERATE---")
-    question = state["question"]
-    documents = state.get("documents", [])
-    logging.info(f"Documents: {documents}")
     # RAG generation
     try:
-        if not documents:
-            message = state.get("message", "No external sources were useful. Generating the answer based on the LLM's information.")
-            seq_generator_prompt = seq_generator_instructions.format(context="", question=question)
-        else:
-            docs_txt = " ".join([doc.page_content for doc in documents])
-            seq_generator_prompt = seq_generator_instructions.format(context=docs_txt, question=question)
-
-        generation = llm.invoke([HumanMessage(content=seq_generator_prompt)])
-        logging.info(f"Generation type: {type(generation)}")
-        logging.info(f"Generation content: {generation}")
-
-        # Handle different possible return types from llm.invoke()
-        if hasattr(generation, 'content'):
-            generated_text = generation.content
-        elif isinstance(generation, str):
-            generated_text = generation
-        else:
-            raise ValueError("LLM returned content in an unexpected format.")
-
-        if not generated_text:
-            raise ValueError("LLM returned empty content.")
-
-        logging.info(f"Generation: {generated_text}")
-        return {"generation": generated_text}
+        generation = llm.invoke([HumanMessage(content=_generation_prompt(state))])
+        return {"generation": _generation_text(generation), **_spent_llm_calls(state, 1)}
     except Exception as e:
         logging.error(f"Error during generation: {str(e)}")
         state['error'] = f"Error during generation: {str(e)}"
         return state  # Return the state with the error included
 
+async def agenerate(state):
+    """Async version of generate."""
+    logging.info("---GENERATE---")
+    try:
+        generation = await llm.ainvoke([HumanMessage(content=_generation_prompt(state))])
+        return {"generation": _generation_text(generation), **_spent_llm_calls(state, 1)}
+    except Exception as e:
+        logging.error(f"Error during generation: {str(e)}")
+        state['error'] = f"Error during generation: {str(e)}"
+        return state
+
 def web_search(state):
     """
     Perform web search based on the user's selected tool. If no results, generate using LLM's own information.
@@ -309,63 +553,149 @@ def web_search(state):
     question = state["question"]
     documents = state.get("documents", [])
 
-    # Check if 'selected_tool' is in state
-    if 'selected_tool' not in state or not state['selected_tool']:
-        # Indicate that user input is needed
-        state['need_user_input'] = True
-        state['options'] = ['Tavily', 'Arxiv', 'Wikipedia']
-        return state
-
-    selected_tool = state['selected_tool']
+    selected_tool = state.get('selected_tool')
+    if not selected_tool and WEB_SEARCH_MODE != "auto":
+        # Pause the graph until the user picks a tool. The run is checkpointed, so resuming with
+        # Command(resume=<tool>) re-enters this node without repeating retrieval and grading.
+        selected_tool = interrupt({"options": SEARCH_OPTIONS})
+    selected_tool = selected_tool or "Auto"
+    state['selected_tool'] = selected_tool  # Later passes through the loop reuse the choice
     logging.info(f"Selected tool: {selected_tool}")
 
-    # Reset 'need_user_input' flag
-    state['need_user_input'] = False  # Ensure it's reset
-
-    # Perform search based on selected tool
-    if selected_tool == "Tavily":
-        tavily_response = search_tavily(question)
-        if tavily_response:
-            web_results_doc = Document(page_content=tavily_response)
-            documents.append(web_results_doc)
-            logging.info("Tavily returned results.")
-        else:
-            logging.info("Tavily failed to return results.")
-            state['documents'] = []
-            state['message'] = "Tavily did not yield any useful results."
-
-    elif selected_tool == "Arxiv":
-        arxiv_response = search_arxiv(question)
-        if arxiv_response:
-            arxiv_results = "\n".join([f"Title: {result['title']}\nSummary: {result['summary']}" for result in arxiv_response])
-            arxiv_doc = Document(page_content=arxiv_results)
-            documents.append(arxiv_doc)
-            logging.info("Arxiv returned results.")
-        else:
-            logging.info("Arxiv failed to return results.")
-            state['documents'] = []
-            state['message'] = "Arxiv did not yield any useful results."
-
-    elif selected_tool == "Wikipedia":
-        wikipedia_response = search_wikipedia(question)
-        if wikipedia_response:
-            wiki_results = wikipedia_response if isinstance(wikipedia_response, str) else wikipedia_response.get('content', 'No content available')
-            wiki_doc = Document(page_content=wiki_results)
-            documents.append(wiki_doc)
-            logging.info("Wikipedia returned results.")
-        else:
-            logging.info("Wikipedia failed to return results.")
-            state['documents'] = []
-            state['message'] = "Wikipedia did not yield any useful results."
-
+    # Perform search based on selected tool, or with all of them
+    if selected_tool == "Auto":
+        results = search_all(question)
+    elif selected_tool in SEARCH_PROVIDERS:
+        results = _timed_search(selected_tool, SEARCH_PROVIDERS[selected_tool], question)
     else:
         logging.error(f"Invalid selected tool: {selected_tool}")
         state['error'] = f"Invalid selected tool: {selected_tool}"
+        return state
+
+    if results:
+        documents.extend(results)
+        logging.info(f"{selected_tool} returned {len(results)} results.")
+    else:
+        logging.info(f"{selected_tool} failed to return results.")
+        documents = []
+        state['message'] = f"{'Web search' if selected_tool == 'Auto' else selected_tool} did not yield any useful results."
 
     # Update the state with new documents
     state['documents'] = documents
     return state
 
+async def aweb_search(state):
+    """Async version of web_search. The search tools are blocking, so they run on a worker thread."""
+    return await asyncio.to_thread(web_search, state)
+
+def _is_relevant(grade):
+    return grade in ["yes", 1, "1"]
+
+def _relevance(scores):
+    """Turns single-document grader outputs, or the exceptions raised instead, into keep/drop flags."""
+    relevant = []
+    for score in scores:
+        if isinstance(score, Exception):
+            logging.error(f"Error during document grading: {str(score)}")
+            relevant.append(False)
+        else:
+            relevant.append(_is_relevant(score.get("score", 0)))
+    return relevant
+
+def _document_groups(question, documents, batch_size):
+    """Splits documents into groups and builds the multi-document grader input of each group."""
+    groups = [documents[i:i + batch_size] for i in range(0, len(documents), batch_size)]
+    inputs = [
+        {"question": question, "documents": "\n\n".join(f"Fact {n}:\n{d.page_content}" for n, d in enumerate(group, 1))}
+        for group in groups
+    ]
+    return groups, inputs
+
+def _group_scores(group, response):
+    """Returns the keep/drop flags of a group, or None if the response has no score per document."""
+    scores = None if isinstance(response, Exception) else response.get("scores")
+    if isinstance(scores, list) and len(scores) == len(group):
+        return [_is_relevant(score) for score in scores]
+    logging.error(f"Multi-document grading failed, grading {len(group)} documents one by one: {truncate(response)}")
+    return None
+
+def grade_each_document(question, documents, max_concurrency=GRADER_MAX_CONCURRENCY):
+    """
+    Grades documents with one grader prompt per document, running the prompts concurrently.
+
+    Args:
+        question (str): The user's question.
+        documents (List[Document]): Documents to grade.
+        max_concurrency (int): Maximum grader requests in flight.
+
+    Returns:
+        List[bool]: Whether each document is relevant. Documents whose grading failed are not.
+    """
+    scores = retrieval_grader.batch(
+        [{"question": question, "documents": d.page_content} for d in documents],
+        config={"max_concurrency": max_concurrency},
+        return_exceptions=True,
+    )
+    return _relevance(scores)
+
+async def agrade_each_document(question, documents, max_concurrency=GRADER_MAX_CONCURRENCY):
+    """Async version of grade_each_document."""
+    scores = await retrieval_grader.abatch(
+        [{"question": question, "documents": d.page_content} for d in documents],
+        config={"max_concurrency": max_concurrency},
+        return_exceptions=True,
+    )
+    return _relevance(scores)
+
+def grade_document_batches(question, documents, batch_size=GRADER_BATCH_SIZE, max_concurrency=GRADER_MAX_CONCURRENCY):
+    """
+    Grades documents in groups of `batch_size` per prompt, running the prompts concurrently.
+
+    A group whose response does not hold exactly one score per document is graded again
+    one document at a time, so every document gets the same keep/drop decision it would
+    get from the single-document grader.
+
+    Args:
+        question (str): The user's question.
+        documents (List[Document]): Documents to grade.
+        batch_size (int): Documents per prompt.
+        max_concurrency (int): Maximum grader requests in flight.
+
+    Returns:
+        List[bool]: Whether each document is relevant.
+    """
+    groups, inputs = _document_groups(question, documents, batch_size)
+    responses = multi_retrieval_grader.batch(inputs, config={"max_concurrency": max_concurrency}, return_exceptions=True)
+    relevant = []
+    for group, response in zip(groups, responses):
+        scores = _group_scores(group, response)
+        relevant.extend(scores if scores is not None else grade_each_document(question, group, max_concurrency))
+    return relevant
+
+async def agrade_document_batches(question, documents, batch_size=GRADER_BATCH_SIZE, max_concurrency=GRADER_MAX_CONCURRENCY):
+    """Async version of grade_document_batches."""
+    groups, inputs = _document_groups(question, documents, batch_size)
+    responses = await multi_retrieval_grader.abatch(inputs, config={"max_concurrency": max_concurrency}, return_exceptions=True)
+    relevant = []
+    for group, response in zip(groups, responses):
+        scores = _group_scores(group, response)
+        relevant.extend(scores if scores is not None else await agrade_each_document(question, group, max_concurrency))
+    return relevant
+
+def _graded_state(state, relevant, started):
+    """Keeps the relevant documents and asks for a web search if none are left."""
+    documents = state.get("documents", [])
+    filtered_docs = [d for d, keep in zip(documents, relevant) if keep]
+    logging.info(f"Graded {len(documents)} documents in {time.perf_counter() - started:.2f}s, kept {len(filtered_docs)}.")
+    # One grader call per prompt; regrading a malformed batch response one by one is not counted
+    grader_calls = len(documents) if GRADER_BATCH_SIZE <= 1 else -(-len(documents) // GRADER_BATCH_SIZE)
+    state.update({
+        "documents": filtered_docs,
+        "search": "No" if filtered_docs else "Yes",  # No relevant documents, need to search
+        **_spent_llm_calls(state, grader_calls),
+    })
+    return state
+
 def grade_documents(state):
     """
     Determines whether the retrieved documents are relevant to the question.
@@ -377,38 +707,47 @@ def grade_documents(state):
         dict: Updates documents key with only filtered relevant documents
     """
     logging.info("---GRADE DOCUMENTS---")
+    started = time.perf_counter()
     question = state["question"]
     documents = state.get("documents", [])
-    filtered_docs = []
-    search = "No"
-
-    if not documents:
-        # No documents retrieved, need to search
-        search = "Yes"
+    if GRADER_BATCH_SIZE > 1:
+        relevant = grade_document_batches(question, documents) if documents else []
     else:
-        for d in documents:
-            try:
-                score = retrieval_grader.invoke(
-                    {"question": question, "documents": d.page_content}
-                )
-                grade = score.get("score", 0)
-                if grade in ["yes", 1, "1"]:
-                    filtered_docs.append(d)
-                else:
-                    continue
-            except Exception as e:
-                logging.error(f"Error during document grading: {str(e)}")
-                continue
-        if not filtered_docs:
-            search = "Yes"
-
-    state.update({
-        "documents": filtered_docs,
-        "search": search,
-    })
-    return state
+        relevant = grade_each_document(question, documents) if documents else []
+    return _graded_state(state, relevant, started)
 
-# -----------Edges------------
+async def agrade_documents(state):
+    """Async version of grade_documents."""
+    logging.info("---GRADE DOCUMENTS---")
+    started = time.perf_counter()
+    question = state["question"]
+    documents = state.get("documents", [])
+    if GRADER_BATCH_SIZE > 1:
+        relevant = await agrade_document_batches(question, documents) if documents else []
+    else:
+        relevant = await agrade_each_document(question, documents) if documents else []
+    return _graded_state(state, relevant, started)
+
+def _grade(state, score):
+    """Records the grade and whether the budget leaves room for another attempt."""
+    update = _spent_llm_calls(state, 1)
+    if not isinstance(score, Exception) and score.get("score", 0) == "yes":
+        logging.info("---DECISION: GENERATION ADDRESSES QUESTION---")
+        _record_loop(state, update)
+        return {"grade": "useful", "budget_exhausted": False, **update}
+    logging.info("---DECISION: GENERATION DOES NOT ADDRESS QUESTION---")
+    spent = budget_spent({**state, **update})
+    if spent:
+        logging.info(f"Request budget spent ({spent}) after {state.get('iterations', 0)} iterations "
+                     f"and {update['llm_calls']} LLM calls, returning the latest answer.")
+        metrics.budget_exhausted.inc()
+        _record_loop(state, update)
+    return {"grade": "not useful", "budget_exhausted": spent is not None, **update}
+
+def _record_loop(state, update):
+    """Records the loop iterations and LLM calls of a question whose run is ending."""
+    metrics.request_iterations.observe(state.get("iterations", 0))
+    metrics.request_llm_calls.observe(update["llm_calls"])
 
 def grade_generation(state):
     """
@@ -418,24 +757,25 @@ def grade_generation(state):
         state (dict): The current graph state
 
     Returns:
-        str: Decision for next node to call
+        dict: Sets grade to 'useful' or 'not useful', which decides the next node to call
     """
     logging.info("---GRADE GENERATION vs QUESTION---")
-    question = state["question"]
-    generation = state.get("generation", "")
     try:
-        score = answer_grader.invoke({'question': question, 'generation': generation})
-        grade = score.get("score", 0)
-        if grade == "yes":
-            logging.info("---DECISION: GENERATION ADDRESSES QUESTION---")
-            return "useful"
-        else:
-            logging.info("---DECISION: GENERATION DOES NOT ADDRESS QUESTION---")
-            return "not useful"
+        return _grade(state, answer_grader.invoke({'question': state["question"], 'generation': state.get("generation", "")}))
     except Exception as e:
         logging.error(f"Error during generation grading: {str(e)}")
-        state['error'] = f"Error during generation grading: {str(e)}"
-        return "not useful"
+        return _grade(state, e)
+
+async def agrade_generation(state):
+    """Async version of grade_generation."""
+    logging.info("---GRADE GENERATION vs QUESTION---")
+    try:
+        return _grade(state, await answer_grader.ainvoke({'question': state["question"], 'generation': state.get("generation", "")}))
+    except Exception as e:
+        logging.error(f"Error during generation grading: {str(e)}")
+        return _grade(state, e)
+
+# -----------Edges------------
 
 def decide_to_generate(state):
     """
@@ -448,6 +788,10 @@ def decide_to_generate(state):
         str: Decision for next node to call
     """
     search = state.get("search", "No")
+    # Checked on its own: budget_spent reports the iteration and LLM call limits first
+    if search == "Yes" and time.time() >= state.get("deadline", float("inf")):
+        logging.info("---DECISION: DEADLINE PASSED, GENERATE WITHOUT WEB SEARCH---")
+        return "generate"
     if search == "Yes":
         logging.info("---DECISION: PERFORM WEB SEARCH---")
         return "websearch"
@@ -455,31 +799,113 @@ def decide_to_generate(state):
         logging.info("---DECISION: GENERATE ANSWER---")
         return "generate"
 
-def create_all_vectorstores():
+def decide_to_finish(state):
+    """
+    Ends the run with a useful answer, or when the request budget is spent; otherwise
+    retrieves again.
+
+    Args:
+        state (dict): The current graph state
+
+    Returns:
+        str: Decision for next node to call
+    """
+    if state.get("grade") == "useful":
+        return "useful"
+    # Set by grade_generation from budget_spent, so the run and its report agree
+    if state.get("budget_exhausted"):
+        logging.info("---DECISION: BUDGET SPENT, RETURN LATEST ANSWER---")
+        return "budget spent"
+    logging.info("---DECISION: RETRY---")
+    return "not useful"
+
+def create_all_vectorstores(background=True):
+    """
+    Opens all vector stores ahead of the first query.
+
+    Args:
+        background (bool): Warm up on a daemon thread instead of blocking the caller.
+
+    Returns:
+        threading.Thread or None: The warm-up thread when running in the background.
+    """
     logging.info("Initializing vectorstores...")
-    get_retriever("Wiki")
-    get_retriever("ArXiv")
-    get_retriever("Custom")  # Ensure Custom is also initialized
-    logging.info("All vectorstores initialized.")
+    return registry.warm_up(background=background)
+
+def _instrumented_node(name, func, afunc):
+    """
+    Wraps a node's sync and async implementations with latency and error metrics.
+
+    A node that catches its own exception and reports it in the state's 'error' key counts
+    as failed too. The interrupt in websearch is control flow, not an error. Records logged
+    while the node runs are tagged with its name.
+    """
+    def record(result):
+        if isinstance(result, dict) and result.get("error"):
+            metrics.node_errors.inc(node=name)
+        return result
+
+    def run(state):
+        try:
+            with node_context(name), metrics.node_seconds.time(node=name):
+                return record(func(state))
+        except GraphInterrupt:
+            raise
+        except Exception:
+            metrics.node_errors.inc(node=name)
+            raise
+
+    async def arun(state):
+        try:
+            with node_context(name), metrics.node_seconds.time(node=name):
+                return record(await afunc(state))
+        except GraphInterrupt:
+            raise
+        except Exception:
+            metrics.node_errors.inc(node=name)
+            raise
+
+    return RunnableLambda(run, afunc=arun, name=name)
 
 # Function to setup the workflow
-def setup_workflow():
+def setup_workflow(rerank=RERANK_SCORER, rebuild=False):
+    """
+    Builds and compiles the graph once.
+
+    Args:
+        rerank (str, optional): Scorer of a rerank node between retrieve and grade_documents
+            ('lexical', 'embedding' or 'cross-encoder'); empty or None for no rerank node.
+        rebuild (bool): Build the graph again, e.g. with a different rerank option.
+
+    Returns:
+        Tuple[StateGraph, CompiledGraph]: The workflow and the compiled graph.
+    """
     global workflow
     global graph
+    global reranker
 
-    if workflow is None or graph is None:  # Only set up if not already initialized
+    if workflow is None or graph is None or rebuild:  # Only set up if not already initialized
         workflow = StateGraph(GraphState)
-
-        # Adding the nodes
-        workflow.add_node("retrieve", retrieve)
-        workflow.add_node("grade_documents", grade_documents)
-        workflow.add_node("websearch", web_search)
-        workflow.add_node("generate", generate)
-        workflow.add_node("grade_generation", grade_generation)
+        reranker = get_reranker(rerank, baseline_k=RETRIEVE_K) if rerank else None
+
+        # Adding the nodes. Each has a sync and an async implementation, so the graph
+        # runs with stream() in the Flask app and with astream() in the ASGI app, and
+        # reports its latency and errors to the metrics registry.
+        workflow.add_node("retrieve", _instrumented_node("retrieve", retrieve, aretrieve))
+        workflow.add_node("grade_documents", _instrumented_node("grade_documents", grade_documents, agrade_documents))
+        workflow.add_node("websearch", _instrumented_node("websearch", web_search, aweb_search))
+        workflow.add_node("generate", _instrumented_node("generate", generate, agenerate))
+        workflow.add_node("grade_generation", _instrumented_node("grade_generation", grade_generation, agrade_generation))
+        if reranker is not None:
+            workflow.add_node("rerank", _instrumented_node("rerank", rerank_documents, arerank_documents))
 
         # Adding the edges
         workflow.add_edge(START, "retrieve")
-        workflow.add_edge("retrieve", "grade_documents")
+        if reranker is not None:
+            workflow.add_edge("retrieve", "rerank")
+            workflow.add_edge("rerank", "grade_documents")
+        else:
+            workflow.add_edge("retrieve", "grade_documents")
 
         # Conditional edges based on grading documents
         workflow.add_conditional_edges(
@@ -500,19 +926,23 @@ def setup_workflow():
         # Conditional edges based on grading generation
         workflow.add_conditional_edges(
             "grade_generation",
-            lambda state: "END" if state.get("grade") == "useful" else "retrieve",
+            decide_to_finish,
             {
                 "useful": END,
+                "budget spent": END,
                 "not useful": "retrieve",
             },
         )
 
-        # Compiling the workflow without a checkpointer
-        graph = workflow.compile()
+        # Checkpoints are kept per session (thread_id), so a session paused in websearch resumes there
+        graph = workflow.compile(checkpointer=checkpointer)
 
     return workflow, graph
 
-# Initialize vector stores and setup workflow when module is imported
-create_all_vectorstores()
+# Compile the workflow when the module is imported. This is cheap: vector stores are
+# opened on first use or by create_all_vectorstores(), which the server calls at startup.
+_setup_started = time.perf_counter()
 setup_workflow()
-logging.info("Graph module initialized successfully.")
+record_startup_timing("graph.setup_workflow", _setup_started)
+record_startup_timing("graph.import", _import_started)
+logging.info(f"Graph module initialized successfully. Startup report: {startup_report()}")
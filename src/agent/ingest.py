@@ -1,12 +1,25 @@
 # src/agent/ingest.py
 
+import time
+
+_import_started = time.perf_counter()
+
 import os
+import re
+import shutil
+import sqlite3
+import hashlib
+import threading
 from langchain.vectorstores import Chroma  # Updated import path
-from langchain_nvidia_ai_endpoints import NVIDIAEmbeddings
 from langchain.schema import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import PDFMinerLoader, UnstructuredWordDocumentLoader
 import logging
+from src.agent.embedding import create_embeddings, EMBEDDING_BACKEND
+from src.agent.numpy_index import NumpyVectorStore
+from src.agent.lexical_index import BM25Index, HybridRetriever
+from src.agent.chunking import TokenChunker
+from src.agent.startup import record_startup_timing, startup_timings
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -14,115 +27,610 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 # Debug: Check if API key is loaded
 nvidia_api_key = os.environ.get("nvidia_api_key")
 
-# Initialize embeddings
-embeddings = NVIDIAEmbeddings(
-    model="nvidia/nv-embedqa-e5-v5",
-    api_key=nvidia_api_key,
-    truncate="NONE",
-)
-
-# Initialize vector stores with unique collection names and persist directories
-wiki_vectorstore = Chroma(
-    embedding_function=embeddings,
-    collection_name="wiki-chroma",
-    persist_directory="chroma_wiki"
-)
-
-arxiv_vectorstore = Chroma(
-    embedding_function=embeddings,
-    collection_name="arxiv-chroma",
-    persist_directory="chroma_arxiv"
-)
-
-custom_vectorstore = Chroma(
-    embedding_function=embeddings,
-    collection_name="custom-chroma",
-    persist_directory="chroma_custom"
-)
-
-def get_retriever(vector_db_choice):
+# Embedding model and splitter settings. Both are part of every chunk hash, so
+# changing either one causes previously ingested chunks to be replaced.
+EMBEDDING_MODEL = "nvidia/nv-embedqa-e5-v5"
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+CHUNK_TOKENS = int(os.environ.get("CHUNK_TOKENS", "256"))
+CHUNK_OVERLAP_TOKENS = int(os.environ.get("CHUNK_OVERLAP_TOKENS", "48"))
+
+# Splitter per collection: 'token' (see chunking.py) or 'character'
+# (RecursiveCharacterTextSplitter with CHUNK_SIZE and CHUNK_OVERLAP characters)
+CHUNKING_CONFIG = {
+    'Custom': {"splitter": os.environ.get("CUSTOM_SPLITTER", "token"), "chunk_tokens": CHUNK_TOKENS, "overlap_tokens": CHUNK_OVERLAP_TOKENS},
+}
+
+# Unique collection names and persist directories of the vector stores
+VECTORSTORE_CONFIG = {
+    'Wiki': {"collection_name": "wiki-chroma", "persist_directory": "chroma_wiki"},
+    'ArXiv': {"collection_name": "arxiv-chroma", "persist_directory": "chroma_arxiv"},
+    'Custom': {"collection_name": "custom-chroma", "persist_directory": "chroma_custom"},
+}
+
+# Namespaces get their own custom collection; the name must also be a valid Chroma collection name
+NAMESPACE_PATTERN = re.compile(r"^[A-Za-z0-9](?:[A-Za-z0-9_-]{0,46}[A-Za-z0-9])?$")
+
+# Vector store backend: 'chroma' or 'numpy' (see numpy_index.py)
+VECTOR_BACKEND = os.environ.get("VECTOR_BACKEND", "chroma")
+
+# Memory Chroma may use for the indexes of the collections in one folder; the least recently
+# used ones are unloaded beyond it. 0 keeps every opened collection loaded.
+CHROMA_MEMORY_LIMIT_BYTES = int(os.environ.get("CHROMA_MEMORY_LIMIT_BYTES", "0"))
+
+# Default retrieval mode: 'vector' or 'hybrid' (BM25 fused with vector scores)
+RETRIEVAL_MODE = os.environ.get("RETRIEVAL_MODE", "vector")
+
+# Change counters of the vector stores, shared by all worker processes (see VectorStoreRegistry.version)
+COLLECTION_VERSIONS_PATH = os.environ.get("COLLECTION_VERSIONS_PATH", "collection_versions.sqlite")
+
+_embeddings = None
+_embeddings_lock = threading.Lock()
+
+def get_embeddings():
+    """
+    Returns the shared embedding function, creating it on first use.
+
+    Returns:
+        Embeddings: The (cached, batched) embedding function used by all vector stores.
+    """
+    global _embeddings
+    if _embeddings is None:
+        with _embeddings_lock:
+            if _embeddings is None:
+                started = time.perf_counter()
+                _embeddings = create_embeddings(EMBEDDING_MODEL, api_key=nvidia_api_key)
+                record_startup_timing("ingest.embeddings", started)
+    return _embeddings
+
+class VectorStoreRegistry:
+    """
+    Opens vector stores on first use and caches the handles.
+
+    Nothing is constructed when the registry is created; `get` opens a collection the
+    first time it is requested and `warm_up` opens them ahead of time, optionally on a
+    background thread.
+    """
+
+    def __init__(self, config, backend=VECTOR_BACKEND, versions_path=COLLECTION_VERSIONS_PATH):
+        """
+        Args:
+            config (dict): Maps a vector store name to its collection settings.
+            backend (str): 'chroma' or 'numpy'.
+            versions_path (str): SQLite file holding the change counters of the vector stores.
+        """
+        self.config = dict(config)
+        self.backend = backend
+        self.last_used = {}
+        self.versions_path = versions_path
+        self._versions = None  # SQLite connection, opened on first use
+        self._stores = {}
+        self._lexical_indexes = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, name):
+        return name in self.config
+
+    def is_open(self, name):
+        return name in self._stores
+
+    def open_names(self):
+        return list(self._stores)
+
+    def namespace(self, namespace):
+        """
+        Returns the name of the custom vector store of a namespace, registering it on first use.
+
+        Args:
+            namespace (str): Session or tenant namespace; None selects the shared 'Custom' store.
+
+        Returns:
+            str: Vector store name, 'Custom' or 'Custom:<namespace>'.
+
+        Raises:
+            ValueError: If the namespace is not 1-48 letters, digits, '-' or '_'.
+        """
+        if not namespace:
+            return 'Custom'
+        if not NAMESPACE_PATTERN.match(namespace):
+            raise ValueError(f"Invalid namespace: {namespace}")
+        name = f"Custom:{namespace}"
+        if name not in self.config:
+            with self._lock:
+                self.config.setdefault(name, {
+                    "collection_name": f"custom-ns-{namespace}",
+                    "persist_directory": self.config['Custom']["persist_directory"],
+                    "namespace": namespace,
+                })
+        return name
+
+    def store_name(self, vector_db_choice, namespace=None):
+        """
+        Returns the name of the vector store queried for a collection choice.
+
+        Args:
+            vector_db_choice (str): Choice of vector store ('Wiki', 'ArXiv', 'Custom').
+            namespace (str, optional): For 'Custom', the namespace whose collection is used.
+
+        Returns:
+            str: Vector store name in the registry.
+
+        Raises:
+            ValueError: If an invalid vector_db_choice or namespace is provided.
+        """
+        if vector_db_choice not in VECTORSTORE_CONFIG:
+            raise ValueError(f"Invalid vector database choice: {vector_db_choice}")
+        return self.namespace(namespace) if vector_db_choice == 'Custom' else vector_db_choice
+
+    def _versions_db(self):
+        """Returns the connection to the change counters. Called with the lock held."""
+        if self._versions is None:
+            conn = sqlite3.connect(self.versions_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+            conn.commit()
+            self._versions = conn
+        return self._versions
+
+    def version(self, name):
+        """
+        Returns how many times a vector store's contents have changed.
+
+        The counter is kept on disk, so a change made by one worker process is seen by all of them.
+        """
+        with self._lock:
+            row = self._versions_db().execute("SELECT version FROM versions WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def mark_changed(self, name):
+        """Bumps the version of a vector store after its contents were modified."""
+        with self._lock:
+            conn = self._versions_db()
+            conn.execute("INSERT INTO versions (name, version) VALUES (?, 1) "
+                         "ON CONFLICT(name) DO UPDATE SET version = version + 1", (name,))
+            conn.commit()
+
+    def namespaces(self):
+        """Returns the namespaces registered since startup."""
+        return [config["namespace"] for config in self.config.values() if "namespace" in config]
+
+    def get(self, name):
+        """
+        Returns the vector store with the given name, opening it if needed.
+
+        Args:
+            name (str): Vector store name ('Wiki', 'ArXiv', 'Custom').
+
+        Returns:
+            VectorStore: The Chroma or NumpyVectorStore vector store.
+
+        Raises:
+            ValueError: If the name is not configured or the backend is unknown.
+        """
+        self.last_used[name] = time.time()
+        store = self._stores.get(name)
+        if store is not None:
+            return store
+        if name not in self.config:
+            raise ValueError(f"Unknown vector store: {name}")
+        embedding_function = get_embeddings()
+        with self._lock:
+            if name not in self._stores:
+                started = time.perf_counter()
+                self._stores[name] = self._open(name, embedding_function)
+                logging.info(f"Opened {name} vectorstore in {time.perf_counter() - started:.4f}s.")
+                if "namespace" not in self.config[name]:
+                    record_startup_timing(f"vectorstore.{name}", started)
+        return self._stores[name]
+
+    def close(self, name):
+        """
+        Releases the in-memory handles of a vector store and its lexical index. The data
+        stays on disk and the store is reopened on next use.
+
+        Chroma collections in the same folder share one client, which keeps a collection's
+        index loaded after its handle is released. That memory is only given back when
+        CHROMA_MEMORY_LIMIT_BYTES is set and the collection is the least recently used.
+
+        Args:
+            name (str): Vector store name.
+        """
+        with self._lock:
+            store = self._stores.pop(name, None)
+            self._lexical_indexes.pop(name, None)
+        if isinstance(store, NumpyVectorStore):
+            store.persist()
+        if store is not None:
+            logging.info(f"Closed {name} vectorstore.")
+
+    def drop(self, name):
+        """
+        Deletes a namespaced vector store, its lexical index and its registration.
+
+        Args:
+            name (str): Vector store name of a namespace ('Custom:<namespace>').
+
+        Raises:
+            ValueError: If the name is not a namespaced store.
+        """
+        if "namespace" not in self.config.get(name, {}):
+            raise ValueError(f"Only namespaced vector stores can be dropped: {name}")
+        store = self.get(name)
+        lexical_path = self._lexical_path(name)
+        self.close(name)
+        if isinstance(store, NumpyVectorStore):
+            shutil.rmtree(self.persist_directory(name), ignore_errors=True)
+        else:
+            store.delete_collection()
+        if os.path.exists(lexical_path):
+            os.remove(lexical_path)
+        with self._lock:
+            self.config.pop(name, None)
+            self.last_used.pop(name, None)
+        self.mark_changed(name)
+        logging.info(f"Dropped {name} vectorstore.")
+
+    def persist_directory(self, name):
+        """Returns the folder holding the files of a vector store for the configured backend."""
+        config = self.config[name]
+        directory = config["persist_directory"]
+        if self.backend != "numpy":
+            return directory
+        # NumPy files are kept apart from the Chroma files so both backends can be populated side by side
+        if "namespace" in config:
+            return os.path.join(f"{directory}_numpy", "namespaces", config["namespace"])
+        return f"{directory}_numpy"
+
+    def _lexical_path(self, name):
+        return os.path.join(self.persist_directory(name), f"{self.config[name]['collection_name']}.bm25.json")
+
+    def _open(self, name, embedding_function):
+        config = self.config[name]
+        if self.backend == "chroma":
+            client_settings = None
+            if CHROMA_MEMORY_LIMIT_BYTES:
+                import chromadb.config
+                client_settings = chromadb.config.Settings(is_persistent=True, chroma_segment_cache_policy="LRU",
+                                                           chroma_memory_limit_bytes=CHROMA_MEMORY_LIMIT_BYTES)
+            return Chroma(embedding_function=embedding_function, collection_name=config["collection_name"],
+                          persist_directory=config["persist_directory"], client_settings=client_settings)
+        if self.backend == "numpy":
+            return NumpyVectorStore(embedding_function, collection_name=config["collection_name"],
+                                    persist_directory=self.persist_directory(name))
+        raise ValueError(f"Invalid vector store backend: {self.backend}")
+
+    def get_lexical_index(self, name):
+        """
+        Returns the BM25 index stored next to a vector store, loading it on first use.
+
+        Args:
+            name (str): Vector store name ('Wiki', 'ArXiv', 'Custom').
+
+        Returns:
+            BM25Index: The lexical index; empty if none was built yet.
+        """
+        index = self._lexical_indexes.get(name)
+        if index is not None:
+            return index
+        if name not in self.config:
+            raise ValueError(f"Unknown vector store: {name}")
+        with self._lock:
+            if name not in self._lexical_indexes:
+                started = time.perf_counter()
+                self._lexical_indexes[name] = BM25Index(self._lexical_path(name))
+                record_startup_timing(f"lexical_index.{name}", started)
+        return self._lexical_indexes[name]
+
+    def warm_up(self, names=None, background=True):
+        """
+        Opens the given vector stores (all of them by default) ahead of first use.
+
+        Args:
+            names (List[str], optional): Vector stores to open.
+            background (bool): Open them on a daemon thread instead of blocking.
+
+        Returns:
+            threading.Thread or None: The warm-up thread when running in the background.
+        """
+        names = list(names or [name for name, config in self.config.items() if "namespace" not in config])
+
+        def _warm_up():
+            started = time.perf_counter()
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    logging.error(f"Error warming up {name} vectorstore: {str(e)}")
+            record_startup_timing("vectorstore.warm_up", started)
+
+        if not background:
+            _warm_up()
+            return None
+        thread = threading.Thread(target=_warm_up, name="vectorstore-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+registry = VectorStoreRegistry(VECTORSTORE_CONFIG)
+
+def startup_report():
+    """
+    Returns how long each startup step took, plus which vector stores are open.
+
+    Returns:
+        dict: 'timings' (step name to seconds) and 'open_vectorstores'.
+    """
+    return {
+        "timings": dict(startup_timings),
+        "open_vectorstores": [name for name in registry.config if registry.is_open(name)],
+    }
+
+def get_retriever(vector_db_choice, mode=None, namespace=None, k=4):
     """
     Returns the retriever for the specified vector store.
 
     Args:
         vector_db_choice (str): Choice of vector store ('Wiki', 'ArXiv', 'Custom').
+        mode (str, optional): 'vector' for dense retrieval or 'hybrid' to fuse it with the
+            BM25 index of the collection. Defaults to RETRIEVAL_MODE.
+        namespace (str, optional): For 'Custom', search only the collection of this namespace.
+        k (int): Number of documents to return.
 
     Returns:
-        Chroma: Retriever object for the selected vector store.
+        BaseRetriever: Retriever object for the selected vector store.
 
     Raises:
-        ValueError: If an invalid vector_db_choice is provided.
-    """
-    if vector_db_choice == 'Wiki':
-        logging.info("Retrieving from Wiki vectorstore.")
-        return wiki_vectorstore.as_retriever()
-    elif vector_db_choice == 'ArXiv':
-        logging.info("Retrieving from ArXiv vectorstore.")
-        return arxiv_vectorstore.as_retriever()
-    elif vector_db_choice == 'Custom':
-        logging.info("Retrieving from Custom vectorstore.")
-        return custom_vectorstore.as_retriever()
-    else:
+        ValueError: If an invalid vector_db_choice, mode or namespace is provided.
+    """
+    if vector_db_choice not in VECTORSTORE_CONFIG:
         logging.error("Invalid vector database choice provided.")
         raise ValueError("Invalid vector database choice")
+    name = registry.store_name(vector_db_choice, namespace)
+    mode = mode or RETRIEVAL_MODE
+    logging.info(f"Retrieving from {name} vectorstore ({mode}).")
+    if mode == "vector":
+        return registry.get(name).as_retriever(search_kwargs={"k": k})
+    if mode == "hybrid":
+        return HybridRetriever(vectorstore=registry.get(name), lexical_index=registry.get_lexical_index(name),
+                               k=k, fetch_k=max(20, k))
+    raise ValueError(f"Invalid retrieval mode: {mode}")
 
-def create_custom_vectorstore(documents):
+def rebuild_lexical_index(vector_db_choice):
+    """
+    Rebuilds the BM25 index of a vector store from the documents it contains, e.g. for
+    collections populated outside of the upload pipeline.
+
+    Args:
+        vector_db_choice (str): Choice of vector store ('Wiki', 'ArXiv', 'Custom').
+
+    Returns:
+        int: Number of indexed documents.
+    """
+    stored = registry.get(vector_db_choice).get(include=["documents"])
+    lexical_index = registry.get_lexical_index(vector_db_choice)
+    lexical_index.clear()
+    lexical_index.add(stored["ids"], stored["documents"])
+    lexical_index.save()
+    logging.info(f"Rebuilt {vector_db_choice} lexical index with {len(lexical_index)} documents.")
+    return len(lexical_index)
+
+def create_custom_vectorstore(documents, ids=None, vectors=None, namespace=None):
     """
     Adds documents to the custom vector store and persists them.
 
     Args:
         documents (List[Document]): List of Document objects.
+        ids (List[str], optional): Ids to store the documents under. Random ids are used if omitted.
+        vectors (List[List[float]], optional): Precomputed embeddings of the documents.
+            When given, the documents are written as-is without calling the embedder.
+        namespace (str, optional): Write to the collection of this namespace instead of the shared one.
 
     Returns:
-        Chroma: The populated custom vector store.
+        VectorStore: The populated custom vector store.
 
     Raises:
         Exception: If there's an error during the addition or persistence of documents.
     """
+    store_name = registry.namespace(namespace)
+    custom_vectorstore = registry.get(store_name)
     if not documents:
         logging.warning("No documents provided for the custom vector store.")
         return custom_vectorstore
 
     try:
-        custom_vectorstore.add_documents(documents)
+        if vectors is None:
+            custom_vectorstore.add_documents(documents, ids=ids)
+        elif isinstance(custom_vectorstore, NumpyVectorStore):
+            custom_vectorstore.add_embeddings(ids, vectors, documents)
+        else:
+            custom_vectorstore._collection.upsert(
+                ids=ids,
+                embeddings=vectors,
+                metadatas=[doc.metadata for doc in documents],
+                documents=[doc.page_content for doc in documents],
+            )
         custom_vectorstore.persist()
+        registry.mark_changed(store_name)
         logging.info("Custom vectorstore created and persisted successfully.")
         return custom_vectorstore
     except Exception as e:
         logging.error(f"Error creating custom vector store: {str(e)}")
         raise e
 
-def create_custom_vectorstore_from_file(docs_list):
+def _sha256(*parts):
+    """Returns the hex SHA-256 digest of the given string parts."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def get_text_splitter(vector_db_choice='Custom'):
     """
-    Processes uploaded documents, splits them into chunks, and adds them to the custom vector store.
+    Creates the splitter configured for a collection in CHUNKING_CONFIG.
+
+    Args:
+        vector_db_choice (str): The collection name; namespaces use the 'Custom' settings.
+
+    Returns:
+        TokenChunker or RecursiveCharacterTextSplitter: An object with `split_documents`.
+    """
+    config = CHUNKING_CONFIG.get(vector_db_choice.split(":", 1)[0], {"splitter": "character"})
+    if config["splitter"] == "token":
+        return TokenChunker(chunk_tokens=config["chunk_tokens"], overlap_tokens=config["overlap_tokens"])
+    if config["splitter"] == "character":
+        return RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    raise ValueError(f"Unknown splitter '{config['splitter']}' for {vector_db_choice}")
+
+def _ingest_fingerprint():
+    """Returns a string identifying the splitter settings and embedding model."""
+    config = CHUNKING_CONFIG['Custom']
+    if config["splitter"] == "token":
+        splitter = f"token:{config['chunk_tokens']}|{config['overlap_tokens']}"
+    else:
+        splitter = f"{CHUNK_SIZE}|{CHUNK_OVERLAP}"
+    return f"{EMBEDDING_BACKEND}:{EMBEDDING_MODEL}|{splitter}"
+
+def hash_document(source, text):
+    """
+    Computes the content hash of a source document.
+
+    Args:
+        source (str): Name of the source document (e.g. the uploaded file name).
+        text (str): Full text of the document.
+
+    Returns:
+        str: Hex digest covering the text, splitter settings and embedding model.
+    """
+    return _sha256("document", _ingest_fingerprint(), source, text)
+
+def hash_chunk(source, text):
+    """
+    Computes the content hash of a chunk. It is used as the chunk id in the vector store.
+
+    Args:
+        source (str): Name of the source document the chunk belongs to.
+        text (str): Text of the chunk.
+
+    Returns:
+        str: Hex digest covering the chunk text, splitter settings and embedding model.
+    """
+    return _sha256("chunk", _ingest_fingerprint(), source, text)
+
+def _group_by_source(docs_list):
+    """Groups the uploaded texts by source, keeping upload order."""
+    grouped = {}
+    for doc in docs_list:
+        grouped.setdefault(doc["title"], []).append(doc["text"])
+    return grouped
+
+def _no_progress(stage):
+    pass
+
+def create_custom_vectorstore_from_file(docs_list, progress=_no_progress, namespace=None, check_limits=None):
+    """
+    Processes uploaded documents, splits them into chunks, and adds the chunks that are
+    not already in the custom vector store.
+
+    Every chunk is stored under a content hash of its text, source, splitter settings and
+    embedding model, so re-uploading an unchanged file embeds nothing. When a file is
+    uploaded again with different content, chunks of the earlier version that no longer
+    exist are removed.
 
     Args:
         docs_list (List[dict]): List of dictionaries with 'title' and 'text' keys.
+        progress (Callable[[str], None], optional): Called with 'chunked', 'embedded'
+            and 'persisted' as each stage completes.
+        namespace (str, optional): Add the documents to the collection of this namespace
+            instead of the shared custom collection.
+        check_limits (Callable[[str, int], None], optional): Called with the namespace and
+            the number of chunks the documents add, before anything is embedded; raises to
+            reject them (see NamespaceManager.check_limits).
 
     Returns:
-        Chroma: The populated custom vector store.
+        dict: Ingestion report with the number of 'documents', 'chunks', 'new',
+        'skipped' and 'replaced' chunks, plus the 'embedding' throughput report
+        when anything was embedded.
 
     Raises:
         Exception: If there's an error during processing or vector store creation.
     """
+    report = {"documents": 0, "chunks": 0, "new": 0, "skipped": 0, "replaced": 0}
     try:
         if not docs_list:
             logging.warning("No documents provided for the custom vector store.")
-            return custom_vectorstore
+            return report
 
-        # Convert the docs_list to Document objects
-        documents = [Document(page_content=doc["text"], metadata={"source": doc["title"]}) for doc in docs_list]
+        store_name = registry.namespace(namespace)
+        custom_vectorstore = registry.get(store_name)
+        text_splitter = get_text_splitter(store_name)
+        new_splits = []
+        new_ids = []
+        stale_ids = []
 
-        # Split documents into smaller chunks
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-        doc_splits = text_splitter.split_documents(documents)
-        logging.info(f"Number of document chunks: {len(doc_splits)}")
+        for source, texts in _group_by_source(docs_list).items():
+            report["documents"] += 1
+            doc_hash = hash_document(source, "\n".join(texts))
+            existing = custom_vectorstore.get(where={"source": source}, include=["metadatas"])
+            existing_ids = set(existing["ids"])
 
-        # Add documents to custom vectorstore
-        custom_vectorstore = create_custom_vectorstore(doc_splits)
-        return custom_vectorstore
+            # Unchanged document: every chunk is already stored, nothing to split or embed
+            if existing_ids and all(meta.get("doc_hash") == doc_hash for meta in existing["metadatas"]):
+                report["chunks"] += len(existing_ids)
+                report["skipped"] += len(existing_ids)
+                continue
+
+            # Convert the texts to Document objects and split them into smaller chunks
+            documents = [Document(page_content=text, metadata={"source": source}) for text in texts]
+            chunk_ids = set()
+            # The token chunker streams its chunks; the character splitter returns a list
+            split_documents = getattr(text_splitter, "iter_documents", text_splitter.split_documents)
+            for split in split_documents(documents):
+                chunk_id = hash_chunk(source, split.page_content)
+                if chunk_id in chunk_ids:
+                    continue  # Identical chunk repeated within the same document
+                chunk_ids.add(chunk_id)
+                report["chunks"] += 1
+                if chunk_id in existing_ids:
+                    report["skipped"] += 1
+                    continue
+                split.metadata.update({"doc_hash": doc_hash, "chunk_hash": chunk_id})
+                new_splits.append(split)
+                new_ids.append(chunk_id)
+
+            stale_ids.extend(existing_ids - chunk_ids)
+
+        report["new"] = len(new_ids)
+        report["replaced"] = len(stale_ids)
+        if check_limits is not None and len(new_ids) > len(stale_ids):
+            check_limits(namespace, len(new_ids) - len(stale_ids))
+        progress("chunked")
+
+        vectors = None
+        if new_splits:
+            embeddings = get_embeddings()
+            vectors = embeddings.embed_documents([split.page_content for split in new_splits])
+            report["embedding"] = embeddings.last_report
+        progress("embedded")
+
+        if stale_ids:
+            custom_vectorstore.delete(ids=stale_ids)
+        if new_splits:
+            create_custom_vectorstore(new_splits, ids=new_ids, vectors=vectors, namespace=namespace)
+        elif stale_ids:
+            custom_vectorstore.persist()
+        if stale_ids or new_splits:
+            # Keep the BM25 index next to the collection in step with it
+            lexical_index = registry.get_lexical_index(store_name)
+            lexical_index.remove(stale_ids)
+            lexical_index.add(new_ids, [split.page_content for split in new_splits])
+            lexical_index.save()
+            registry.mark_changed(store_name)
+        progress("persisted")
+        logging.info(f"Ingestion report: {report}")
+        return report
     except Exception as e:
         logging.error(f"Error processing documents: {str(e)}")
         raise e
 
+record_startup_timing("ingest.import", _import_started)
 logging.info("Ingest module loaded successfully.")
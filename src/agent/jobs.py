@@ -0,0 +1,178 @@
+# src/agent/jobs.py
+
+import os
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from src.agent.parsing import parse_files
+from src.agent.ingest import create_custom_vectorstore_from_file
+from src.agent.namespaces import namespaces
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+UPLOAD_MAX_WORKERS = int(os.environ.get("UPLOAD_MAX_WORKERS", "2"))
+UPLOAD_JOB_TTL = int(os.environ.get("UPLOAD_JOB_TTL", "3600"))  # Seconds finished jobs are kept
+
+# Stages every uploaded file goes through, in order
+STAGES = ["parsed", "chunked", "embedded", "persisted"]
+
+
+class UploadJob:
+    """
+    Progress of one /upload request: a status for the whole job and, for every file,
+    which ingestion stages have completed.
+    """
+
+    def __init__(self, files, namespace=None):
+        """
+        Args:
+            files (List[Tuple[str, str]]): (filename, saved file path) pairs.
+            namespace (str, optional): Namespace whose custom collection receives the files.
+        """
+        self.job_id = str(uuid.uuid4())
+        self.files = files
+        self.namespace = namespace
+        self.status = "queued"
+        self.created = time.time()
+        self.finished = None
+        self.error = None
+        # Keyed by saved path: two files with the same name in one upload are tracked apart
+        self.file_status = {
+            file_path: {"filename": filename, "stages": [], "status": "queued", "error": None, "report": None}
+            for filename, file_path in files
+        }
+        self._lock = threading.Lock()
+
+    def mark(self, file_path, stage):
+        with self._lock:
+            self.file_status[file_path]["stages"].append(stage)
+
+    def to_dict(self):
+        """
+        Returns the job as JSON-serializable status.
+
+        Returns:
+            dict: 'job_id', 'status', overall 'progress' between 0 and 1, 'error' and, keyed
+            by the saved file name, per-file 'filename', 'stages', 'status', 'error' and
+            ingestion 'report'.
+        """
+        with self._lock:
+            done = sum(len(f["stages"]) for f in self.file_status.values())
+            total = len(STAGES) * len(self.file_status)
+            return {
+                "job_id": self.job_id,
+                "status": self.status,
+                "progress": round(done / total, 3) if total else 1.0,
+                "error": self.error,
+                "files": {os.path.basename(path): {**f, "stages": list(f["stages"])}
+                          for path, f in self.file_status.items()},
+            }
+
+
+class UploadJobManager:
+    """
+    Runs upload jobs on a bounded thread pool and keeps their status for polling.
+    """
+
+    def __init__(self, max_workers=UPLOAD_MAX_WORKERS, ttl=UPLOAD_JOB_TTL):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="upload-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self.ttl = ttl
+
+    def submit(self, files, namespace=None):
+        """
+        Queues the ingestion of saved files.
+
+        Args:
+            files (List[Tuple[str, str]]): (filename, saved file path) pairs.
+            namespace (str, optional): Namespace whose custom collection receives the files.
+
+        Returns:
+            UploadJob: The queued job.
+        """
+        job = UploadJob(files, namespace=namespace)
+        with self._lock:
+            self._expire()
+            self._jobs[job.job_id] = job
+        # The job logs under the trace id of the upload request that queued it
+        self._executor.submit(contextvars.copy_context().run, self._run, job)
+        logging.info(f"Queued upload job {job.job_id} with {len(files)} file(s).")
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _expire(self):
+        """Drops finished jobs older than the TTL. Must be called with the lock held."""
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items() if job.finished and now - job.finished > self.ttl]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _run(self, job):
+        job.status = "running"
+        failed = 0
+        for status in job.file_status.values():
+            status["status"] = "running"
+
+        try:
+            # Files are parsed in parallel and each one is ingested as soon as it is parsed
+            for filename, file_path, docs, error in parse_files(job.files):
+                # The parsed text is all that is needed from here on
+                _remove_upload(file_path)
+                status = job.file_status[file_path]
+                if error:
+                    status["status"] = "failed"
+                    status["error"] = error
+                    failed += 1
+                    continue
+                job.mark(file_path, "parsed")
+                try:
+                    status["report"] = create_custom_vectorstore_from_file(
+                        docs, progress=lambda stage, path=file_path: job.mark(path, stage), namespace=job.namespace,
+                        check_limits=namespaces.check_limits,
+                    )
+                    status["status"] = "completed"
+                except Exception as e:
+                    logging.error(f"Error ingesting {filename} in job {job.job_id}: {str(e)}")
+                    status["status"] = "failed"
+                    status["error"] = str(e)
+                    failed += 1
+            if failed == len(job.files):
+                job.status = "failed"
+                job.error = "No file could be ingested"
+            else:
+                job.status = "completed"
+        except Exception as e:
+            # Parsing itself failed; the files not reported yet never will be
+            logging.error(f"Upload job {job.job_id} failed: {str(e)}")
+            for status in job.file_status.values():
+                if status["status"] == "running":
+                    status["status"] = "failed"
+                    status["error"] = f"Upload job failed: {str(e)}"
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            for _, file_path in job.files:
+                _remove_upload(file_path)
+            job.finished = time.time()
+        logging.info(f"Upload job {job.job_id} {job.status}.")
+
+
+def _remove_upload(file_path):
+    """Deletes a saved upload; every upload is stored under a unique name, so none is reused."""
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logging.warning(f"Could not delete uploaded file {file_path}: {str(e)}")
+
+
+upload_jobs = UploadJobManager()
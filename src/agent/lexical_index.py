@@ -0,0 +1,210 @@
+# src/agent/lexical_index.py
+
+import os
+import re
+import json
+import math
+import logging
+import threading
+from collections import Counter
+from typing import Any, List
+from langchain.schema import Document
+from langchain_core.retrievers import BaseRetriever
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Weight of the vector score in hybrid retrieval; the lexical score gets the rest
+HYBRID_ALPHA = float(os.environ.get("HYBRID_ALPHA", "0.5"))
+
+# Words joined by hyphens, commas or dots are kept whole, so CAS numbers (7732-18-5),
+# dates (1945-09-02) and chemical names (2,4-dinitrophenol) stay single tokens
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-,./][a-z0-9]+)*")
+PART_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """
+    Splits text into lowercase lexical tokens.
+
+    Compound tokens such as CAS numbers, dates and chemical names are emitted whole and
+    also as their alphanumeric parts, so both exact and partial mentions match.
+
+    Args:
+        text (str): Text to tokenize.
+
+    Returns:
+        List[str]: The tokens.
+    """
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(part for part in PART_PATTERN.findall(token) if len(part) > 1)
+    return tokens
+
+
+class BM25Index:
+    """
+    Okapi BM25 inverted index over document ids, persisted as JSON.
+
+    Only the per-document term frequencies are stored; the postings lists are rebuilt in
+    memory on load. Updates and searches are thread-safe.
+    """
+
+    def __init__(self, path, k1=1.5, b=0.75):
+        """
+        Args:
+            path (str): JSON file the index is loaded from and saved to.
+            k1 (float): Term frequency saturation.
+            b (float): Document length normalization.
+        """
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._doc_terms = {}
+        self._doc_lengths = {}
+        self._postings = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for doc_id, terms in json.load(f)["documents"].items():
+                    self._index(doc_id, terms)
+
+    def __len__(self):
+        return len(self._doc_terms)
+
+    def _index(self, doc_id, terms):
+        self._doc_terms[doc_id] = terms
+        length = sum(terms.values())
+        self._doc_lengths[doc_id] = length
+        self._total_length += length
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[doc_id] = tf
+
+    def _unindex(self, doc_id):
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        self._total_length -= self._doc_lengths.pop(doc_id)
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def add(self, ids, texts):
+        """Indexes texts under the given ids, replacing earlier versions of the same ids."""
+        with self._lock:
+            for doc_id, text in zip(ids, texts):
+                self._unindex(doc_id)
+                self._index(doc_id, dict(Counter(tokenize(text))))
+
+    def remove(self, ids):
+        with self._lock:
+            for doc_id in ids:
+                self._unindex(doc_id)
+
+    def clear(self):
+        with self._lock:
+            self._doc_terms, self._doc_lengths, self._postings, self._total_length = {}, {}, {}, 0
+
+    def save(self):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"documents": self._doc_terms}, f)
+            os.replace(tmp_path, self.path)
+
+    def search(self, query, k=4):
+        """
+        Scores documents against a query with BM25.
+
+        Args:
+            query (str): Query text.
+            k (int): Number of results.
+
+        Returns:
+            List[Tuple[str, float]]: (document id, score) pairs, best first.
+        """
+        with self._lock:
+            n = len(self._doc_terms)
+            if n == 0:
+                return []
+            average_length = self._total_length / n
+            scores = {}
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_id] / average_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+def _min_max(scores):
+    """Scales scores to [0, 1]; all of them are 1 when they are equal."""
+    if not scores:
+        return []
+    low, high = min(scores), max(scores)
+    if high == low:
+        return [1.0] * len(scores)
+    return [(score - low) / (high - low) for score in scores]
+
+
+def _document_key(doc):
+    # Chunks ingested by ingest.py carry their id as chunk_hash; other stores fall back to content
+    return doc.metadata.get("chunk_hash") or doc.page_content
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retriever that fuses BM25 and vector similarity scores.
+
+    Both result lists are min-max normalized to [0, 1] and combined as
+    alpha * vector + (1 - alpha) * lexical, so neither side's score scale matters: Chroma's
+    L2 relevance scores, which can be negative, weigh as much as cosine or BM25 scores. Documents found only by BM25 are loaded from
+    the vector store by id, so no extra embedding call is made.
+    """
+
+    vectorstore: Any
+    lexical_index: Any
+    k: int = 4
+    fetch_k: int = 20
+    alpha: float = HYBRID_ALPHA
+
+    def _get_relevant_documents(self, query, *, run_manager=None) -> List[Document]:
+        combined = {}
+        documents = {}
+
+        vector_results = self.vectorstore.similarity_search_with_relevance_scores(query, k=self.fetch_k)
+        vector_scores = _min_max([score for _, score in vector_results])
+        for (doc, _), score in zip(vector_results, vector_scores):
+            key = _document_key(doc)
+            documents[key] = doc
+            combined[key] = self.alpha * score
+
+        lexical_results = self.lexical_index.search(query, k=self.fetch_k)
+        if lexical_results:
+            lexical_scores = dict(zip((doc_id for doc_id, _ in lexical_results),
+                                      _min_max([score for _, score in lexical_results])))
+            found = self.vectorstore.get(ids=[doc_id for doc_id, _ in lexical_results], include=["documents", "metadatas"])
+            by_id = {
+                doc_id: Document(page_content=text, metadata=metadata or {})
+                for doc_id, text, metadata in zip(found["ids"], found["documents"], found["metadatas"])
+            }
+            for doc_id, _ in lexical_results:
+                doc = by_id.get(doc_id)
+                if doc is None:
+                    continue  # Stale entry: the chunk was removed from the vector store
+                key = _document_key(doc)
+                documents.setdefault(key, doc)
+                combined[key] = combined.get(key, 0.0) + (1 - self.alpha) * lexical_scores[doc_id]
+
+        ranked = sorted(combined.items(), key=lambda item: item[1], reverse=True)[:self.k]
+        return [documents[key] for key, _ in ranked]
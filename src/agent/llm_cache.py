@@ -0,0 +1,158 @@
+# src/agent/llm_cache.py
+
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import warnings
+from contextlib import contextmanager
+from contextvars import ContextVar
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_PATH = os.environ.get("LLM_CACHE_PATH", "llm_cache.sqlite")
+LLM_CACHE_MAX_BYTES = int(os.environ.get("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Set by bypass() for the current request; LangChain copies the context into its worker threads
+_bypass = ContextVar("llm_cache_bypass", default=False)
+
+
+@contextmanager
+def bypass():
+    """Skips cache lookups for LLM calls made inside the block. Fresh responses are still stored."""
+    token = _bypass.set(True)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+class SQLiteLLMCache(BaseCache):
+    """
+    Disk-backed exact-match cache for chat model calls.
+
+    Responses are keyed by a hash of the serialized model configuration (model name,
+    temperature, format and other invocation parameters, as passed in by LangChain) and
+    the serialized prompt. The least recently used responses are evicted once the stored
+    responses exceed `max_bytes`.
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, max_bytes=LLM_CACHE_MAX_BYTES):
+        """
+        Args:
+            path (str): Location of the SQLite database file.
+            max_bytes (int): Total size of stored responses before LRU eviction starts.
+        """
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+            "size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self._conn.commit()
+        # Totalled once here, then kept up to date on insert, eviction and clear, so inserts don't scan the table
+        self._entries, self._bytes = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+
+    def _key(self, prompt, llm_string):
+        return hashlib.sha256(f"{llm_string}\0{prompt}".encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt, llm_string):
+        if _bypass.get():
+            with self._lock:
+                self.bypassed += 1
+            return None
+        key = self._key(prompt, llm_string)
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")  # loads() is marked as beta
+                generations = loads(row[0])
+        except Exception as e:
+            logging.error(f"Error loading cached LLM response: {str(e)}")
+            return None
+        # Cached generations keep the usage of the original call; the flag keeps them out of the token metrics
+        for generation in generations:
+            generation.generation_info = {**(generation.generation_info or {}), "cached": True}
+        return generations
+
+    def update(self, prompt, llm_string, return_val):
+        response = dumps(return_val)
+        size = len(response.encode("utf-8"))
+        key = self._key(prompt, llm_string)
+        with self._lock:
+            replaced = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, response, size, time.time()),
+            )
+            if replaced:
+                self._bytes -= replaced[0]
+            else:
+                self._entries += 1
+            self._bytes += size
+            if self._bytes > self.max_bytes:
+                # Evict down to 90% of the limit so eviction doesn't run on every insert
+                target = self._bytes - int(self.max_bytes * 0.9)
+                freed, evicted = 0, []
+                for key, entry_size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_access"):
+                    if freed >= target:
+                        break
+                    evicted.append((key,))
+                    freed += entry_size
+                self._conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+                self._entries -= len(evicted)
+                self._bytes -= freed
+                self.evictions += len(evicted)
+                logging.info(f"LLM cache evicted {len(evicted)} responses ({freed} bytes).")
+            self._conn.commit()
+
+    def clear(self, **kwargs):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._entries, self._bytes = 0, 0
+
+    def stats(self):
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: 'hits', 'misses', 'hit_rate', 'bypassed', 'evictions', and the current
+            number of 'entries' and their total 'bytes'.
+        """
+        with self._lock:
+            entries, size = self._entries, self._bytes
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "bypassed": self.bypassed,
+                "evictions": self.evictions,
+                "entries": entries,
+                "bytes": size,
+            }
+
+
+llm_cache = SQLiteLLMCache() if LLM_CACHE_ENABLED else None
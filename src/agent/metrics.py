@@ -0,0 +1,247 @@
+# src/agent/metrics.py
+#
+# Minimal Prometheus metrics registry rendered in the text exposition format by the /metrics
+# endpoint. Recording a sample takes one lock and a dict update, so it is cheap enough for
+# the per-node and per-call hot path.
+
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Upper bounds in seconds, from a cached lookup to a slow 405B generation
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames, key, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, key)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, e.g. errors or tokens."""
+
+    type = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        if not self.labelnames:
+            self._values[()] = 0  # Unlabelled counters are reported from zero
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            samples = list(self._values.items())
+        return self._header() + [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                                 for key, value in samples]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets, with their sum and count."""
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # Per-bucket counts (the last one is +Inf), the sum and the count
+                counts = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            counts[0][index] += 1
+            counts[1] += value
+            counts[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the duration of the block in seconds, also when it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self):
+        with self._lock:
+            samples = [(key, list(counts[0]), counts[1], counts[2]) for key, counts in self._values.items()]
+        lines = self._header()
+        for key, bucket_counts, total, count in samples:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else _format_value(float(bound))
+                labels = _format_labels(self.labelnames, key, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class CallbackMetric(_Metric):
+    """
+    Metric whose samples are read from another component when /metrics is scraped, such
+    as the hit counters a cache already keeps.
+    """
+
+    def __init__(self, name, documentation, labelnames=(), callback=None, type="gauge"):
+        """
+        Args:
+            callback: Returns a dict of label value tuples to sample values.
+            type (str): 'gauge' or 'counter'.
+        """
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+        self.type = type
+
+    def render(self):
+        try:
+            samples = self.callback()
+        except Exception as e:
+            logging.error(f"Error collecting metric {self.name}: {str(e)}")
+            samples = {}
+        return self._header() + [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                                 for key, value in samples.items() if value is not None]
+
+
+class MetricsRegistry:
+    """Holds the metrics of the process and renders them for Prometheus."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name, documentation, labelnames, callback, type="gauge"):
+        """Registers, or replaces, a metric read from `callback` at scrape time."""
+        with self._lock:
+            self._metrics[name] = CallbackMetric(name, documentation, labelnames, callback, type)
+
+    def render(self):
+        """
+        Returns:
+            str: All metrics in the Prometheus text exposition format (version 0.0.4).
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+node_seconds = registry.histogram("rag_node_seconds", "Time spent in each graph node.", ["node"])
+node_errors = registry.counter("rag_node_errors_total", "Graph node runs that raised or reported an error.", ["node"])
+llm_seconds = registry.histogram("rag_llm_seconds", "Latency of chat model calls, including cache hits.", ["model"])
+llm_tokens = registry.counter("rag_llm_tokens_total", "Tokens reported by the chat model, without LLM cache hits.",
+                              ["model", "kind"])
+llm_errors = registry.counter("rag_llm_errors_total", "Chat model calls that failed.", ["model"])
+embedding_seconds = registry.histogram("rag_embedding_seconds", "Latency of calls to the embedding backend.",
+                                       ["operation"])
+embedding_texts = registry.counter("rag_embedding_texts_total", "Texts sent to the embedding backend.", ["operation"])
+embedding_errors = registry.counter("rag_embedding_errors_total", "Failed calls to the embedding backend.",
+                                    ["operation"])
+search_seconds = registry.histogram("rag_search_seconds", "Latency of web search tool calls.", ["provider"])
+search_results = registry.counter("rag_search_results_total", "Results returned by web search tools.", ["provider"])
+search_errors = registry.counter("rag_search_errors_total", "Web search calls that failed or missed their deadline.",
+                                 ["provider", "reason"])
+request_iterations = registry.histogram("rag_request_iterations", "Retrieve/generate loop iterations per answered question.",
+                                        buckets=COUNT_BUCKETS)
+request_llm_calls = registry.histogram("rag_request_llm_calls", "LLM calls per answered question.",
+                                       buckets=COUNT_BUCKETS)
+budget_exhausted = registry.counter("rag_budget_exhausted_total", "Questions answered after the request budget ran out.")
+
+
+class LLMMetricsHandler(BaseCallbackHandler):
+    """
+    Callback handler recording the latency, token usage and errors of chat model calls.
+
+    Responses served by the LLM cache count towards latency but not tokens, as they were not billed.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self._started = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            llm_seconds.observe(time.perf_counter() - started, model=self.model)
+        for generations in response.generations:
+            for generation in generations:
+                if (generation.generation_info or {}).get("cached"):
+                    continue  # Tagged by SQLiteLLMCache.lookup
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None)
+                if usage:
+                    llm_tokens.inc(usage.get("input_tokens", 0), model=self.model, kind="prompt")
+                    llm_tokens.inc(usage.get("output_tokens", 0), model=self.model, kind="completion")
+                    continue
+                # Older integrations only report OpenAI-style usage in the response metadata
+                usage = getattr(message, "response_metadata", {}).get("token_usage") or {}
+                llm_tokens.inc(usage.get("prompt_tokens", 0), model=self.model, kind="prompt")
+                llm_tokens.inc(usage.get("completion_tokens", 0), model=self.model, kind="completion")
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._started.pop(run_id, None)
+        llm_errors.inc(model=self.model)
@@ -0,0 +1,163 @@
+# src/agent/namespaces.py
+
+import os
+import json
+import time
+import logging
+import threading
+from src.agent.ingest import registry
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Idle namespaces are closed (memory released) after NAMESPACE_IDLE_TTL seconds and
+# archived (exported to a JSON file and deleted) after NAMESPACE_ARCHIVE_TTL seconds
+NAMESPACE_IDLE_TTL = int(os.environ.get("NAMESPACE_IDLE_TTL", "1800"))
+NAMESPACE_ARCHIVE_TTL = int(os.environ.get("NAMESPACE_ARCHIVE_TTL", str(7 * 24 * 3600)))
+NAMESPACE_MAX_OPEN = int(os.environ.get("NAMESPACE_MAX_OPEN", "32"))
+NAMESPACE_MAX_CHUNKS = int(os.environ.get("NAMESPACE_MAX_CHUNKS", "50000"))
+NAMESPACE_SWEEP_INTERVAL = int(os.environ.get("NAMESPACE_SWEEP_INTERVAL", "60"))
+NAMESPACE_ARCHIVE_FOLDER = os.environ.get("NAMESPACE_ARCHIVE_FOLDER", "namespace_archive")
+NAMESPACE_STATE_PATH = os.environ.get("NAMESPACE_STATE_PATH", "namespaces.json")
+
+
+class NamespaceLimitError(ValueError):
+    """Raised when a namespace is over its chunk limit."""
+
+
+class NamespaceManager:
+    """
+    Tracks when each namespace was last used, enforces its limits and evicts idle ones.
+
+    Last-use times are saved to a JSON file on every sweep so archiving also works for
+    namespaces that have not been touched since the server restarted.
+    """
+
+    def __init__(self, state_path=NAMESPACE_STATE_PATH, idle_ttl=NAMESPACE_IDLE_TTL,
+                 archive_ttl=NAMESPACE_ARCHIVE_TTL, max_open=NAMESPACE_MAX_OPEN, max_chunks=NAMESPACE_MAX_CHUNKS):
+        self.state_path = state_path
+        self.idle_ttl = idle_ttl
+        self.archive_ttl = archive_ttl
+        self.max_open = max_open
+        self.max_chunks = max_chunks
+        self._last_used = {}
+        self._lock = threading.Lock()
+        if os.path.exists(state_path):
+            with open(state_path) as f:
+                self._last_used = json.load(f)
+
+    def touch(self, namespace):
+        """
+        Marks a namespace as used and returns its vector store name.
+
+        Args:
+            namespace (str): The namespace, or None for the shared custom collection.
+
+        Returns:
+            str: Vector store name in the registry.
+
+        Raises:
+            ValueError: If the namespace name is invalid.
+        """
+        name = registry.namespace(namespace)
+        if namespace:
+            with self._lock:
+                self._last_used[namespace] = time.time()
+        return name
+
+    def chunk_count(self, namespace):
+        return len(registry.get(registry.namespace(namespace)).get(include=[])["ids"])
+
+    def check_limits(self, namespace, incoming=0):
+        """
+        Raises NamespaceLimitError if the namespace already holds its maximum number of chunks,
+        or would hold more once `incoming` chunks are added.
+
+        Args:
+            namespace (str): The namespace; the shared collection has no limit.
+            incoming (int): Number of chunks about to be added.
+        """
+        if not namespace:
+            return
+        count = self.chunk_count(namespace)
+        if incoming and count + incoming > self.max_chunks:
+            raise NamespaceLimitError(f"Namespace {namespace} cannot take {incoming} more chunks "
+                                      f"({count} of {self.max_chunks} chunks used)")
+        if count >= self.max_chunks:
+            raise NamespaceLimitError(f"Namespace {namespace} is full ({count} of {self.max_chunks} chunks)")
+
+    def _archive(self, namespace):
+        """Exports a namespace's chunks to a JSON file, then deletes its collection."""
+        name = registry.namespace(namespace)
+        stored = registry.get(name).get(include=["documents", "metadatas"])
+        os.makedirs(NAMESPACE_ARCHIVE_FOLDER, exist_ok=True)
+        path = os.path.join(NAMESPACE_ARCHIVE_FOLDER, f"{namespace}-{int(time.time())}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(stored, f)
+        registry.drop(name)
+        logging.info(f"Archived namespace {namespace} ({len(stored['ids'])} chunks) to {path}.")
+
+    def sweep(self):
+        """
+        Closes namespaces idle longer than the idle TTL, archives those idle longer than
+        the archive TTL, and closes the least recently used ones beyond `max_open`.
+
+        Returns:
+            dict: Lists of 'closed' and 'archived' namespaces.
+        """
+        now = time.time()
+        with self._lock:
+            last_used = dict(self._last_used)
+        closed, archived = [], []
+
+        for namespace, used in last_used.items():
+            if now - used > self.archive_ttl:
+                try:
+                    self._archive(namespace)
+                    archived.append(namespace)
+                    with self._lock:
+                        self._last_used.pop(namespace, None)
+                except Exception as e:
+                    logging.error(f"Error archiving namespace {namespace}: {str(e)}")
+
+        open_namespaces = sorted(
+            (name for name in registry.open_names() if name.startswith("Custom:")),
+            key=lambda name: last_used.get(name.split(":", 1)[1], 0),
+        )
+        for position, name in enumerate(open_namespaces):
+            namespace = name.split(":", 1)[1]
+            over_limit = len(open_namespaces) - position > self.max_open
+            if over_limit or now - last_used.get(namespace, 0) > self.idle_ttl:
+                registry.close(name)
+                closed.append(namespace)
+
+        with self._lock:
+            tmp_path = f"{self.state_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self._last_used, f)
+            os.replace(tmp_path, self.state_path)
+        if closed or archived:
+            logging.info(f"Namespace sweep closed {closed} and archived {archived}.")
+        return {"closed": closed, "archived": archived}
+
+    def start_sweeper(self, interval=NAMESPACE_SWEEP_INTERVAL):
+        """
+        Runs `sweep` every `interval` seconds on a daemon thread.
+
+        Returns:
+            threading.Thread: The sweeper thread.
+        """
+        def _sweep_forever():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.sweep()
+                except Exception as e:
+                    logging.error(f"Error during namespace sweep: {str(e)}")
+
+        thread = threading.Thread(target=_sweep_forever, name="namespace-sweeper", daemon=True)
+        thread.start()
+        return thread
+
+
+namespaces = NamespaceManager()
@@ -0,0 +1,432 @@
+# src/agent/numpy_index.py
+
+import os
+import json
+import sqlite3
+import logging
+import threading
+import numpy as np
+from langchain.schema import Document
+from langchain_core.vectorstores import VectorStore
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Number of IVF partitions (0 keeps exact search) and how many of them a query scans
+NUMPY_INDEX_LISTS = int(os.environ.get("NUMPY_INDEX_LISTS", "0"))
+NUMPY_INDEX_PROBES = int(os.environ.get("NUMPY_INDEX_PROBES", "8"))
+
+# Partitions are only built once there are enough vectors to train them
+_MIN_VECTORS_PER_LIST = 39
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class NumpyVectorIndex:
+    """
+    Cosine-similarity index over L2-normalized float32 vectors kept in a memory-mapped
+    .npy file.
+
+    Search is exact (one matrix-vector product over all rows) unless `n_lists` is set, in
+    which case vectors are partitioned with spherical k-means (IVF) and a query only scans
+    the `n_probe` partitions whose centroids are closest to it. Rows are never reused:
+    removing a row marks it dead.
+    """
+
+    def __init__(self, directory, n_lists=NUMPY_INDEX_LISTS, n_probe=NUMPY_INDEX_PROBES):
+        """
+        Args:
+            directory (str): Folder holding vectors.npy, alive.npy, centroids.npy and index.json.
+            n_lists (int): Number of IVF partitions, or 0 for exact search only.
+            n_probe (int): Partitions scanned per query in IVF mode.
+        """
+        self.directory = directory
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.count = 0
+        self._vectors = None
+        self._alive = np.zeros(0, dtype=bool)
+        self._centroids = None
+        self._assignments = None
+        self._lists = None
+        self._trained_on = 0
+        self._lock = threading.RLock()
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    # -----------Storage------------
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _load(self):
+        if not os.path.exists(self._path("index.json")):
+            return
+        with open(self._path("index.json")) as f:
+            state = json.load(f)
+        self.count = state["count"]
+        self._trained_on = state.get("trained_on", 0)
+        self._vectors = np.load(self._path("vectors.npy"), mmap_mode="r+")
+        self._alive = np.load(self._path("alive.npy"))
+        if os.path.exists(self._path("centroids.npy")):
+            self._centroids = np.load(self._path("centroids.npy"))
+            self._assign_all()
+
+    def flush(self):
+        """Writes the vectors and index state to disk."""
+        with self._lock:
+            if self._vectors is None:
+                return
+            self._vectors.flush()
+            np.save(self._path("alive.npy"), self._alive)
+            if self._centroids is not None:
+                np.save(self._path("centroids.npy"), self._centroids)
+            with open(self._path("index.json"), "w") as f:
+                json.dump({"count": self.count, "dimensions": self.dimensions, "trained_on": self._trained_on}, f)
+
+    @property
+    def dimensions(self):
+        return None if self._vectors is None else self._vectors.shape[1]
+
+    @property
+    def size(self):
+        """Number of live vectors."""
+        return int(self._alive[:self.count].sum())
+
+    def nbytes(self):
+        """Bytes used on disk by the index files."""
+        return sum(os.path.getsize(self._path(name)) for name in os.listdir(self.directory))
+
+    def _reserve(self, extra, dimensions):
+        """Grows the memory-mapped file (doubling its capacity) to fit `extra` more rows."""
+        needed = self.count + extra
+        if self._vectors is None:
+            capacity = max(1024, needed)
+            self._vectors = np.lib.format.open_memmap(self._path("vectors.npy"), mode="w+", dtype=np.float32,
+                                                      shape=(capacity, dimensions))
+        elif needed > self._vectors.shape[0]:
+            capacity = max(2 * self._vectors.shape[0], needed)
+            grown = np.lib.format.open_memmap(self._path("vectors.tmp.npy"), mode="w+", dtype=np.float32,
+                                              shape=(capacity, self.dimensions))
+            grown[:self.count] = self._vectors[:self.count]
+            grown.flush()
+            del grown
+            self._vectors = None
+            os.replace(self._path("vectors.tmp.npy"), self._path("vectors.npy"))
+            self._vectors = np.load(self._path("vectors.npy"), mmap_mode="r+")
+        if len(self._alive) < self._vectors.shape[0]:
+            alive = np.zeros(self._vectors.shape[0], dtype=bool)
+            alive[:len(self._alive)] = self._alive
+            self._alive = alive
+
+    # -----------Updates------------
+
+    def add(self, vectors, rows=None):
+        """
+        Adds vectors, or overwrites the given rows.
+
+        Args:
+            vectors (array-like): Vectors of shape (n, dimensions); normalized on the way in.
+            rows (List[int], optional): Existing rows to overwrite instead of appending.
+
+        Returns:
+            np.ndarray: The rows the vectors were written to.
+        """
+        vectors = _normalize(vectors).reshape(len(vectors), -1)
+        with self._lock:
+            if rows is None:
+                self._reserve(len(vectors), vectors.shape[1])
+                rows = np.arange(self.count, self.count + len(vectors))
+                self.count += len(vectors)
+            rows = np.asarray(rows, dtype=np.int64)
+            self._vectors[rows] = vectors
+            self._alive[rows] = True
+            if self._centroids is not None:
+                self._assignments = np.resize(self._assignments, self.count)
+                self._assignments[rows] = np.argmax(vectors @ self._centroids.T, axis=1)
+                self._lists = None
+            if self.n_lists and self.size >= self.n_lists * _MIN_VECTORS_PER_LIST and self.size > 2 * self._trained_on:
+                self.build_ivf()
+            return rows
+
+    def remove(self, rows):
+        with self._lock:
+            self._alive[np.asarray(rows, dtype=np.int64)] = False
+
+    # -----------IVF------------
+
+    def build_ivf(self, n_lists=None, iterations=10, sample_size=50000, seed=0):
+        """
+        Trains the IVF partitions with spherical k-means and assigns every row to one.
+
+        Args:
+            n_lists (int, optional): Number of partitions; defaults to the index setting.
+            iterations (int): k-means iterations.
+            sample_size (int): Maximum number of vectors used for training.
+            seed (int): Random seed for the initial centroids and training sample.
+        """
+        with self._lock:
+            n_lists = n_lists or self.n_lists
+            live_rows = np.flatnonzero(self._alive[:self.count])
+            if not n_lists or len(live_rows) < n_lists:
+                return
+            rng = np.random.default_rng(seed)
+            sample = self._vectors[np.sort(rng.choice(live_rows, size=min(sample_size, len(live_rows)), replace=False))]
+            centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+            for _ in range(iterations):
+                labels = np.argmax(sample @ centroids.T, axis=1)
+                for c in range(n_lists):
+                    members = sample[labels == c]
+                    if len(members):
+                        centroids[c] = members.sum(axis=0)
+                centroids = _normalize(centroids)
+            self._centroids = centroids
+            self.n_lists = n_lists
+            self._trained_on = len(live_rows)
+            self._assign_all()
+            logging.info(f"Built IVF index with {n_lists} partitions over {len(live_rows)} vectors.")
+
+    def _assign_all(self, batch=65536):
+        assignments = np.empty(self.count, dtype=np.int32)
+        for start in range(0, self.count, batch):
+            block = self._vectors[start:min(start + batch, self.count)]
+            assignments[start:start + len(block)] = np.argmax(block @ self._centroids.T, axis=1)
+        self._assignments = assignments
+        self._lists = None
+
+    def _partition_rows(self):
+        if self._lists is None:
+            order = np.argsort(self._assignments, kind="stable")
+            bounds = np.searchsorted(self._assignments[order], np.arange(len(self._centroids) + 1))
+            self._lists = [order[bounds[c]:bounds[c + 1]] for c in range(len(self._centroids))]
+        return self._lists
+
+    # -----------Search------------
+
+    def search(self, query, k=4, exact=False):
+        """
+        Finds the rows most similar to a query vector.
+
+        Args:
+            query (array-like): Query vector.
+            k (int): Number of results.
+            exact (bool): Scan every row even if IVF partitions are built.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Rows and cosine similarities, best first.
+        """
+        # Take a consistent snapshot, then score without holding the lock
+        with self._lock:
+            if self._vectors is None or self.count == 0:
+                return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+            vectors, count, alive = self._vectors, self.count, self._alive
+            centroids = None if exact else self._centroids
+            lists = self._partition_rows() if centroids is not None else None
+        query = _normalize(query).reshape(-1)
+        if centroids is not None:
+            probes = np.argsort(-(centroids @ query))[:self.n_probe]
+            rows = np.sort(np.concatenate([lists[c] for c in probes]))
+            rows = rows[alive[rows]]
+            scores = vectors[rows] @ query
+        else:
+            scores = vectors[:count] @ query
+            scores[~alive[:count]] = -np.inf
+            rows = None
+        k = min(k, len(scores))
+        if k == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        top = top[np.isfinite(scores[top])]
+        return (top if rows is None else rows[top]), scores[top]
+
+    def vectors(self, rows):
+        return np.asarray(self._vectors[np.asarray(rows, dtype=np.int64)])
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    LangChain vector store backed by NumpyVectorIndex, with texts and metadata in SQLite.
+
+    It offers the subset of the Chroma API the ingest pipeline uses (`get`, `delete`,
+    `persist`), so it can stand in for Chroma behind `get_retriever`.
+    """
+
+    def __init__(self, embedding_function, collection_name, persist_directory,
+                 n_lists=NUMPY_INDEX_LISTS, n_probe=NUMPY_INDEX_PROBES):
+        """
+        Args:
+            embedding_function (Embeddings): Embeds texts and queries.
+            collection_name (str): Name of the collection.
+            persist_directory (str): Folder holding the index and the SQLite document table.
+            n_lists (int): Number of IVF partitions, or 0 for exact search.
+            n_probe (int): Partitions scanned per query in IVF mode.
+        """
+        self._embedding_function = embedding_function
+        self.collection_name = collection_name
+        self.persist_directory = persist_directory
+        self.index = NumpyVectorIndex(persist_directory, n_lists=n_lists, n_probe=n_probe)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(persist_directory, "documents.sqlite"), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents (row INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, text TEXT, metadata TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS documents_source ON documents (json_extract(metadata, '$.source'))")
+        self._conn.commit()
+
+    @property
+    def embeddings(self):
+        return self._embedding_function
+
+    # -----------Writes------------
+
+    def add_embeddings(self, ids, vectors, documents):
+        """
+        Inserts or replaces documents whose embeddings are already computed.
+
+        Args:
+            ids (List[str]): Document ids.
+            vectors (List[List[float]]): Embeddings of the documents.
+            documents (List[Document]): The documents.
+
+        Returns:
+            List[str]: The ids.
+        """
+        if not ids:
+            return []
+        with self._lock:
+            existing = self._rows_for_ids(ids)
+            new_positions = [i for i, doc_id in enumerate(ids) if doc_id not in existing]
+            old_positions = [i for i, doc_id in enumerate(ids) if doc_id in existing]
+            vectors = np.asarray(vectors, dtype=np.float32)
+            if old_positions:
+                self.index.add(vectors[old_positions], rows=[existing[ids[i]] for i in old_positions])
+            new_rows = []
+            if new_positions:
+                new_rows = self.index.add(vectors[new_positions]).tolist()
+            rows = dict(zip([ids[i] for i in new_positions], new_rows))
+            rows.update(existing)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO documents (row, id, text, metadata) VALUES (?, ?, ?, ?)",
+                [(rows[doc_id], doc_id, doc.page_content, json.dumps(doc.metadata)) for doc_id, doc in zip(ids, documents)],
+            )
+            self._conn.commit()
+        return list(ids)
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [os.urandom(16).hex() for _ in texts]
+        vectors = self._embedding_function.embed_documents(texts)
+        documents = [Document(page_content=text, metadata=metadata) for text, metadata in zip(texts, metadatas)]
+        return self.add_embeddings(ids, vectors, documents)
+
+    def delete(self, ids=None, **kwargs):
+        if not ids:
+            return
+        with self._lock:
+            rows = self._rows_for_ids(ids)
+            self.index.remove(list(rows.values()))
+            self._conn.executemany("DELETE FROM documents WHERE id = ?", [(doc_id,) for doc_id in ids])
+            self._conn.commit()
+
+    def persist(self):
+        self.index.flush()
+
+    # -----------Reads------------
+
+    def _rows_for_ids(self, ids):
+        rows = {}
+        for i in range(0, len(ids), 500):
+            batch = list(ids[i:i + 500])
+            placeholders = ",".join("?" * len(batch))
+            rows.update(self._conn.execute(f"SELECT id, row FROM documents WHERE id IN ({placeholders})", batch).fetchall())
+        return rows
+
+    def get(self, ids=None, where=None, include=None):
+        """
+        Returns stored documents, like Chroma's `get`.
+
+        Args:
+            ids (List[str], optional): Only return these ids.
+            where (dict, optional): Metadata equality filter, e.g. {"source": "a.pdf"}.
+            include (List[str], optional): Any of 'documents' and 'metadatas'.
+
+        Returns:
+            dict: 'ids', 'documents' and 'metadatas' lists.
+        """
+        include = include if include is not None else ["documents", "metadatas"]
+        clauses, params = [], []
+        if ids is not None:
+            clauses.append(f"id IN ({','.join('?' * len(ids))})")
+            params.extend(ids)
+        for key, value in (where or {}).items():
+            clauses.append(f"json_extract(metadata, '$.{key}') = ?")
+            params.append(value)
+        sql = "SELECT id, text, metadata FROM documents" + (" WHERE " + " AND ".join(clauses) if clauses else "")
+        with self._lock:
+            records = self._conn.execute(sql, params).fetchall()
+        return {
+            "ids": [record[0] for record in records],
+            "documents": [record[1] for record in records] if "documents" in include else None,
+            "metadatas": [json.loads(record[2]) for record in records] if "metadatas" in include else None,
+        }
+
+    def _documents_for_rows(self, rows):
+        """
+        Returns {row: Document} for the index rows still stored. A row deleted since the
+        index search is missing, so callers look documents up by row rather than by position.
+        """
+        rows = [int(row) for row in rows]
+        if not rows:
+            return {}
+        with self._lock:
+            records = self._conn.execute(
+                f"SELECT row, text, metadata FROM documents WHERE row IN ({','.join('?' * len(rows))})", rows
+            ).fetchall()
+        return {row: Document(page_content=text, metadata=json.loads(metadata)) for row, text, metadata in records}
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4):
+        rows, scores = self.index.search(embedding, k)
+        documents = self._documents_for_rows(rows)
+        return [(documents[int(row)], score) for row, score in zip(rows, scores.tolist()) if int(row) in documents]
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k)]
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        return self.similarity_search_with_score_by_vector(self._embedding_function.embed_query(query), k)
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def _select_relevance_score_fn(self):
+        # Scores are cosine similarities in [-1, 1]
+        return lambda score: (score + 1.0) / 2.0
+
+    def max_marginal_relevance_search(self, query, k=4, fetch_k=20, lambda_mult=0.5, **kwargs):
+        query_vector = _normalize(self._embedding_function.embed_query(query))
+        rows, scores = self.index.search(query_vector, fetch_k)
+        if len(rows) == 0:
+            return []
+        candidates = self.index.vectors(rows)
+        selected = [0]
+        while len(selected) < min(k, len(rows)):
+            redundancy = np.max(candidates @ candidates[selected].T, axis=1)
+            mmr = lambda_mult * scores - (1 - lambda_mult) * redundancy
+            mmr[selected] = -np.inf
+            selected.append(int(np.argmax(mmr)))
+        documents = self._documents_for_rows(rows[selected])
+        return [documents[int(row)] for row in rows[selected] if int(row) in documents]
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, collection_name="numpy", persist_directory="numpy_index", **kwargs):
+        store = cls(embedding, collection_name=collection_name, persist_directory=persist_directory, **kwargs)
+        store.add_texts(texts, metadatas=metadatas)
+        store.persist()
+        return store
@@ -0,0 +1,172 @@
+# src/agent/parsing.py
+
+import os
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+ALLOWED_EXTENSIONS = {'txt', 'csv', 'pdf', 'docx'}
+
+PARSE_MAX_WORKERS = int(os.environ.get("PARSE_MAX_WORKERS", str(os.cpu_count() or 2)))
+PARSE_TIMEOUT = float(os.environ.get("PARSE_TIMEOUT", "120"))  # Seconds per file
+
+def allowed_file(filename):
+    """Check if the uploaded file is in allowed extensions."""
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+def parse_file(file_path, filename):
+    """
+    Reads an uploaded file into plain-text documents.
+
+    Args:
+        file_path (str): Location of the saved file.
+        filename (str): Name of the file, used as the document title.
+
+    Returns:
+        List[dict]: Dictionaries with 'title' and 'text' keys, one per PDF page or Word
+        document element, or a single one for text and CSV files.
+
+    Raises:
+        ValueError: If the file type is not supported.
+    """
+    uploaded_docs = []
+    if filename.lower().endswith('.pdf'):
+        from langchain_community.document_loaders import PDFMinerLoader
+        loader = PDFMinerLoader(file_path)
+        pdf_pages = loader.load_and_split()
+        for page in pdf_pages:
+            uploaded_docs.append({
+                "title": filename,
+                "text": page.page_content
+            })
+    elif filename.lower().endswith('.docx'):
+        from langchain_community.document_loaders import UnstructuredWordDocumentLoader
+        loader = UnstructuredWordDocumentLoader(file_path)
+        loaded_docs = loader.load()
+        for doc in loaded_docs:
+            uploaded_docs.append({
+                "title": filename,
+                "text": doc.page_content
+            })
+    elif filename.lower().endswith(('.txt', '.csv')):
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            file_content = f.read()
+            uploaded_docs.append({
+                "title": filename,
+                "text": file_content
+            })
+    else:
+        raise ValueError(f"Unsupported file type: {filename}")
+    logging.info(f"Processed file: {filename}")
+    return uploaded_docs
+
+def parse_files(files, max_workers=PARSE_MAX_WORKERS, timeout=PARSE_TIMEOUT):
+    """
+    Parses files on a process pool, one file per task, yielding each result as soon as it
+    is ready so ingestion can start before the slowest file is done.
+
+    A file that raises or runs longer than `timeout` seconds is reported as failed without
+    affecting the others. A parser process that dies (say a native crash on a corrupt PDF)
+    breaks the whole pool; the files that were being parsed are then retried one at a
+    time on a new pool, and the one that crashes it on its own is reported as failed.
+
+    Args:
+        files (List[Tuple[str, str]]): (filename, saved file path) pairs.
+        max_workers (int): Maximum number of parser processes.
+        timeout (float): Seconds a single file may spend in its parser. Time the consumer
+            spends between yields doesn't count against a file that has already been parsed.
+
+    Yields:
+        Tuple[str, str, List[dict], str]: (filename, saved file path, parsed documents, error).
+        Exactly one of the documents and the error is None.
+    """
+    if not files:
+        return
+    max_workers = max(1, min(max_workers, len(files)))
+    queue = list(files)
+    running = {}  # future -> (filename, file_path, submitted at)
+    suspects = set()  # Paths of files that were being parsed when a parser process crashed
+    executor = None
+    try:
+        while queue or running:
+            if executor is None:
+                executor = ProcessPoolExecutor(max_workers=max_workers)
+            broken = False
+            # Never submit more than there are workers, so a submitted file is a running file.
+            # A suspect runs alone, so if it crashes again it takes no other file down with it
+            while queue and len(running) < max_workers and not any(path in suspects for _, path, _ in running.values()):
+                filename, file_path = queue[0]
+                if file_path in suspects and running:
+                    break
+                try:
+                    future = executor.submit(parse_file, file_path, filename)
+                except BrokenProcessPool:
+                    broken = True
+                    break
+                queue.pop(0)
+                running[future] = (filename, file_path, time.monotonic())
+
+            done, _ = wait(running, timeout=0.5, return_when=FIRST_COMPLETED)
+            crashed = [future for future in done if isinstance(future.exception(), BrokenProcessPool)]
+            yield from _collect(running, [future for future in done if future not in crashed])
+            if crashed or broken:
+                # Keep the files that finished before the crash; every other running file failed with the pool
+                yield from _collect(running, [future for future in running if future.done()
+                                              and not isinstance(future.exception(), BrokenProcessPool)])
+                lost = list(running.values())
+                running.clear()
+                _terminate(executor)
+                executor = None
+                retry = []
+                for filename, file_path, _ in lost:
+                    if file_path in suspects or len(lost) == 1:
+                        logging.error(f"Parser process crashed reading file {filename}")
+                        yield filename, file_path, None, f"Parser process crashed reading file {filename}"
+                    else:
+                        suspects.add(file_path)
+                        retry.append((filename, file_path))
+                queue[:0] = retry
+                continue
+
+            # Parsers keep working while the consumer ingests between yields, so the time since an
+            # unfinished file was submitted is time spent parsing it. A finished file is never expired.
+            now = time.monotonic()
+            expired = [future for future, (_, _, submitted) in running.items()
+                       if not future.done() and now - submitted > timeout]
+            if expired:
+                for future in expired:
+                    filename, file_path, _ = running.pop(future)
+                    logging.error(f"Timed out reading file {filename} after {timeout}s")
+                    yield filename, file_path, None, f"Timed out reading file {filename} after {timeout}s"
+                # Keep the results of files that finished meanwhile
+                yield from _collect(running, [future for future in running if future.done()])
+                # A stuck parser never returns, so the pool is killed and the files that
+                # were still being parsed start again on a fresh one
+                queue[:0] = [(filename, file_path) for filename, file_path, _ in running.values()]
+                running.clear()
+                _terminate(executor)
+                executor = None
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+def _collect(running, futures):
+    """Removes finished futures from `running` and yields their results as parse_files does."""
+    for future in futures:
+        filename, file_path, _ = running.pop(future)
+        try:
+            yield filename, file_path, future.result(), None
+        except Exception as e:
+            logging.error(f"Error reading file {filename}: {str(e)}")
+            yield filename, file_path, None, f"Error reading file {filename}: {str(e)}"
+
+def _terminate(executor):
+    """Kills the worker processes of a process pool and shuts it down without waiting."""
+    processes = getattr(executor, "_processes", None) or {}
+    for process in list(processes.values()):
+        process.terminate()
+    executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,175 @@
+# src/agent/rerank.py
+
+import os
+import math
+import logging
+import threading
+from collections import Counter
+import numpy as np
+from src.agent.ingest import get_embeddings
+from src.agent.lexical_index import tokenize
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Scorer of the rerank node: 'lexical', 'embedding' or 'cross-encoder'; empty disables reranking
+RERANK_SCORER = os.environ.get("RERANK_SCORER", "")
+# With reranking on, retrieve fetches RERANK_FETCH_K candidates and at most RERANK_TOP_K reach the grader
+RERANK_FETCH_K = int(os.environ.get("RERANK_FETCH_K", "12"))
+RERANK_TOP_K = int(os.environ.get("RERANK_TOP_K", "4"))
+# Candidates scoring below this fraction of the best candidate's score are cut
+RERANK_MIN_RELATIVE_SCORE = float(os.environ.get("RERANK_MIN_RELATIVE_SCORE", "0.3"))
+RERANK_MODEL = os.environ.get("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+
+
+class LexicalScorer:
+    """Scores candidates with BM25 statistics computed over the candidate set itself."""
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+
+    def score(self, question, texts):
+        terms = [Counter(tokenize(text)) for text in texts]
+        lengths = [sum(counts.values()) for counts in terms]
+        average_length = (sum(lengths) / len(lengths)) or 1.0
+        scores = [0.0] * len(texts)
+        for term in set(tokenize(question)):
+            containing = sum(1 for counts in terms if term in counts)
+            if not containing:
+                continue
+            idf = math.log(1 + (len(texts) - containing + 0.5) / (containing + 0.5))
+            for i, counts in enumerate(terms):
+                tf = counts.get(term, 0)
+                if tf:
+                    norm = self.k1 * (1 - self.b + self.b * lengths[i] / average_length)
+                    scores[i] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+
+class EmbeddingScorer:
+    """
+    Scores candidates by cosine similarity with the question embedding.
+
+    Chunks were embedded at ingestion, so their vectors usually come from the embedding
+    cache and only the question costs an embedding call.
+    """
+
+    def score(self, question, texts):
+        embeddings = get_embeddings()
+        query = np.asarray(embeddings.embed_query(question), dtype=np.float32)
+        vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1) * (np.linalg.norm(query) or 1.0)
+        return ((vectors @ query) / np.where(norms == 0, 1.0, norms)).tolist()
+
+
+class CrossEncoderScorer:
+    """Scores (question, passage) pairs with a sentence-transformers cross-encoder on the CPU."""
+
+    def __init__(self, model_name=RERANK_MODEL):
+        try:
+            from sentence_transformers import CrossEncoder
+        except ImportError as e:
+            raise ValueError("The cross-encoder scorer requires the sentence-transformers package.") from e
+        self.model = CrossEncoder(model_name, device="cpu")
+
+    def score(self, question, texts):
+        return self.model.predict([(question, text) for text in texts]).tolist()
+
+
+SCORERS = {
+    "lexical": LexicalScorer,
+    "embedding": EmbeddingScorer,
+    "cross-encoder": CrossEncoderScorer,
+}
+
+
+class Reranker:
+    """
+    Reorders retrieved documents with a cheap local scorer and keeps only the best ones,
+    so fewer of them are sent to the LLM grader.
+    """
+
+    def __init__(self, scorer, fetch_k=RERANK_FETCH_K, top_k=RERANK_TOP_K,
+                 min_relative_score=RERANK_MIN_RELATIVE_SCORE, baseline_k=4):
+        """
+        Args:
+            scorer: Object whose score(question, texts) returns one score per text, higher is better.
+            fetch_k (int): Number of candidates the retrieve node should fetch.
+            top_k (int): Maximum documents kept.
+            min_relative_score (float): Documents scoring below this fraction of the best score are cut.
+            baseline_k (int): Number of documents retrieved, and graded, without a reranker;
+                grader calls saved are counted against it.
+        """
+        self.scorer = scorer
+        self.fetch_k = fetch_k
+        self.top_k = top_k
+        self.min_relative_score = min_relative_score
+        self.baseline_k = baseline_k
+        self.queries = 0
+        self.candidates = 0
+        self.kept = 0
+        self.grader_calls_saved = 0
+        self._lock = threading.Lock()
+
+    def rerank(self, question, documents):
+        """
+        Args:
+            question (str): The user's question.
+            documents (List[Document]): Retrieved candidates.
+
+        Returns:
+            List[Document]: The kept documents, best first.
+        """
+        if not documents:
+            return []
+        scores = self.scorer.score(question, [doc.page_content for doc in documents])
+        ranked = sorted(zip(scores, range(len(documents))), key=lambda item: item[0], reverse=True)
+        best = ranked[0][0]
+        # Relative cut-off only makes sense for positive scores; otherwise keep the top_k
+        cutoff = best * self.min_relative_score if best > 0 else float("-inf")
+        kept = [documents[i] for score, i in ranked[:self.top_k] if score >= cutoff]
+        # Without the reranker the grader would have seen the first baseline_k documents retrieved
+        saved = max(0, min(self.baseline_k, len(documents)) - len(kept))
+        with self._lock:
+            self.queries += 1
+            self.candidates += len(documents)
+            self.kept += len(kept)
+            self.grader_calls_saved += saved
+        logging.info(f"Reranking kept {len(kept)} of {len(documents)} documents, saving {saved} grader calls.")
+        return kept
+
+    def stats(self):
+        """
+        Returns:
+            dict: Number of reranked 'queries', 'candidates' seen, documents 'kept', and the
+            'grader_calls_saved' against grading baseline_k documents, in total and per query.
+        """
+        with self._lock:
+            saved = self.grader_calls_saved
+            return {
+                "queries": self.queries,
+                "candidates": self.candidates,
+                "kept": self.kept,
+                "grader_calls_saved": saved,
+                "grader_calls_saved_per_query": round(saved / self.queries, 2) if self.queries else 0.0,
+            }
+
+
+def get_reranker(scorer_name, baseline_k=4):
+    """
+    Creates a reranker with the named scorer.
+
+    Args:
+        scorer_name (str): 'lexical', 'embedding' or 'cross-encoder'.
+        baseline_k (int): Number of documents retrieved without a reranker.
+
+    Returns:
+        Reranker: The reranker.
+
+    Raises:
+        ValueError: If the scorer name is unknown or its dependencies are missing.
+    """
+    if scorer_name not in SCORERS:
+        raise ValueError(f"Invalid rerank scorer: {scorer_name}")
+    return Reranker(SCORERS[scorer_name](), baseline_k=baseline_k)
@@ -0,0 +1,191 @@
+# src/agent/startup.py
+#
+# Deferred, profiled initialization. The heavy parts of the backend (the LLM clients, search
+# tools and compiled graph, the embedder, the vector stores) are registered as components that
+# are built on first use or by a background warm-up thread, so a new worker accepts traffic
+# before they are loaded. Only the standard library is imported here.
+
+import sys
+import time
+import logging
+import threading
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Seconds spent in each startup step, see startup_report() in ingest.py
+startup_timings = {}
+
+# Components are loaded one at a time: two threads importing the same libraries at once can
+# deadlock on Python's module locks. Re-entrant, as one component may use another while loading.
+_load_lock = threading.RLock()
+
+
+def record_startup_timing(step, started):
+    """Records the seconds elapsed since `started` (a perf_counter value) for a startup step."""
+    startup_timings[step] = round(time.perf_counter() - started, 4)
+
+
+class Component:
+    """
+    A part of the backend that is built once, on first use or during warm-up.
+
+    Callers arriving while a component is loading wait for it. A failed load is reported
+    and retried on the next use.
+    """
+
+    def __init__(self, name, load):
+        """
+        Args:
+            name (str): Name reported by /ready.
+            load (Callable[[], Any]): Builds and returns the object.
+        """
+        self.name = name
+        self._load = load
+        self._value = None
+        self._status = "pending"
+        self._error = None
+        self._seconds = None
+        self._new_modules = 0
+
+    def get(self):
+        """
+        Returns:
+            Any: The built object.
+
+        Raises:
+            Exception: Whatever the load function raised.
+        """
+        if self._status == "ready":
+            return self._value
+        with _load_lock:
+            if self._status == "ready":
+                return self._value
+            self._status = "loading"
+            modules = len(sys.modules)
+            started = time.perf_counter()
+            try:
+                value = self._load()
+            except Exception as e:
+                self._status = "failed"
+                self._error = str(e)
+                logging.error(f"Error loading {self.name}: {str(e)}")
+                raise
+            finally:
+                self._seconds = round(time.perf_counter() - started, 4)
+                self._new_modules = len(sys.modules) - modules
+            self._value = value
+            self._error = None
+            self._status = "ready"
+            record_startup_timing(f"component.{self.name}", started)
+            logging.info(f"Loaded {self.name} in {self._seconds:.2f}s ({self._new_modules} modules imported).")
+            return value
+
+    @property
+    def ready(self):
+        return self._status == "ready"
+
+    def report(self):
+        """
+        Returns:
+            dict: 'status' ('pending', 'loading', 'ready' or 'failed'), load 'seconds', number of
+            'modules_imported' by the load, and the 'error' of a failed load.
+        """
+        report = {"status": self._status, "seconds": self._seconds, "modules_imported": self._new_modules}
+        if self._error:
+            report["error"] = self._error
+        return report
+
+
+
+class LazyObject:
+    """
+    Stands in for the object of a component: attribute access loads the component and is
+    forwarded to it, so `graph_module.graph` imports the graph module the first time it is used.
+    """
+
+    __slots__ = ("_component",)
+
+    def __init__(self, component):
+        self._component = component
+
+    def __getattr__(self, attribute):
+        return getattr(self._component.get(), attribute)
+
+
+class ComponentRegistry:
+    """Holds the components of the process in warm-up order."""
+
+    def __init__(self):
+        self._components = {}
+
+    def register(self, name, load):
+        """
+        Args:
+            name (str): Component name.
+            load (Callable[[], Any]): Builds and returns the object.
+
+        Returns:
+            LazyObject: Stand-in for the object, loading the component on first use.
+
+        Raises:
+            ValueError: If the name is already registered.
+        """
+        if name in self._components:
+            raise ValueError(f"Component {name} is already registered")
+        self._components[name] = Component(name, load)
+        return LazyObject(self._components[name])
+
+    def get(self, name):
+        return self._components[name].get()
+
+    def is_ready(self, name):
+        return self._components[name].ready
+
+    def warm_up(self, names=None, background=True):
+        """
+        Loads the given components (all of them by default) in registration order.
+
+        A component that fails is logged and skipped; it is retried on first use.
+
+        Args:
+            names (List[str], optional): Components to load.
+            background (bool): Load them on a daemon thread instead of blocking.
+
+        Returns:
+            threading.Thread or None: The warm-up thread when running in the background.
+        """
+        names = list(names or self._components)
+
+        def _warm_up():
+            started = time.perf_counter()
+            for name in names:
+                try:
+                    self._components[name].get()
+                except Exception:
+                    pass  # Logged by Component.get
+            record_startup_timing("warm_up", started)
+            logging.info(f"Warm-up finished in {time.perf_counter() - started:.2f}s, ready: {self.ready()}.")
+
+        if not background:
+            _warm_up()
+            return None
+        thread = threading.Thread(target=_warm_up, name="component-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def ready(self):
+        return all(component.ready for component in self._components.values())
+
+    def report(self):
+        """
+        Returns:
+            dict: 'ready' (every component loaded) and the report of each component.
+        """
+        return {
+            "ready": self.ready(),
+            "components": {name: component.report() for name, component in self._components.items()},
+        }
+
+
+components = ComponentRegistry()
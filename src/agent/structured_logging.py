@@ -0,0 +1,151 @@
+# src/agent/structured_logging.py
+#
+# Logging setup for the request path. Each record carries the trace id of the request it
+# belongs to and, inside the graph, the node that wrote it; with LOG_FORMAT=json records are
+# written one JSON object per line. Large payloads (documents, raw search responses, graph
+# events, generations) go through log_payload: truncated, at DEBUG level and only for a sampled
+# fraction of requests, so they cost nothing on the hot path otherwise.
+
+import os
+import json
+import uuid
+import random
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# 'text' or 'json'
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text")
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+# Payloads are cut to this many characters
+LOG_PAYLOAD_MAX_CHARS = int(os.environ.get("LOG_PAYLOAD_MAX_CHARS", "500"))
+# Fraction of requests whose payloads are logged at DEBUG level
+LOG_PAYLOAD_SAMPLE_RATE = float(os.environ.get("LOG_PAYLOAD_SAMPLE_RATE", "0.1"))
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(trace_id)s - %(message)s'
+# Sent and returned by the HTTP servers so a client can find the logs of its request
+TRACE_HEADER = "X-Request-ID"
+
+_trace_id = ContextVar("trace_id", default="-")
+_node = ContextVar("node", default=None)
+_payload_sampled = ContextVar("payload_sampled", default=None)
+
+
+def current_trace_id():
+    """Returns the trace id of the current request, or '-' outside of one."""
+    return _trace_id.get()
+
+
+def start_trace(trace_id=None):
+    """
+    Starts the trace of a request in the current context, and decides whether its payloads are logged.
+
+    Threads started with a copy of the context (LangChain and LangGraph executors, asyncio.to_thread)
+    inherit the trace.
+
+    Args:
+        trace_id (str, optional): Id received from the client. A new one is generated if missing.
+
+    Returns:
+        str: The trace id.
+    """
+    trace_id = (trace_id or "").strip()[:64] or uuid.uuid4().hex[:16]
+    _trace_id.set(trace_id)
+    _payload_sampled.set(random.random() < LOG_PAYLOAD_SAMPLE_RATE)
+    return trace_id
+
+
+@contextmanager
+def node_context(name):
+    """Tags the records written inside the block with the graph node `name`."""
+    token = _node.set(name)
+    try:
+        yield
+    finally:
+        _node.reset(token)
+
+
+def truncate(value, max_chars=LOG_PAYLOAD_MAX_CHARS):
+    """
+    Returns:
+        str: `value`, or its repr, cut to `max_chars` characters with a note of how much was left out.
+    """
+    text = value if isinstance(value, str) else repr(value)
+    if len(text) <= max_chars:
+        return text
+    return f"{text[:max_chars]}... [{len(text) - max_chars} more chars]"
+
+
+def log_payload(label, payload):
+    """
+    Logs a large object at DEBUG level, truncated, if the current request was sampled.
+
+    Nothing is formatted unless the record is written. Outside of a request each call is sampled on its own.
+
+    Args:
+        label (str): What the payload is, e.g. 'Raw Tavily API response'.
+        payload: The object to log.
+    """
+    if not logging.getLogger().isEnabledFor(logging.DEBUG):
+        return
+    sampled = _payload_sampled.get()
+    if sampled is None:
+        sampled = random.random() < LOG_PAYLOAD_SAMPLE_RATE
+    if sampled:
+        logging.debug(f"{label}: {truncate(payload)}")
+
+
+class TraceFilter(logging.Filter):
+    """Adds the trace id and graph node of the current context to every record."""
+
+    def filter(self, record):
+        record.trace_id = _trace_id.get()
+        record.node = _node.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as single-line JSON objects."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "trace_id": getattr(record, "trace_id", "-"),
+            "message": record.getMessage(),
+        }
+        node = getattr(record, "node", None)
+        if node:
+            entry["node"] = node
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging(log_format=LOG_FORMAT, level=LOG_LEVEL):
+    """
+    Installs the trace filter and the formatter on the root handlers and sets the root level.
+
+    Args:
+        log_format (str): 'text' or 'json'.
+        level (str): Root logger level, e.g. 'INFO' or 'DEBUG'.
+
+    Raises:
+        ValueError: If the log format is unknown.
+    """
+    if log_format not in ("text", "json"):
+        raise ValueError(f"Invalid log format: {log_format}")
+    root = logging.getLogger()
+    formatter = JsonFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT)
+    for handler in root.handlers:
+        handler.setFormatter(formatter)
+        if not any(isinstance(f, TraceFilter) for f in handler.filters):
+            handler.addFilter(TraceFilter())
+    root.setLevel(level)
+
+
+configure_logging()